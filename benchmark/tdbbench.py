@@ -0,0 +1,377 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# 클러스터 없이 실행하는 TrainDB-ML 성능 측정
+#
+#   python tdbbench.py --output results.json --baseline baseline.json
+#
+# 훈련 처리량(Net), ModelServer 예측 지연 시간(로컬 stub), PV/PVC/InferenceService
+# provisioning 지연 시간(가짜 API server)을 측정해 JSON으로 저장하고 baseline과 비교한다.
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import queue
+import sys
+import threading
+import time
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+for directory in ('../pipeline', '../inference', '../common', '../metadata', '../storage'):
+    sys.path.append(os.path.join(BASE_DIR, directory))
+
+SUITES = ('train', 'predict', 'provision')
+DEFAULT_BATCH_SIZES = (32, 64, 128)
+DEFAULT_TOLERANCE = 0.10
+CONF_PATH = os.path.join(BASE_DIR, '../conf/')
+# 이름이 이 접미사로 끝나는 metric은 클수록 좋고, 나머지(지연 시간)는 작을수록 좋다.
+HIGHER_IS_BETTER_SUFFIX = '_per_sec'
+
+
+def percentile(values, q):
+    """Return the q-th percentile (0-100) of values by linear interpolation"""
+    values = sorted(values)
+    if not values:
+        return 0.0
+    position = (len(values) - 1) * q / 100.0
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def latency_metrics(prefix, seconds, total_seconds, unit='requests'):
+    """Return the p50/p99 latency (ms) and throughput metrics of a list of call durations"""
+    return {prefix + '_p50_ms': percentile(seconds, 50) * 1000,
+            prefix + '_p99_ms': percentile(seconds, 99) * 1000,
+            '{}_{}_per_sec'.format(prefix, unit): len(seconds) / max(total_seconds, 1e-9)}
+
+
+### Training
+def bench_train(batch_sizes=DEFAULT_BATCH_SIZES, steps=20, warmup=3, learning_rate=0.001):
+    """Return the Net train-step samples/sec at each batch size on random MNIST-shaped data"""
+    import torch
+    from torch import nn, optim
+    from tdbtrainer import Net
+
+    torch.manual_seed(0)
+    metrics = {}
+    for batch_size in batch_sizes:
+        model = Net()
+        model.train()
+        criterion = nn.CrossEntropyLoss()
+        optimizer = optim.Adam(model.parameters(), lr=learning_rate)
+        inputs = torch.randn(batch_size, 1, 28, 28)
+        labels = torch.randint(0, 10, (batch_size,))
+        for step in range(warmup + steps):
+            if step == warmup:
+                started = time.perf_counter()
+            optimizer.zero_grad()
+            loss = criterion(model(inputs), labels)
+            loss.backward()
+            optimizer.step()
+        elapsed = time.perf_counter() - started
+        metrics['train_net_bs{}_samples_per_sec'.format(batch_size)] = steps * batch_size / elapsed
+    return metrics
+
+
+### Prediction
+class StubPredictor():
+    """An in-process predictor that sleeps delay_ms and returns the sum of every instance"""
+
+    def __init__(self, delay_ms=1.0):
+        self.delay = delay_ms / 1000.0
+
+    def predict(self, inputs):
+        if self.delay > 0:
+            time.sleep(self.delay)
+        return [sum(instance) for instance in inputs]
+
+
+async def start_stub_server(delay_ms=1.0):
+    """Start a local KServe v1 predict endpoint and return (runner, url)"""
+    from aiohttp import web
+
+    async def handle(request):
+        body = await request.json()
+        if delay_ms > 0:
+            await asyncio.sleep(delay_ms / 1000.0)
+        return web.json_response({'predictions': [sum(instance) for instance in body['instances']]})
+
+    app = web.Application()
+    app.router.add_post('/v1/models/{name}', handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, 'http://127.0.0.1:{}'.format(port)
+
+
+def bench_predict(requests=500, batch_size=8, features=16, concurrency=16, delay_ms=1.0):
+    """Return the ModelServer predict and apredict latency and throughput against local stubs
+
+    predict goes through a ModelServer with an in-process StubPredictor;
+    apredict sends concurrency requests at a time over HTTP to a local
+    aiohttp stub of a KServe v1 endpoint.
+    """
+    from tdbmlserve import ModelServer
+
+    instances = [[float(i + j) for j in range(features)] for i in range(batch_size)]
+    server = ModelServer('bench', 'stub', 'pvc://bench/stub', predictor=StubPredictor(delay_ms))
+    seconds = []
+    started = time.perf_counter()
+    for _ in range(requests):
+        call_started = time.perf_counter()
+        server.predict(instances)
+        seconds.append(time.perf_counter() - call_started)
+    metrics = latency_metrics('predict', seconds, time.perf_counter() - started)
+
+    async def run_async():
+        runner, url = await start_stub_server(delay_ms)
+        async_server = ModelServer('bench', 'stub', 'pvc://bench/stub', predictor=StubPredictor(0),
+                                   endpoint=url)
+        semaphore = asyncio.Semaphore(concurrency)
+        async_seconds = []
+
+        async def one():
+            async with semaphore:
+                call_started = time.perf_counter()
+                await async_server.apredict(instances)
+                async_seconds.append(time.perf_counter() - call_started)
+
+        try:
+            await async_server.apredict(instances)  # 연결 준비
+            async_started = time.perf_counter()
+            await asyncio.gather(*[one() for _ in range(requests)])
+            return async_seconds, time.perf_counter() - async_started
+        finally:
+            await async_server.aclose()
+            await runner.cleanup()
+
+    async_seconds, total = asyncio.run(run_async())
+    metrics.update(latency_metrics('apredict', async_seconds, total))
+    return metrics
+
+
+### Provisioning
+class FakeKubeSession():
+    """A stand-in for TDBKubeSession.apply that keeps the applied objects and takes latency_ms per call"""
+
+    def __init__(self, latency_ms=5.0):
+        self.latency = latency_ms / 1000.0
+        self.objects = {}
+        self._lock = threading.Lock()
+
+    def apply(self, body, field_manager=None):
+        time.sleep(self.latency)
+        metadata = body['metadata']
+        with self._lock:
+            self.objects[(body['kind'], metadata.get('namespace'), metadata['name'])] = body
+        return body
+
+
+class FakeKServeAPI():
+    """A stand-in for KServeAPI whose InferenceServices become Ready ready_ms after they are written
+
+    Services named in existing are there, Ready, from the start. Creating
+    one that exists fails with 409 like the API server; update bumps its
+    generation, and a watch lists the existing services first.
+    """
+
+    def __init__(self, create_ms=5.0, ready_ms=50.0, existing=()):
+        self.create_latency = create_ms / 1000.0
+        self.ready_latency = ready_ms / 1000.0
+        self.services = {}  # (namespace, name) -> {'generation', 'observed'}
+        self.updated = []
+        self._watches = []  # watch마다 하나의 event queue
+        self._lock = threading.Lock()
+        for namespace, name in existing:
+            self.services[(namespace, name)] = {'generation': 1, 'observed': 1}
+
+    def create(self, isvc, namespace):
+        from kubernetes.client.rest import ApiException
+        time.sleep(self.create_latency)
+        name = isvc.metadata.name
+        with self._lock:
+            if (namespace, name) in self.services:
+                raise ApiException(status=409, reason='Conflict')
+            self.services[(namespace, name)] = {'generation': 1, 'observed': 0}
+        return self._rollout(namespace, name)
+
+    def update(self, isvc, namespace):
+        from kubernetes.client.rest import ApiException
+        time.sleep(self.create_latency)
+        name = isvc.metadata.name
+        with self._lock:
+            if (namespace, name) not in self.services:
+                raise ApiException(status=404, reason='Not Found')
+            self.services[(namespace, name)]['generation'] += 1
+            self.updated.append((namespace, name))
+        return self._rollout(namespace, name)
+
+    def _rollout(self, namespace, name):
+        with self._lock:
+            generation = self.services[(namespace, name)]['generation']
+
+        def ready():
+            with self._lock:
+                self.services[(namespace, name)]['observed'] = generation
+            event = self._event('MODIFIED', namespace, name)
+            with self._lock:
+                for events in self._watches:
+                    events.put(event)
+
+        timer = threading.Timer(self.ready_latency, ready)
+        timer.daemon = True
+        timer.start()
+        return {'metadata': {'name': name, 'namespace': namespace, 'generation': generation}}
+
+    def _event(self, event_type, namespace, name):
+        with self._lock:
+            service = dict(self.services[(namespace, name)])
+        return {'type': event_type, 'object': {
+            'metadata': {'name': name, 'namespace': namespace, 'generation': service['generation']},
+            'status': {'url': 'http://{}.{}'.format(name, namespace), 'observedGeneration': service['observed'],
+                       'conditions': [{'type': 'Ready', 'status': 'True'}]}}}
+
+    def watch(self, namespace, label_selector, timeout_seconds):
+        events = queue.Queue()
+        with self._lock:
+            self._watches.append(events)
+            listed = [name for ns, name in self.services if ns == namespace]
+        try:
+            for name in listed:
+                yield self._event('ADDED', namespace, name)
+            deadline = time.monotonic() + timeout_seconds
+            while time.monotonic() < deadline:
+                try:
+                    event = events.get(timeout=0.05)
+                except queue.Empty:
+                    continue
+                if event['object']['metadata']['namespace'] == namespace:
+                    yield event
+        finally:
+            with self._lock:
+                self._watches.remove(events)
+
+
+def bench_provision(tenants=50, workers=8, api_latency_ms=5.0, services=50, max_concurrency=8,
+                    isvc_ready_ms=50.0):
+    """Return the PV/PVC and InferenceService provisioning latency against fake API servers"""
+    from traindb_ml_initializer import TrainDBMLInitializer
+    from tdbdeploy import TDBBulkDeployer, isvc_spec
+
+    initializer = TrainDBMLInitializer(session=FakeKubeSession(api_latency_ms))
+    namespaces = ['bench-{}'.format(i) for i in range(tenants)]
+    started = time.perf_counter()
+    results = initializer.provision_many(namespaces, max_workers=workers, conf_path=CONF_PATH)
+    total = time.perf_counter() - started
+    failed = [ns for ns, result in results.items() if result['status'] != 'ok']
+    if failed:
+        raise RuntimeError("Provisioning failed for {}: {}".format(failed[0], results[failed[0]].get('error')))
+    metrics = latency_metrics('provision', [result['seconds'] for result in results.values()], total, 'tenants')
+
+    deployer = TDBBulkDeployer(FakeKServeAPI(api_latency_ms, isvc_ready_ms), max_concurrency,
+                               timeout_seconds=60, watch_timeout_seconds=1)
+    specs = [isvc_spec('bench', 'model{}'.format(i), 'bench', 'pvc://bench/model{}'.format(i))
+             for i in range(services)]
+    started = time.perf_counter()
+    results = deployer.deploy(specs, 'bench')
+    total = time.perf_counter() - started
+    not_ready = [name for name, result in results.items() if result['status'] != 'ready']
+    if not_ready:
+        raise RuntimeError("InferenceService {} was not ready: {}".format(not_ready[0], results[not_ready[0]]))
+    metrics.update(latency_metrics('isvc', [result['seconds'] for result in results.values()], total,
+                                   'services'))
+    return metrics
+
+
+### Baseline comparison
+def compare(metrics, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Return the metrics that are worse than the baseline by more than tolerance
+
+    Each regression is {'metric', 'value', 'baseline', 'change'}, where
+    change is the relative change (negative for a throughput drop, positive
+    for a latency increase).
+    """
+    regressions = []
+    for name, base in sorted(baseline.items()):
+        value = metrics.get(name)
+        if value is None or not base:
+            continue
+        change = (value - base) / base
+        worse = -change if name.endswith(HIGHER_IS_BETTER_SUFFIX) else change
+        if worse > tolerance:
+            regressions.append({'metric': name, 'value': value, 'baseline': base, 'change': change})
+    return regressions
+
+
+def environment():
+    info = {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()}
+    try:
+        import torch
+        info.update(torch=torch.__version__, torch_threads=torch.get_num_threads())
+    except ImportError:
+        pass
+    return info
+
+
+def run(suites=SUITES, quick=False):
+    """Run the benchmark suites and return the results document"""
+    metrics, seconds = {}, {}
+    for suite in suites:
+        started = time.perf_counter()
+        if suite == 'train':
+            metrics.update(bench_train(steps=5 if quick else 20))
+        elif suite == 'predict':
+            metrics.update(bench_predict(requests=100 if quick else 500))
+        elif suite == 'provision':
+            metrics.update(bench_provision(tenants=10 if quick else 50, services=10 if quick else 50))
+        else:
+            raise ValueError("Unknown suite: {} (expected one of {})".format(suite, SUITES))
+        seconds[suite] = time.perf_counter() - started
+    return {'time': time.time(), 'environment': environment(), 'suite_seconds': seconds, 'metrics': metrics}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='TrainDB-ML offline benchmarks')
+    parser.add_argument('--suite', action='append', choices=SUITES, help='a suite to run (default: all)')
+    parser.add_argument('--output', default='', help='the JSON file to write the results to')
+    parser.add_argument('--baseline', default='', help='a results JSON file to compare against')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--quick', action='store_true', help='fewer iterations, for a smoke test')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run(args.suite or SUITES, args.quick)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['metrics']
+        results['baseline'] = args.baseline
+        results['regressions'] = compare(results['metrics'], baseline, args.tolerance)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    for name, value in sorted(results['metrics'].items()):
+        print("{:<40} {:>12.2f}".format(name, value))
+    for regression in results.get('regressions', []):
+        print("REGRESSION {metric}: {value:.2f} (baseline {baseline:.2f}, {change:+.1%})".format(**regression))
+    return 1 if results.get('regressions') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -21,6 +21,13 @@ SERVING_TYPE = 'kserve'
 PVC_DEFAULT_MOUNT_PATH = '/mnt'
 DEFAULT_PVC_NAME = 'traindb-ml-pvc'
 DEFAULT_VOLUME_NAME = 'traindb-ml-volume'
+DATASET_CACHE_PATH = os.path.join(PVC_DEFAULT_MOUNT_PATH, 'cache', 'datasets')
+RUN_CACHE_PATH = os.path.join(PVC_DEFAULT_MOUNT_PATH, 'cache', 'runs')
+CHECKPOINT_PATH = os.path.join(PVC_DEFAULT_MOUNT_PATH, 'checkpoints')
+MODEL_CATALOG_PATH = os.path.join(PVC_DEFAULT_MOUNT_PATH, 'catalog', 'models.db')
+TRACE_PATH = os.path.join(PVC_DEFAULT_MOUNT_PATH, 'traces')
+ARTIFACT_PATH = os.path.join(PVC_DEFAULT_MOUNT_PATH, 'artifacts')
+DATASET_CACHE_MAX_BYTES = int(os.environ.get('TRAINDB_ML_DATASET_CACHE_MAX_BYTES', 8 * 1024 ** 3))
 TRAINDB_ML_LOG_LEVEL = os.environ.get('TRAINDB_ML_LOG_LEVEL', 'INFO').upper()
 TRAINDB_ML_LOG_FORMAT = '%(levelname)s|%(asctime)s|%(pathname)s|%(lineno)d| %(message)s'
 TRAINDB_ML_LOG_DATEFMT = '%Y-%m-%d %H:%M:%S'
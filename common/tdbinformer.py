@@ -0,0 +1,271 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import threading
+import time
+
+LOG = logging.getLogger(__name__)
+
+# 캐시하는 리소스: kind -> (group, version, plural)
+KIND_PYTORCHJOB = 'pytorchjob'
+KIND_INFERENCESERVICE = 'inferenceservice'
+RESOURCES = {
+    KIND_PYTORCHJOB: ('kubeflow.org', 'v1', 'pytorchjobs'),
+    KIND_INFERENCESERVICE: ('serving.kserve.io', 'v1beta1', 'inferenceservices'),
+}
+TRAINDB_LABEL_SELECTOR = 'system=traindb,subsystem=ml'
+INDEX_LABELS = ('modeltype', 'modelname', 'podtype')
+
+DEFAULT_RESYNC_SECONDS = 300
+DEFAULT_WATCH_TIMEOUT_SECONDS = 60
+RETRY_SECONDS = 1.0
+# resourceVersion이 너무 오래되어 watch를 이어갈 수 없음 (다시 list 해야 함)
+HTTP_GONE = 410
+
+
+class WatchExpired(Exception):
+    """The resourceVersion of a watch is no longer available (410 Gone)"""
+
+
+class CustomObjectAPI:
+    """The list and watch calls of TDBInformer over the Kubernetes CustomObjectsApi
+
+    A fake with the same list and watch methods can stand in for it.
+    """
+
+    def __init__(self, session=None):
+        if session is None:
+            from tdbkubesession import default_session
+            session = default_session()
+        self.session = session
+
+    def list(self, kind, namespace, label_selector):
+        """Return the objects of kind and the resourceVersion of the list"""
+        result = self.session.call('list_' + kind, self._list_fn(namespace), *self._args(kind, namespace),
+                                   label_selector=label_selector)
+        return result.get('items', []), result['metadata']['resourceVersion']
+
+    def watch(self, kind, namespace, label_selector, resource_version, timeout_seconds):
+        """Yield the watch events of kind after resource_version"""
+        from kubernetes import watch as k8s_watch
+        return k8s_watch.Watch().stream(self._list_fn(namespace), *self._args(kind, namespace),
+                                        label_selector=label_selector, resource_version=resource_version,
+                                        timeout_seconds=timeout_seconds, allow_watch_bookmarks=True)
+
+    def _list_fn(self, namespace):
+        from kubernetes import client
+        api = self.session.api(client.CustomObjectsApi)
+        return api.list_namespaced_custom_object if namespace else api.list_cluster_custom_object
+
+    def _args(self, kind, namespace):
+        group, version, plural = RESOURCES[kind]
+        return (group, version, namespace, plural) if namespace else (group, version, plural)
+
+
+def object_key(obj):
+    metadata = obj['metadata']
+    return metadata.get('namespace'), metadata['name']
+
+
+def object_status(kind, obj):
+    """Return a one-word status of a cached object
+
+    PyTorchJob: the type of its latest true condition (Created, Running,
+    Restarting, Succeeded, Failed). InferenceService: Ready or NotReady.
+    """
+    conditions = (obj.get('status') or {}).get('conditions') or []
+    if kind == KIND_INFERENCESERVICE:
+        for condition in conditions:
+            if condition.get('type') == 'Ready':
+                return 'Ready' if str(condition.get('status')).lower() == 'true' else 'NotReady'
+        return 'NotReady'
+    true_conditions = [c for c in conditions if str(c.get('status')).lower() == 'true']
+    return true_conditions[-1]['type'] if true_conditions else 'Unknown'
+
+
+class TDBInformer:
+    """A watch-driven local cache of TrainDB PyTorchJobs and InferenceServices
+
+    Each kind is listed once and then watched from the resourceVersion of
+    the list, so queries are answered from memory instead of the API
+    server. Objects are indexed by their modeltype, modelname and podtype
+    labels. When a watch ends it resumes from the last resourceVersion
+    seen (bookmarks included); when that version has expired (410 Gone)
+    or every resync_seconds, the kind is listed again and the cache is
+    replaced, with DELETED sent for objects that disappeared meanwhile.
+    """
+
+    def __init__(self, api=None, namespace=None, kinds=tuple(RESOURCES), label_selector=TRAINDB_LABEL_SELECTOR,
+                 resync_seconds=DEFAULT_RESYNC_SECONDS, watch_timeout_seconds=DEFAULT_WATCH_TIMEOUT_SECONDS):
+        self.api = api if api is not None else CustomObjectAPI()
+        self.namespace = namespace
+        self.kinds = tuple(kinds)
+        self.label_selector = label_selector
+        self.resync = resync_seconds
+        self.watch_timeout = watch_timeout_seconds
+        self._objects = {kind: {} for kind in self.kinds}  # kind -> key -> object
+        self._index = {}  # (label, value) -> set of (kind, key)
+        self._handlers = []
+        self._lock = threading.RLock()
+        self._synced = {kind: threading.Event() for kind in self.kinds}
+        self._stop = threading.Event()
+        self._threads = []
+        self.stats = {'lists': 0, 'events': 0, 'expired': 0, 'errors': 0}
+
+    def add_handler(self, handler):
+        """Call handler(event_type, kind, obj) for every ADDED, MODIFIED and DELETED change"""
+        self._handlers.append(handler)
+
+    def start(self):
+        """Start one list/watch thread per kind"""
+        self._stop.clear()
+        for kind in self.kinds:
+            thread = threading.Thread(target=self._run, args=(kind,), daemon=True, name='informer-' + kind)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=self.watch_timeout)
+        self._threads = []
+
+    def wait_synced(self, timeout=None):
+        """Return whether every kind was listed at least once within timeout seconds"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for event in self._synced.values():
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not event.wait(remaining):
+                return False
+        return True
+
+    def get(self, kind, name, namespace=None):
+        """Return the cached object of kind by name, or None"""
+        with self._lock:
+            objects = self._objects[kind]
+            if namespace is not None or self.namespace is not None:
+                return objects.get((namespace or self.namespace, name))
+            return next((obj for key, obj in objects.items() if key[1] == name), None)
+
+    def list(self, kind=None, **labels):
+        """Return the cached objects of kind (all kinds if None) matching the index labels
+
+        e.g. informer.list(KIND_PYTORCHJOB, modeltype='rspn', podtype='train')
+        """
+        for label in labels:
+            if label not in INDEX_LABELS:
+                raise ValueError("Unsupported label: {} (expected one of {})".format(label, INDEX_LABELS))
+        kinds = self.kinds if kind is None else (kind,)
+        with self._lock:
+            if not labels:
+                return [obj for k in kinds for obj in self._objects[k].values()]
+            keys = None
+            for label, value in labels.items():
+                matched = self._index.get((label, value), set())
+                keys = matched if keys is None else keys & matched
+            return [self._objects[k][key] for k, key in sorted(keys, key=str) if k in kinds]
+
+    def status(self, kind, name, namespace=None):
+        """Return the status of a cached object (see object_status), or None if it does not exist"""
+        obj = self.get(kind, name, namespace)
+        return object_status(kind, obj) if obj is not None else None
+
+    def _run(self, kind):
+        while not self._stop.is_set():
+            try:
+                resource_version = self._relist(kind)
+                resync_at = time.monotonic() + self.resync
+                while not self._stop.is_set() and time.monotonic() < resync_at:
+                    timeout = max(1, int(min(self.watch_timeout, resync_at - time.monotonic())))
+                    resource_version = self._watch(kind, resource_version, timeout)
+            except Exception as e:
+                if isinstance(e, WatchExpired) or getattr(e, 'status', None) == HTTP_GONE:
+                    # 오래된 resourceVersion: 기다리지 않고 바로 다시 list
+                    LOG.info("%s watch expired, relisting", kind)
+                    self.stats['expired'] += 1
+                    continue
+                LOG.warning("%s list/watch failed, retrying: %s", kind, e)
+                self.stats['errors'] += 1
+                self._stop.wait(RETRY_SECONDS)
+
+    def _relist(self, kind):
+        items, resource_version = self.api.list(kind, self.namespace, self.label_selector)
+        self.stats['lists'] += 1
+        fresh = {object_key(obj): obj for obj in items}
+        with self._lock:
+            current = self._objects[kind]
+            for key in [key for key in current if key not in fresh]:
+                self._delete(kind, key)
+            for key, obj in fresh.items():
+                self._put(kind, key, obj)
+        self._synced[kind].set()
+        return resource_version
+
+    def _watch(self, kind, resource_version, timeout):
+        for event in self.api.watch(kind, self.namespace, self.label_selector, resource_version, timeout):
+            if self._stop.is_set():
+                break
+            event_type, obj = event['type'], event['object']
+            if event_type == 'ERROR':
+                if obj.get('code') == HTTP_GONE:
+                    raise WatchExpired(obj.get('message'))
+                raise RuntimeError("watch error: {}".format(obj.get('message')))
+            resource_version = obj['metadata'].get('resourceVersion', resource_version)
+            if event_type == 'BOOKMARK':
+                continue
+            self.stats['events'] += 1
+            with self._lock:
+                if event_type == 'DELETED':
+                    self._delete(kind, object_key(obj))
+                else:
+                    self._put(kind, object_key(obj), obj)
+        return resource_version
+
+    def _put(self, kind, key, obj):
+        old = self._objects[kind].get(key)
+        if old is not None:
+            if old['metadata'].get('resourceVersion') == obj['metadata'].get('resourceVersion'):
+                return
+            self._unindex(kind, key, old)
+        self._objects[kind][key] = obj
+        for label, value in self._labels(obj):
+            self._index.setdefault((label, value), set()).add((kind, key))
+        self._notify('ADDED' if old is None else 'MODIFIED', kind, obj)
+
+    def _delete(self, kind, key):
+        obj = self._objects[kind].pop(key, None)
+        if obj is not None:
+            self._unindex(kind, key, obj)
+            self._notify('DELETED', kind, obj)
+
+    def _unindex(self, kind, key, obj):
+        for label, value in self._labels(obj):
+            keys = self._index.get((label, value))
+            if keys is not None:
+                keys.discard((kind, key))
+                if not keys:
+                    del self._index[(label, value)]
+
+    def _labels(self, obj):
+        labels = obj['metadata'].get('labels') or {}
+        return [(label, labels[label]) for label in INDEX_LABELS if label in labels]
+
+    def _notify(self, event_type, kind, obj):
+        for handler in self._handlers:
+            try:
+                handler(event_type, kind, obj)
+            except Exception as e:
+                LOG.error("Informer handler failed: %s", e)
@@ -0,0 +1,177 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import threading
+import time
+
+from kubernetes import client, config
+from kubernetes.client.rest import ApiException
+from urllib3.util.retry import Retry
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_POOL_MAXSIZE = 32
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_SECONDS = 0.5
+# 일시적인 오류로 보고 다시 시도할 API 응답 코드
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# 서버가 처리하기 전에 거절한 요청의 응답 코드: 멱등이 아닌 호출도 다시 시도할 수 있다.
+REJECTED_STATUSES = (429,)
+# 이 접두사로 시작하는 이름의 호출은 멱등이 아니다 (5xx 응답이어도 이미 생성되었을 수 있음).
+NON_IDEMPOTENT_PREFIXES = ('create_',)
+# server-side apply의 field manager
+FIELD_MANAGER = 'traindb-ml'
+
+
+class TDBKubeSession():
+    """A Kubernetes API client shared by all callers
+
+    The kubeconfig (or the in-cluster config) is loaded and the ApiClient
+    is built once, on first use, so every call reuses the same urllib3
+    connection pool. Connection errors are retried by urllib3 and API
+    errors with a status in RETRY_STATUSES by call(), both with exponential
+    backoff. A call that is not idempotent (a create) is retried only when
+    the server rejected it before running it (REJECTED_STATUSES), since
+    after a 5xx the object may have been created. call() also records the
+    latency of every call by name.
+    """
+
+    def __init__(self, pool_maxsize=DEFAULT_POOL_MAXSIZE, retries=DEFAULT_RETRIES,
+                 backoff_seconds=DEFAULT_BACKOFF_SECONDS, config_file=None, context=None):
+        self.pool_maxsize = pool_maxsize
+        self.retries = retries
+        self.backoff = backoff_seconds
+        self.config_file = config_file
+        self.context = context
+        self._api_client = None
+        self._apis = {}
+        self._dynamic = None
+        self._lock = threading.Lock()
+        self._timings = {}
+
+    @property
+    def api_client(self):
+        """The shared ApiClient, created on first use"""
+        if self._api_client is None:
+            with self._lock:
+                if self._api_client is None:
+                    self._api_client = client.ApiClient(self._configuration())
+        return self._api_client
+
+    def api(self, api_class):
+        """Return the shared instance of a Kubernetes API class (e.g. client.CoreV1Api)"""
+        api = self._apis.get(api_class)
+        if api is None:
+            api = self._apis.setdefault(api_class, api_class(self.api_client))
+        return api
+
+    @property
+    def core_v1(self):
+        return self.api(client.CoreV1Api)
+
+    @property
+    def dynamic(self):
+        """The shared DynamicClient (API discovery runs once, on first use)"""
+        if self._dynamic is None:
+            from kubernetes.dynamic import DynamicClient
+            api_client = self.api_client
+            with self._lock:
+                if self._dynamic is None:
+                    self._dynamic = DynamicClient(api_client)
+        return self._dynamic
+
+    def apply(self, body, field_manager=FIELD_MANAGER):
+        """Create or update an object from its manifest dict with server-side apply"""
+        resource = self.dynamic.resources.get(api_version=body['apiVersion'], kind=body['kind'])
+        metadata = body['metadata']
+        return self.call('apply_' + body['kind'].lower(), self.dynamic.server_side_apply, resource, body=body,
+                         name=metadata['name'], namespace=metadata.get('namespace'),
+                         field_manager=field_manager, force_conflicts=True)
+
+    def call(self, name, fn, *args, idempotent=None, **kwargs):
+        """Call fn, retrying transient API errors, and record its latency under name
+
+        Whether fn is idempotent is taken from name (NON_IDEMPOTENT_PREFIXES)
+        unless idempotent is given.
+        """
+        if idempotent is None:
+            idempotent = not name.startswith(NON_IDEMPOTENT_PREFIXES)
+        statuses = RETRY_STATUSES if idempotent else REJECTED_STATUSES
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except ApiException as e:
+                if e.status not in statuses or attempt >= self.retries:
+                    raise
+                delay = self.backoff * (2 ** attempt)
+                LOG.warning("%s failed with %s, retrying in %.1fs", name, e.status, delay)
+                attempt += 1
+            finally:
+                self._record(name, time.perf_counter() - start)
+            time.sleep(delay)
+
+    def timings(self):
+        """Return the call count and latency statistics of every call name"""
+        with self._lock:
+            return {name: {'count': count, 'total_seconds': total, 'mean_ms': total / count * 1000,
+                           'max_ms': longest * 1000}
+                    for name, (count, total, longest) in self._timings.items()}
+
+    def reset_timings(self):
+        with self._lock:
+            self._timings.clear()
+
+    def close(self):
+        """Close the pooled connections"""
+        with self._lock:
+            api_client, self._api_client = self._api_client, None
+            self._apis.clear()
+            self._dynamic = None
+        if api_client is not None:
+            api_client.close()
+
+    def _record(self, name, seconds):
+        with self._lock:
+            count, total, longest = self._timings.get(name, (0, 0.0, 0.0))
+            self._timings[name] = (count + 1, total + seconds, max(longest, seconds))
+
+    def _configuration(self):
+        configuration = client.Configuration()
+        try:
+            config.load_kube_config(config_file=self.config_file, context=self.context,
+                                    client_configuration=configuration)
+        except config.ConfigException:
+            # 클러스터 안의 pod에서는 service account 설정 사용
+            config.load_incluster_config(client_configuration=configuration)
+        configuration.connection_pool_maxsize = self.pool_maxsize
+        configuration.retries = Retry(total=self.retries, connect=self.retries, read=self.retries,
+                                      backoff_factor=self.backoff)
+        return configuration
+
+
+_default_session = None
+_default_session_lock = threading.Lock()
+
+
+def default_session():
+    """Return the process-wide TDBKubeSession, creating it on first use"""
+    global _default_session
+    if _default_session is None:
+        with _default_session_lock:
+            if _default_session is None:
+                _default_session = TDBKubeSession()
+    return _default_session
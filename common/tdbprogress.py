@@ -0,0 +1,84 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import sys
+import time
+
+# 로그에서 진행 이벤트를 구분하는 접두어
+PROGRESS_PREFIX = 'TDB_PROGRESS '
+DEFAULT_PROGRESS_STEPS = 100
+DEFAULT_PROGRESS_SECONDS = 10.0
+
+
+def parse_progress(line):
+    """Return the progress event of a log line, or None if it is not one"""
+    index = line.find(PROGRESS_PREFIX)
+    if index < 0:
+        return None
+    try:
+        return json.loads(line[index + len(PROGRESS_PREFIX):])
+    except ValueError:
+        return None
+
+
+class TDBProgress():
+    """Writes structured training progress events as log lines
+
+    A 'step' event (epoch, step, mean loss and samples/sec since the
+    previous event) is written every `steps` batches or `seconds` seconds,
+    whichever comes first, and an 'epoch' event with the evaluation
+    metrics at the end of every epoch. Each event is one line
+    'TDB_PROGRESS {json}' flushed immediately, so a log follower sees it
+    while the pod runs.
+    """
+
+    def __init__(self, steps=DEFAULT_PROGRESS_STEPS, seconds=DEFAULT_PROGRESS_SECONDS, rank=0, stream=None):
+        self.steps = steps
+        self.seconds = seconds
+        self.rank = rank
+        self.stream = stream if stream is not None else sys.stdout
+        self._reset()
+
+    def step(self, epoch, step, loss, samples):
+        """Record one training batch and write a step event when one is due
+
+        :param epoch: the epoch
+        :param step: the number of batches done in the epoch
+        :param loss: the mean loss of the batch
+        :param samples: the number of samples in the batch
+
+        """
+        self._loss += loss * samples
+        self._samples += samples
+        self._batches += 1
+        elapsed = time.monotonic() - self._since
+        if (self.steps > 0 and self._batches >= self.steps) or (self.seconds > 0 and elapsed >= self.seconds):
+            self.emit('step', epoch=epoch, step=step, loss=self._loss / max(self._samples, 1),
+                      samples_per_sec=self._samples / max(elapsed, 1e-9))
+            self._reset()
+
+    def epoch(self, epoch, metrics, seconds=None):
+        """Write an epoch event with the evaluation metrics"""
+        self.emit('epoch', epoch=epoch, seconds=seconds, **metrics)
+        self._reset()
+
+    def emit(self, event, **fields):
+        record = dict(event=event, rank=self.rank, time=time.time(), **fields)
+        self.stream.write(PROGRESS_PREFIX + json.dumps(record) + '\n')
+        self.stream.flush()
+
+    def _reset(self):
+        self._since = time.monotonic()
+        self._loss, self._samples, self._batches = 0.0, 0, 0
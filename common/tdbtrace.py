@@ -0,0 +1,232 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import bisect
+import collections
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LOG = logging.getLogger(__name__)
+
+METRIC_NAME = 'traindb_span_seconds'
+# Prometheus histogram 경계 (초)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 메모리에 보관할 최대 trace event 수 (넘으면 오래된 것부터 버림)
+DEFAULT_MAX_EVENTS = 100000
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def label_text(labels):
+    return ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+                    for k, v in sorted(labels.items()))
+
+
+def write_atomic(path, text):
+    # 읽는 쪽(node exporter 등)이 반쯤 쓰인 파일을 보지 않도록 rename으로 교체
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = '{}.tmp{}'.format(path, os.getpid())
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class TDBTracer():
+    """Named timing spans exported as Prometheus histograms and a Chrome trace
+
+    Every span updates a histogram of its name; when trace is set, it is
+    also kept as a trace event (at most max_events, oldest dropped) that
+    write_trace() saves in the Chrome trace event format, which
+    chrome://tracing and Perfetto open.
+
+        tracer = TDBTracer(labels={'rank': 0}, trace=True)
+        with tracer.span('train.optimizer'):
+            optimizer.step()
+        tracer.record('train.data', seconds)   # a duration measured by the caller
+        tracer.write_prometheus('/mnt/traces/metrics.prom')
+        tracer.write_trace('/mnt/traces/trace.json')
+
+    :param labels: constant labels of the exported metrics, e.g. {'rank': 0}
+    :param trace: whether to keep trace events
+    :param buckets: the histogram bucket bounds in seconds
+    :param max_events: the maximum number of trace events kept
+    """
+
+    def __init__(self, labels=None, trace=False, buckets=DEFAULT_BUCKETS, max_events=DEFAULT_MAX_EVENTS):
+        self.labels = dict(labels or {})
+        self.trace = trace
+        self.buckets = tuple(sorted(buckets))
+        self._histograms = {}  # name -> [bucket counts..., +Inf count, sum, max]
+        self._events = collections.deque(maxlen=max_events)
+        self._dropped = 0
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._started_at = time.time()
+        self._server = None
+
+    @contextlib.contextmanager
+    def span(self, name, **args):
+        """Time the body of a with statement as the span name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, start, **args)
+
+    def record(self, name, seconds, start=None, **args):
+        """Record a duration measured by the caller
+
+        :param name: the span name, e.g. 'train.data'
+        :param seconds: the duration
+        :param start: the time.perf_counter() value when the span started (for the trace)
+        :param args: extra trace event arguments
+
+        """
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = [0] * (len(self.buckets) + 1) + [0.0, 0.0]
+            histogram[index] += 1
+            histogram[-2] += seconds
+            histogram[-1] = max(histogram[-1], seconds)
+            if self.trace:
+                if len(self._events) == self._events.maxlen:
+                    self._dropped += 1
+                if start is None:
+                    start = time.perf_counter() - seconds
+                self._events.append({'name': name, 'cat': name.split('.')[0], 'ph': 'X',
+                                     'ts': (start - self._origin) * 1e6, 'dur': seconds * 1e6,
+                                     'pid': os.getpid(), 'tid': threading.get_ident(), 'args': args})
+
+    def stats(self):
+        """Return the count, total seconds, mean and max milliseconds of every span"""
+        with self._lock:
+            histograms = {name: list(h) for name, h in self._histograms.items()}
+        stats = {}
+        for name, histogram in histograms.items():
+            count = sum(histogram[:-2])
+            stats[name] = {'count': count, 'total_seconds': histogram[-2],
+                           'mean_ms': histogram[-2] / count * 1000 if count else 0.0, 'max_ms': histogram[-1] * 1000}
+        return stats
+
+    def totals(self, prefix=''):
+        """Return {name: total seconds} of the spans starting with prefix"""
+        return {name: s['total_seconds'] for name, s in self.stats().items() if name.startswith(prefix)}
+
+    def prometheus(self):
+        """Return the spans as a Prometheus histogram in the text exposition format"""
+        with self._lock:
+            histograms = {name: list(h) for name, h in self._histograms.items()}
+        lines = ['# HELP {} Duration of TrainDB-ML spans in seconds.'.format(METRIC_NAME),
+                 '# TYPE {} histogram'.format(METRIC_NAME)]
+        for name in sorted(histograms):
+            histogram = histograms[name]
+            labels = dict(self.labels, span=name)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), histogram[:-2]):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append('{}_bucket{{{}}} {}'.format(METRIC_NAME, label_text(dict(labels, le=le)), cumulative))
+            lines.append('{}_sum{{{}}} {!r}'.format(METRIC_NAME, label_text(labels), histogram[-2]))
+            lines.append('{}_count{{{}}} {}'.format(METRIC_NAME, label_text(labels), cumulative))
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """Write the metrics to a file (e.g. for the node exporter textfile collector)"""
+        write_atomic(path, self.prometheus())
+
+    def write_trace(self, path):
+        """Write the kept trace events to a Chrome trace JSON file"""
+        with self._lock:
+            events = list(self._events)
+            dropped = self._dropped
+        write_atomic(path, json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms',
+                                       'otherData': dict(self.labels, started_at=self._started_at,
+                                                         dropped_events=dropped)}))
+
+    def serve(self, port, host='0.0.0.0'):
+        """Serve the metrics at http://host:port/metrics from a background thread"""
+        tracer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = tracer.prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True, name='tracer-metrics').start()
+        return self._server.server_address[1]
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class TDBProfilerWindow():
+    """Captures a torch.profiler trace of a range of training steps
+
+    step() is called at the start of every training step; the profiler runs
+    from step start_step for num_steps steps and then writes a Chrome trace
+    to trace_path. Nothing is profiled when num_steps is 0.
+    """
+
+    def __init__(self, start_step, num_steps, trace_path):
+        self.start_step = start_step
+        self.num_steps = num_steps
+        self.trace_path = trace_path
+        self._step = 0
+        self._profiler = None
+
+    def step(self):
+        """Mark the start of a training step"""
+        if self.num_steps <= 0:
+            return
+        if self._profiler is not None and self._step >= self.start_step + self.num_steps:
+            self.close()
+        if self._step == self.start_step:
+            try:
+                from torch.profiler import ProfilerActivity, profile
+                self._profiler = profile(activities=[ProfilerActivity.CPU], record_shapes=True)
+            except ImportError:  # torch < 1.8.1
+                from torch.autograd.profiler import profile
+                self._profiler = profile(record_shapes=True)
+            self._profiler.__enter__()
+        self._step += 1
+
+    def close(self):
+        """Stop a running capture and write its trace"""
+        if self._profiler is None:
+            return
+        profiler, self._profiler = self._profiler, None
+        profiler.__exit__(None, None, None)
+        os.makedirs(os.path.dirname(os.path.abspath(self.trace_path)), exist_ok=True)
+        profiler.export_chrome_trace(self.trace_path)
+        LOG.info("Wrote the profile of steps %d-%d to %s", self.start_step, self._step - 1, self.trace_path)
@@ -12,7 +12,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import copy
 import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from unicodedata import name
 from venv import create
@@ -21,6 +26,8 @@ from os import path
 from kubernetes import client, config, utils
 from kubernetes.client.rest import ApiException
 
+from tdbkubesession import default_session
+
 LOG = logging.getLogger(__name__)
 TRAINDB_ML_SUCCESS = 1
 TRAINDB_ML_FAILURE = 0
@@ -41,11 +48,55 @@ VOL_POSTFIX = '-volume'
 CLAIM_POSTFIX = '-claim'
 PV_POSTFIX = '-pv.yaml'
 PVC_POSTFIX = '-pvc.yaml'
+# 동시에 provisioning 할 tenant 수
+PROVISION_WORKERS = 8
+
+# 한 번만 읽어 둔 템플릿 (경로 -> 파싱된 YAML)
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def load_template(filename):
+    """Return a deep copy of a YAML template, parsing the file only on first use"""
+    with _templates_lock:
+        if filename not in _templates:
+            with open(filename) as f:
+                _templates[filename] = yaml.load(f, Loader=yaml.FullLoader)
+        return copy.deepcopy(_templates[filename])
+
+
+def set_pv_fields(pv_config, name=TDB_NAME, system=SYSTEM_NAME, hostpath=HOST_PATH):
+    # PV 설정에 이름과 라벨 추가 (PVC selector가 찾는 템플릿의 다른 라벨은 유지)
+    pv_config['metadata']['name'] = name + VOL_POSTFIX
+    pv_config['metadata'].setdefault('labels', {}).update({'system': system, 'name': name + VOL_POSTFIX})
+    # PV 설정에 호스트 경로 추가
+    pv_config['spec']['hostPath']['path'] = hostpath
+    return pv_config
+
+
+def set_pvc_fields(pvc_config, name=TDB_NAME, system=SYSTEM_NAME):
+    # PVC 설정에 이름과 네임스페이스 추가
+    pvc_config['metadata'].update({'name': name + CLAIM_POSTFIX, 'namespace': name})
+    # PVC 설정에 selector 추가
+    pvc_config['spec']['selector']['matchLabels'].update({'system': system, 'name': name + VOL_POSTFIX})
+    return pvc_config
 
 
 class TrainDBMLInitializer():
-    def __init__(self, tdbnamespace=None) -> None:
+    def __init__(self, tdbnamespace=None, session=None) -> None:
         self.namespace = tdbnamespace
+        # Kubernetes client (kubeconfig 로딩, 연결 pool)는 모든 호출이 공유
+        self._session = session
+
+    @property
+    def session(self):
+        if self._session is None:
+            self._session = default_session()
+        return self._session
+
+    def timings(self):
+        # Kubernetes API 호출별 지연 시간 통계
+        return self.session.timings()
 
     def open_yaml(self, filename):
         with open(filename) as f:  # 파일을 열어서
@@ -53,23 +104,28 @@ class TrainDBMLInitializer():
         return pv_config  # pv_config 변수 반환
 
     def write_pv_yaml(self, filename, pv_config, name=TDB_NAME, system=SYSTEM_NAME, hostpath=HOST_PATH):
-        # PV 설정에 이름과 라벨 추가
-        pv_config['metadata'].update({'name': name + VOL_POSTFIX, 'labels': {'system': system, 'name': name + VOL_POSTFIX}})
-        # PV 설정에 호스트 경로 추가
-        pv_config['spec']['hostPath']['path'] = hostpath
-
+        set_pv_fields(pv_config, name, system, hostpath)
         with open(filename, 'w') as f:
             yaml.dump(pv_config, f)
 
     def write_pvc_yaml(self, filename, pv_config, name=TDB_NAME, system=SYSTEM_NAME, hostpath=HOST_PATH):
-        # PVC 설정에 이름과 네임스페이스 추가
-        pv_config['metadata'].update({'name': name + CLAIM_POSTFIX, 'namespace': name})
-        # PVC 설정에 selector 추가
-        pv_config['spec']['selector']['matchLabels'].update({'system': system, 'name': name + VOL_POSTFIX})
-
+        set_pvc_fields(pv_config, name, system)
         with open(filename, 'w') as f:
             yaml.dump(pv_config, f)
 
+    ### Render manifests in memory
+    def render_pv(self, namespace, conf_path=CONF_PATH, system=SYSTEM_NAME, hostpath=HOST_PATH):
+        # 템플릿으로 PV manifest 생성 (파일로 쓰지 않음)
+        return set_pv_fields(load_template(os.path.join(conf_path, PV_TEMPLATE)), namespace, system, hostpath)
+
+    def render_pvc(self, namespace, conf_path=CONF_PATH, system=SYSTEM_NAME):
+        # 템플릿으로 PVC manifest 생성 (파일로 쓰지 않음)
+        return set_pvc_fields(load_template(os.path.join(conf_path, PVC_TEMPLATE)), namespace, system)
+
+    def render_namespace(self, namespace, system=SYSTEM_NAME):
+        return {'apiVersion': 'v1', 'kind': 'Namespace',
+                'metadata': {'name': namespace, 'labels': {'system': system, 'subsystem': 'ml'}}}
+
     ### Create YAML files
     def create_pv_yaml_from_template(self, conf_path, namespace, system=SYSTEM_NAME, hostpath=HOST_PATH):
         # PV 템플릿 파일 열기
@@ -86,11 +142,9 @@ class TrainDBMLInitializer():
 
     ### Deploy PV, PVC using YAML files
     def deploy_yaml(self, yaml_file, namespace=HOST_PATH):
-        # Kubernetes API 설정
-        config.load_kube_config()
-        k8s_client = client.ApiClient()
         # YAML 파일로부터 PV, PVC 생성
-        return utils.create_from_yaml(k8s_client, yaml_file, verbose=True)
+        return self.session.call('create_from_yaml', utils.create_from_yaml,
+                                 self.session.api_client, yaml_file, verbose=True)
 
     def get_pv_filename(self, conf_path, namespace):
         # PV YAML 파일 경로 반환
@@ -100,13 +154,12 @@ class TrainDBMLInitializer():
         return conf_path + namespace + PVC_POSTFIX
 
     def create_namespace(self, namespace=None):
-        config.load_kube_config()
         if not namespace:
             print("namespace is not defined.")
             return TRAINDB_ML_FAILURE
-        v1 = client.CoreV1Api()
+        v1 = self.session.core_v1
         try:
-            v1.read_namespace(name=namespace)
+            self.session.call('read_namespace', v1.read_namespace, name=namespace)
         except ApiException:
             body = client.V1Namespace(
                 kind="Namespace",
@@ -114,7 +167,7 @@ class TrainDBMLInitializer():
                 metadata=client.V1ObjectMeta(name=namespace)
             )
             try:
-                v1.create_namespace(body=body)
+                self.session.call('create_namespace', v1.create_namespace, body=body)
             except ApiException as e:
                 LOG.error("Exception when calling CoreV1Api->read_namespace: %s", e)
                 return e
@@ -122,34 +175,51 @@ class TrainDBMLInitializer():
 
     def delete_namespace(self, namespace=None):
         # 네임스페이스 삭제
-        config.load_kube_config()
-        v1 = client.CoreV1Api()
+        v1 = self.session.core_v1
         try:
-            v1.read_namespace(name=namespace)
+            self.session.call('read_namespace', v1.read_namespace, name=namespace)
         except ApiException as e:
             LOG.error(
                 "Requested {namespace} does not exist. %s",
                 e,
             )
 
-        v1.delete_namespace(namespace)
+        self.session.call('delete_namespace', v1.delete_namespace, namespace)
 
 
     def init(self, tdb_namespace=NAMESPACE):
-        # PV, PVC YAML 파일 생성
-        self.create_pv_yaml_from_template(CONF_PATH, tdb_namespace, system=SYSTEM_NAME, hostpath=HOST_PATH)
-        self.create_pvc_yaml_from_template(CONF_PATH, tdb_namespace, system=SYSTEM_NAME, hostpath=HOST_PATH)
-
-        # PV, PVC 생성
-        if self.deploy_yaml(self.get_pv_filename(CONF_PATH, namespace=tdb_namespace)):
-            print("Persistent volume is created.")
-        else:
-            raise Exception("The requested persistent volume already existed.")
-
-        if self.deploy_yaml(self.get_pvc_filename(CONF_PATH, namespace=tdb_namespace)):
-            print("Persistent volume claim is created.")
-        else:
-            raise Exception("The requested persistent volume claim already existed.")
+        # 템플릿으로 만든 PV, PVC를 server-side apply로 생성 (중간 YAML 파일 없음)
+        self.session.apply(self.render_pv(tdb_namespace))
+        print("Persistent volume is applied.")
+        self.session.apply(self.render_pvc(tdb_namespace))
+        print("Persistent volume claim is applied.")
+
+    def provision(self, namespace, conf_path=CONF_PATH, system=SYSTEM_NAME, hostpath=HOST_PATH):
+        # tenant 하나의 namespace, PV, PVC를 apply 하고 단계별 소요 시간을 반환
+        result = {'namespace': namespace, 'status': 'ok', 'steps': {}}
+        start = time.perf_counter()
+        manifests = (('namespace', lambda: self.render_namespace(namespace, system)),
+                     ('pv', lambda: self.render_pv(namespace, conf_path, system, hostpath)),
+                     ('pvc', lambda: self.render_pvc(namespace, conf_path, system)))
+        for step, render in manifests:
+            step_start = time.perf_counter()
+            try:
+                self.session.apply(render())
+            except Exception as e:
+                LOG.error("Failed to provision %s of %s: %s", step, namespace, e)
+                result.update(status='error', failed_step=step, error=str(e))
+                break
+            result['steps'][step] = time.perf_counter() - step_start
+        result['seconds'] = time.perf_counter() - start
+        return result
+
+    def provision_many(self, namespaces, max_workers=PROVISION_WORKERS, conf_path=CONF_PATH,
+                       system=SYSTEM_NAME, hostpath=HOST_PATH):
+        # 여러 tenant를 동시에 provisioning 하고 tenant별 결과 반환
+        # 반환값: namespace -> {'status': 'ok' | 'error', 'steps', 'seconds', 'failed_step', 'error'}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(lambda ns: self.provision(ns, conf_path, system, hostpath), namespaces)
+            return {result['namespace']: result for result in results}
 
 ##################################################################################################################
 if __name__ == "__main__":
@@ -19,6 +19,7 @@ class TDBModelInfo():
 
     def __init__(self, registry, name_prefix, tag, modeltype):
         self.registry, self.tag = registry, tag
+        self.modeltype = modeltype
         self.image_name = name_prefix + modeltype
 
     def full_image_name(self, tag):
@@ -46,4 +47,23 @@ class TDBModelInfo():
     def volume_name(self):
         """Return the persistent volume name
         """
-        return tdbconstants.DEFAULT_VOLUME_NAME
\ No newline at end of file
+        return tdbconstants.DEFAULT_VOLUME_NAME
+
+    def catalog_record(self, modelname, tag=None, model_path=None, hyperparams=None, metrics=None, version=None):
+        """Return the model catalog record of a model of this type (see TDBModelCatalog.register)
+
+        With a version, the version is also the catalog tag, so every
+        trained version is its own catalog entry.
+
+        :param modelname: the model name for TrainDB-ML
+        :param tag: the image tag (the tag of this info if None)
+        :param model_path: the path of the trained model on the PVC
+        :param hyperparams: the training hyperparams
+        :param metrics: a dict of metric name to number
+        :param version: the model version, e.g. its TDBArtifactStore version
+
+        """
+        tag = tag or self.tag
+        return dict(modeltype=self.modeltype, modelname=modelname, tag=version or tag,
+                    image=self.full_image_name(tag), pvc_name=self.pvc_name(), model_path=model_path,
+                    version=version, hyperparams=hyperparams, metrics=metrics)
@@ -0,0 +1,145 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# TrainDB-ML daemon(tdbdaemon.py)의 thin client
+#
+# 표준 라이브러리만 import 하므로 kfp, kserve, kubernetes를 읽는 시간 없이 바로 요청을 보낸다.
+#
+#   python tdbctl.py provision tenant-a tenant-b
+#   python tdbctl.py train cnn mnist --namespace traindb --workers 2 --arg=--epochs --arg=5
+
+import argparse
+import itertools
+import json
+import os
+import socket
+import sys
+import time
+
+DEFAULT_SOCKET_PATH = os.environ.get('TRAINDB_ML_SOCKET', '/tmp/traindb-ml.sock')
+
+
+class TDBDaemonError(Exception):
+    """An error returned by the TrainDB-ML daemon"""
+
+
+class TDBDaemonClient():
+    """A JSON-lines client of the TrainDB-ML daemon over its Unix socket
+
+    The connection is opened on first use and kept; call_many() pipelines
+    its requests over it, so they can be batched by the daemon.
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, timeout=None):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._sock = None
+        self._reader = None
+        self._ids = itertools.count(1)
+
+    def call(self, op, **args):
+        """Send one request and return its result, raising TDBDaemonError on failure"""
+        result = self.call_many([(op, args)])[0]
+        if isinstance(result, TDBDaemonError):
+            raise result
+        return result
+
+    def call_many(self, requests):
+        """Send (op, args) requests at once and return their results in order (TDBDaemonError for failures)"""
+        self._connect()
+        ids = []
+        lines = []
+        for op, args in requests:
+            request_id = next(self._ids)
+            ids.append(request_id)
+            lines.append(json.dumps({'id': request_id, 'op': op, 'args': args}))
+        self._sock.sendall(('\n'.join(lines) + '\n').encode('utf-8'))
+        responses = {}
+        while len(responses) < len(ids):
+            line = self._reader.readline()
+            if not line:
+                self.close()
+                raise TDBDaemonError("The daemon closed the connection.")
+            response = json.loads(line)
+            responses[response.get('id')] = response
+        return [responses[i]['result'] if responses[i].get('ok') else TDBDaemonError(responses[i].get('error'))
+                for i in ids]
+
+    def close(self):
+        if self._sock is not None:
+            self._reader.close()
+            self._sock.close()
+            self._sock = self._reader = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _connect(self):
+        if self._sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._sock, self._reader = sock, sock.makefile('r', encoding='utf-8')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='TrainDB-ML daemon client')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET_PATH)
+    parser.add_argument('--timeout', type=float, default=None)
+    commands = parser.add_subparsers(dest='op', required=True)
+    commands.add_parser('ping')
+    commands.add_parser('stats')
+    provision = commands.add_parser('provision', help='create the namespace, PV and PVC of tenants')
+    provision.add_argument('namespaces', nargs='+')
+    serve = commands.add_parser('serve', help='deploy or update an InferenceService and wait until it is ready')
+    serve.add_argument('modeltype')
+    serve.add_argument('modelname')
+    serve.add_argument('uri_storage')
+    serve.add_argument('--namespace', required=True)
+    train = commands.add_parser('train', help='queue a PyTorchJob')
+    train.add_argument('modeltype')
+    train.add_argument('modelname')
+    train.add_argument('--namespace', required=True)
+    train.add_argument('--priority', type=int, default=0)
+    train.add_argument('--workers', type=int, default=1)
+    train.add_argument('--tag', default='latest')
+    train.add_argument('--arg', action='append', default=[], help='an argument of tdbddp.py (repeatable)')
+    status = commands.add_parser('status', help='the state of a queued PyTorchJob')
+    status.add_argument('name')
+    status.add_argument('--namespace', default=None, help='needed when the name is queued in several namespaces')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    request = {k: v for k, v in vars(args).items() if k not in ('socket', 'timeout', 'op')}
+    if 'arg' in request:
+        request['args'] = request.pop('arg')
+    started = time.perf_counter()
+    try:
+        with TDBDaemonClient(args.socket, args.timeout) as client:
+            result = client.call(args.op, **request)
+    except (OSError, TDBDaemonError) as e:
+        print("error: {}".format(e), file=sys.stderr)
+        return 1
+    print(json.dumps(result, indent=2, sort_keys=True))
+    print("{:.1f} ms".format((time.perf_counter() - started) * 1000), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
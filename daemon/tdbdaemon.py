@@ -0,0 +1,354 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# TrainDB-ML control-plane daemon
+#
+# Kubernetes, KServe, Training Operator client를 한 번만 만들어 두고 Unix socket으로
+# JSON line 요청(train, serve, provision, status)을 받는다.
+#
+#   python tdbdaemon.py --socket /tmp/traindb-ml.sock --preload
+
+import argparse
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+for directory in ('../common', '../inference', '../training'):
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), directory))
+
+from tdbctl import DEFAULT_SOCKET_PATH
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 32
+DEFAULT_BATCH_WAIT_MS = 20.0
+DEFAULT_MAX_BATCH_SIZE = 64
+MAX_LINE_BYTES = 1 << 20
+
+
+class TDBRequestBatcher():
+    """Collects requests of one kind for batch_wait_ms and runs them in one batch_fn call
+
+    batch_fn receives the list of request args and returns one result per
+    request (an Exception instance fails only its own request). Batches
+    run on executor, so a slow batch does not hold back the next one.
+    """
+
+    def __init__(self, batch_fn, executor, batch_wait_ms=DEFAULT_BATCH_WAIT_MS,
+                 max_batch_size=DEFAULT_MAX_BATCH_SIZE):
+        self.batch_fn = batch_fn
+        self.executor = executor
+        self.batch_wait = batch_wait_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._pending = []
+        self._timer = None
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'batches': 0, 'max_batch_size': 0}
+
+    def submit(self, args):
+        """Queue the args of one request and return a future of its result"""
+        future = Future()
+        with self._lock:
+            self._pending.append((args, future))
+            self.stats['requests'] += 1
+            if len(self._pending) >= self.max_batch_size:
+                self._flush_locked()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.batch_wait, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+        return future
+
+    def _flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            self.stats['batches'] += 1
+            self.stats['max_batch_size'] = max(self.stats['max_batch_size'], len(batch))
+            self.executor.submit(self._run, batch)
+
+    def _run(self, batch):
+        try:
+            results = self.batch_fn([args for args, _ in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+class TDBControlPlane():
+    """The TrainDB-ML operations of the daemon, on clients created once and kept warm
+
+    Each client (Kubernetes session, TrainingClient and job scheduler,
+    KServe) is imported and created on the first request that needs it, or
+    at start with preload(). provision and serve requests arriving within
+    batch_wait_ms of each other are run as one batch: one provision_many()
+    thread pool, and one InferenceService rollout with a single watch per
+    namespace. serve creates the InferenceService, or updates it when the
+    model is already served.
+    """
+
+    def __init__(self, executor, batch_wait_ms=DEFAULT_BATCH_WAIT_MS, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 quotas=None):
+        self.quotas = quotas
+        self.started_at = time.time()
+        self._lock = threading.RLock()
+        self._clients = {}
+        self.counts = {}
+        self.batchers = {
+            'provision': TDBRequestBatcher(self._provision_batch, executor, batch_wait_ms, max_batch_size),
+            'serve': TDBRequestBatcher(self._serve_batch, executor, batch_wait_ms, max_batch_size),
+        }
+        self.ops = {'ping': self.ping, 'stats': self.stats, 'train': self.train, 'status': self.status}
+
+    def handle(self, op, args):
+        """Return a future of the result of one request"""
+        self.counts[op] = self.counts.get(op, 0) + 1
+        if op in self.batchers:
+            return self.batchers[op].submit(args)
+        future = Future()
+        if op not in self.ops:
+            future.set_exception(ValueError("Unknown op: {} (expected one of {})".format(
+                op, sorted(set(self.ops) | set(self.batchers)))))
+            return future
+        try:
+            future.set_result(self.ops[op](**args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def preload(self):
+        """Import and create every client now instead of on first use"""
+        for name in ('session', 'initializer', 'scheduler', 'kserve_api'):
+            self._client(name)
+
+    def ping(self):
+        return {'pid': os.getpid(), 'uptime_seconds': time.time() - self.started_at,
+                'warm': sorted(self._clients)}
+
+    def stats(self):
+        stats = {'requests': dict(self.counts),
+                 'batches': {op: dict(b.stats) for op, b in self.batchers.items()}}
+        if 'session' in self._clients:
+            stats['kubernetes'] = self._clients['session'].timings()
+        if 'scheduler' in self._clients:
+            stats['scheduler'] = dict(self._clients['scheduler'].stats)
+        return stats
+
+    def train(self, modeltype, modelname, namespace, priority=0, workers=1, args=None, tag='latest'):
+        from tdbscheduler import TDBTrainRequest
+        request = TDBTrainRequest(modeltype, modelname, namespace, priority, workers, args, tag)
+        return {'name': self._client('scheduler').submit(request)}
+
+    def status(self, name, namespace=None):
+        return {'name': name, 'namespace': namespace, 'state': self._client('scheduler').status(name, namespace)}
+
+    def _provision_batch(self, requests):
+        namespaces = list(dict.fromkeys(ns for request in requests for ns in request['namespaces']))
+        results = self._client('initializer').provision_many(namespaces)
+        return [{ns: results[ns] for ns in request['namespaces']} for request in requests]
+
+    def _serve_batch(self, requests):
+        from tdbdeploy import TDBBulkDeployer, isvc_spec, serving_name
+        results = {}
+        for namespace in sorted(set(request['namespace'] for request in requests)):
+            specs = [isvc_spec(r['modeltype'], r['modelname'], namespace, r['uri_storage'])
+                     for r in requests if r['namespace'] == namespace]
+            deployed = TDBBulkDeployer(self._client('kserve_api')).deploy(specs, namespace)
+            results.update({(namespace, name): result for name, result in deployed.items()})
+        return [results[(r['namespace'], serving_name(r['modeltype'], r['modelname']))] for r in requests]
+
+    def _client(self, name):
+        # import와 kubeconfig 로딩은 처음 한 번만
+        with self._lock:
+            client = self._clients.get(name)
+            if client is None:
+                started = time.perf_counter()
+                client = self._clients[name] = getattr(self, '_create_' + name)()
+                LOG.info("Created %s in %.2fs", name, time.perf_counter() - started)
+            return client
+
+    def _create_session(self):
+        from tdbkubesession import default_session
+        session = default_session()
+        session.api_client
+        return session
+
+    def _create_initializer(self):
+        from traindb_ml_initializer import TrainDBMLInitializer
+        return TrainDBMLInitializer(session=self._client('session'))
+
+    def _create_scheduler(self):
+        from kubeflow.training import TrainingClient
+        from tdbscheduler import TDBJobScheduler
+        from traindbmodelinfo import TDBModelInfo
+        model_info = TDBModelInfo("traindb", "traindb-ml-", "latest", "train")
+        return TDBJobScheduler(TrainingClient(), model_info, quotas=self.quotas).start()
+
+    def _create_kserve_api(self):
+        from tdbdeploy import KServeAPI
+        return KServeAPI()
+
+    def close(self):
+        if 'scheduler' in self._clients:
+            self._clients['scheduler'].stop()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    # 연결 하나에서 여러 요청을 이어서 받고, 끝난 순서대로 응답 (id로 구분)
+    def handle(self):
+        control_plane = self.server.control_plane
+        write_lock = threading.Lock()
+        tasks = []
+
+        def respond(request_id, result=None, error=None):
+            if error is None:
+                response = {'id': request_id, 'ok': True, 'result': result}
+            else:
+                response = {'id': request_id, 'ok': False, 'error': '{}: {}'.format(type(error).__name__, error)}
+            data = (json.dumps(response, default=str) + '\n').encode('utf-8')
+            with write_lock:
+                try:
+                    self.wfile.write(data)
+                    self.wfile.flush()
+                except (OSError, ValueError):  # client가 끊었거나 wfile이 닫힌 경우
+                    pass
+
+        def run(request):
+            # 응답을 쓴 뒤에 task가 끝나므로 handle()은 모든 응답이 쓰인 뒤에 반환된다.
+            try:
+                result = control_plane.handle(request['op'], request.get('args') or {}).result()
+            except Exception as e:
+                respond(request.get('id'), error=e)
+            else:
+                respond(request.get('id'), result)
+
+        while True:
+            line = self.rfile.readline(MAX_LINE_BYTES)
+            if not line:
+                break
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict) or 'op' not in request:
+                    raise ValueError("A request must be a JSON object with an 'op'.")
+            except ValueError as e:
+                respond(None, error=e)
+                continue
+            tasks.append(self.server.executor.submit(run, request))
+        for task in tasks:
+            task.result()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class TDBDaemon():
+    """Serves a TDBControlPlane on a Unix socket, one JSON request or response per line
+
+    Request: {"id": 1, "op": "provision", "args": {"namespaces": ["tenant-a"]}}
+    Response: {"id": 1, "ok": true, "result": ...} or {"id": 1, "ok": false, "error": "..."}
+
+    Requests on one connection are handled concurrently and answered as
+    they finish, so a client can pipeline them (see tdbctl.TDBDaemonClient).
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, workers=DEFAULT_WORKERS,
+                 batch_wait_ms=DEFAULT_BATCH_WAIT_MS, max_batch_size=DEFAULT_MAX_BATCH_SIZE, control_plane=None):
+        self.socket_path = socket_path
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        # batch 실행은 요청 처리와 다른 pool에서 (요청 thread가 batch 결과를 기다리므로)
+        self.batch_executor = ThreadPoolExecutor(max_workers=workers)
+        self.control_plane = control_plane or TDBControlPlane(self.batch_executor, batch_wait_ms, max_batch_size)
+        self._server = None
+
+    def start(self):
+        """Listen on the socket and serve from a background thread"""
+        self._remove_stale_socket()
+        self._server = _Server(self.socket_path, _Handler)
+        os.chmod(self.socket_path, 0o600)
+        self._server.control_plane = self.control_plane
+        self._server.executor = self.executor
+        threading.Thread(target=self._server.serve_forever, daemon=True, name='tdbdaemon').start()
+        LOG.info("Listening on %s", self.socket_path)
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            os.remove(self.socket_path)
+        self.control_plane.close()
+        self.executor.shutdown(wait=False)
+        self.batch_executor.shutdown(wait=False)
+
+    def _remove_stale_socket(self):
+        if not os.path.exists(self.socket_path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+        except OSError:
+            os.remove(self.socket_path)  # 이전 daemon이 남긴 socket 파일
+            return
+        finally:
+            probe.close()
+        raise RuntimeError("A daemon is already listening on {}".format(self.socket_path))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='TrainDB-ML control-plane daemon')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET_PATH)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--batch-wait-ms', type=float, default=DEFAULT_BATCH_WAIT_MS)
+    parser.add_argument('--max-batch-size', type=int, default=DEFAULT_MAX_BATCH_SIZE)
+    parser.add_argument('--quotas', default='', help='per-namespace PyTorchJob quotas (JSON)')
+    parser.add_argument('--preload', action='store_true', help='create every client at start')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    daemon = TDBDaemon(args.socket, args.workers, args.batch_wait_ms, args.max_batch_size)
+    daemon.control_plane.quotas = json.loads(args.quotas) if args.quotas else None
+    if args.preload:
+        daemon.control_plane.preload()
+    daemon.start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -12,121 +12,287 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import os # os 모듈 import
-import subprocess # subprocess 모듈 import
-
-
-# 현재 디렉토리에서 소스 코드 파일을 찾는다.
-for file in os.listdir():
-    if file.endswith(".py"):
-        source_file = file
-
-# 도커 이미지를 생성할 때 사용할 베이스 이미지를 정한다.
-base_image = "python:3.8-slim"
-
-# 도커 파일을 생성할 경로와 이름을 정한다.
-dockerfile_path = "./Dockerfile"
-
-# 도커 파일을 생성한다.
-with open(dockerfile_path, "w") as f:
-    # 베이스 이미지를 사용한다는 것을 명시한다.
-    f.write(f"FROM {base_image}\n\n")
-    
-    # 소스 코드 파일을 도커 이미지 내부로 복사한다.
-    f.write("COPY " + source_file + " /app/\n\n")
-    
-    # 필요한 라이브러리를 설치한다.
-    f.write("RUN pip install --no-cache-dir -r /app/requirements.txt\n\n")
-    
-    # 컨테이너가 시작될 때 실행할 명령어를 정한다.
-    f.write("CMD [\"python\", \"/app/" + source_file + "\"]\n")
-
-# 현재 디렉토리에 있는 모든 파일과 디렉토리를 리스트로 반환
-files = os.listdir()
-
-# requirements.txt 파일 생성
-with open('requirements.txt', 'w') as f:
-    # 현재 디렉토리에서 실행 가능한 pip 명령어 실행
-    result = subprocess.run(['pip', 'freeze'], stdout=subprocess.PIPE)
-    # 실행 결과를 requirements.txt 파일에 작성
-    f.write(result.stdout.decode('utf-8'))
-
-
-
-# Dockerfile Generator라는 프로그램을 사용할 수 있습니다. 
-# 예를 들어, Python 소스 코드를 Docker 이미지로 빌드하기 위한 Dockerfile을 생성하려면, 
-# Dockerfile Generator를 사용하여 필요한 모든 구성 요소를 지정하고 Dockerfile을 자동으로 생성할 수 있습니다. 
-# 이를 통해 Dockerizing your Python application의 작업을 보다 쉽게 수행할 수 있습니다.
-
-# Dockerfile Generator API를 이용하여 자동화된 방식으로 Docker 이미지를 생성하는 구체적인 예를 들어보겠습니다.
-
-# 1. Flask 어플리케이션을 Docker 이미지로 빌드하는 경우:
-
-# ```python
-# import requests
-
-# app_name = 'my-flask-app'
-# app_version = 'v1'
-# dockerfile_url = 'https://dockerfile-generator.com/api/dockerfile/flask'
-# params = {
-#     'app_name': app_name,
-#     'app_version': app_version,
-#     'requirements': 'requirements.txt',
-#     'entry_point': 'app.py',
-#     'port': 5000
-# }
-
-# # Dockerfile 생성 요청
-# response = requests.post(dockerfile_url, params=params)
-
-# # 생성된 Dockerfile 다운로드
-# dockerfile = response.content
-
-# # Dockerfile을 이용하여 Docker 이미지 빌드
-# build_url = 'https://dockerfile-generator.com/api/build'
-# files = {'dockerfile': dockerfile}
-# params = {'t': f'{app_name}:{app_version}'}
-# response = requests.post(build_url, files=files, params=params)
-
-# # 빌드된 Docker 이미지 다운로드
-# image_url = f'https://dockerfile-generator.com/images/{app_name}:{app_version}'
-# response = requests.get(image_url)
-# image = response.content
-# ```
-
-# 2. Django 어플리케이션을 Docker 이미지로 빌드하는 경우:
-
-# ```python
-# import requests
-
-# app_name = 'my-django-app'
-# app_version = 'v1'
-# dockerfile_url = 'https://dockerfile-generator.com/api/dockerfile/django'
-# params = {
-#     'app_name': app_name,
-#     'app_version': app_version,
-#     'requirements': 'requirements.txt',
-#     'entry_point': 'manage.py',
-#     'port': 8000
-# }
-
-# # Dockerfile 생성 요청
-# response = requests.post(dockerfile_url, params=params)
-
-# # 생성된 Dockerfile 다운로드
-# dockerfile = response.content
-
-# # Dockerfile을 이용하여 Docker 이미지 빌드
-# build_url = 'https://dockerfile-generator.com/api/build'
-# files = {'dockerfile': dockerfile}
-# params = {'t': f'{app_name}:{app_version}'}
-# response = requests.post(build_url, files=files, params=params)
-
-# # 빌드된 Docker 이미지 다운로드
-# image_url = f'https://dockerfile-generator.com/images/{app_name}:{app_version}'
-# response = requests.get(image_url)
-# image = response.content
-# ```
-
-# 위의 코드는 Flask와 Django 어플리케이션을 Docker 이미지로 빌드하는 구체적인 예시입니다. 
-# Dockerfile Generator API를 이용하여 다른 프레임워크나 언어에 대해서도 Docker 이미지를 자동화된 방식으로 생성할 수 있습니다.
\ No newline at end of file
+# 소스 코드의 import에서 의존성을 찾아 multi-stage Dockerfile을 만들고 이미지를 빌드한다.
+#
+#   python tdbdocker.py --tag traindb/traindb-ml-serve:latest --entry tdbmlserve.py \
+#       --source ../inference --source ../common --source ../metadata
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+try:
+    from importlib import metadata as importlib_metadata
+except ImportError:  # Python < 3.8
+    importlib_metadata = None
+
+# 도커 이미지를 생성할 때 사용할 베이스 이미지 (고정하는 패키지 버전과 맞도록 현재 Python과 같은 버전)
+BASE_IMAGE = "python:{}.{}-slim".format(*sys.version_info[:2])
+DOCKERFILE = "Dockerfile"
+REQUIREMENTS = "requirements.txt"
+APP_DIR = "/app"
+# 빌드 컨텍스트 hash를 기록하는 이미지 label
+CONTEXT_HASH_LABEL = "traindb.context-hash"
+
+# import 이름과 배포 패키지 이름이 다른 경우
+PACKAGE_NAMES = {
+    'yaml': 'PyYAML',
+    'pymysql': 'PyMySQL',
+    'jaydebeapi': 'JayDeBeApi',
+    'sklearn': 'scikit-learn',
+    'PIL': 'Pillow',
+    'cv2': 'opencv-python',
+    'kubeflow': 'kubeflow-training',
+    'google': 'protobuf',
+}
+
+# sys.stdlib_module_names가 없는 Python(< 3.10)에서 사용할 표준 라이브러리 목록
+STDLIB_MODULES = {
+    'abc', 'argparse', 'array', 'ast', 'asyncio', 'base64', 'bisect', 'builtins', 'bz2', 'calendar',
+    'collections', 'concurrent', 'configparser', 'contextlib', 'copy', 'csv', 'ctypes', 'dataclasses',
+    'datetime', 'decimal', 'enum', 'errno', 'functools', 'gc', 'getpass', 'glob', 'gzip', 'hashlib',
+    'heapq', 'hmac', 'html', 'http', 'importlib', 'inspect', 'io', 'ipaddress', 'itertools', 'json',
+    'logging', 'lzma', 'math', 'mmap', 'multiprocessing', 'operator', 'os', 'pathlib', 'pickle',
+    'platform', 'pprint', 'queue', 'random', 're', 'select', 'selectors', 'shlex', 'shutil', 'signal',
+    'socket', 'socketserver', 'sqlite3', 'ssl', 'stat', 'statistics', 'string', 'struct', 'subprocess',
+    'sys', 'tarfile', 'tempfile', 'textwrap', 'threading', 'time', 'timeit', 'traceback', 'types',
+    'typing', 'unittest', 'urllib', 'uuid', 'warnings', 'weakref', 'xml', 'zipfile', 'zlib',
+}
+
+
+def source_files(sources, exclude=()):
+    """Return the .py files under the source files and directories, skipping the exclude directories"""
+    exclude = set(os.path.abspath(e) for e in exclude)
+    files = []
+    for source in sources:
+        if os.path.isfile(source):
+            files.append(source)
+            continue
+        for root, dirs, names in os.walk(source):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.') and d != '__pycache__'
+                             and os.path.abspath(os.path.join(root, d)) not in exclude)
+            files.extend(os.path.join(root, name) for name in sorted(names) if name.endswith('.py'))
+    return files
+
+
+def local_modules(files):
+    """Return the module names defined by the source files themselves"""
+    names = set()
+    for path in files:
+        names.add(os.path.splitext(os.path.basename(path))[0])
+        directory = os.path.dirname(os.path.abspath(path))
+        if os.path.exists(os.path.join(directory, '__init__.py')):
+            names.add(os.path.basename(directory))
+    return names
+
+
+def imported_modules(files):
+    """Return the top-level names of the absolute imports in files"""
+    names = set()
+    for path in files:
+        with open(path, 'rb') as f:
+            try:
+                tree = ast.parse(f.read(), filename=path)
+            except SyntaxError as e:
+                print("Skipping {}: {}".format(path, e))
+                continue
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names.update(alias.name.split('.')[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                names.add(node.module.split('.')[0])
+    return names
+
+
+def third_party_modules(files):
+    """Return the imported names that are neither standard library nor local modules"""
+    stdlib = set(getattr(sys, 'stdlib_module_names', STDLIB_MODULES))
+    return sorted(imported_modules(files) - stdlib - local_modules(files) - {'__future__'})
+
+
+def requirements(files, pin=True):
+    """Return the requirement lines of the third-party imports in files
+
+    An import is mapped to its distribution through the installed packages
+    (or PACKAGE_NAMES) and pinned to the installed version when pin is set.
+    """
+    distributions = {}
+    if importlib_metadata is not None and hasattr(importlib_metadata, 'packages_distributions'):
+        distributions = importlib_metadata.packages_distributions()
+    lines = set()
+    for module in third_party_modules(files):
+        package = PACKAGE_NAMES.get(module) or (distributions.get(module) or [module])[0]
+        version = None
+        if pin and importlib_metadata is not None:
+            try:
+                version = importlib_metadata.version(package)
+            except importlib_metadata.PackageNotFoundError:
+                pass
+        lines.add("{}=={}".format(package, version) if version else package)
+    return sorted(lines, key=str.lower)
+
+
+def dockerfile(entry, sources, base_image=BASE_IMAGE):
+    """Return a multi-stage Dockerfile
+
+    The first stage installs requirements.txt into /install; the final
+    stage copies only the installed packages and then each source
+    directory as its own layer, so a code change rebuilds none of the
+    dependency layers.
+
+    :param entry: the script run by the container, relative to its source directory
+    :param sources: the source directories in the build context, copied to /app/<name>/
+    :param base_image: the base image of both stages
+
+    """
+    lines = [
+        "FROM {} AS deps".format(base_image),
+        "COPY {} /tmp/{}".format(REQUIREMENTS, REQUIREMENTS),
+        "RUN pip install --no-cache-dir --prefix=/install -r /tmp/{}".format(REQUIREMENTS),
+        "",
+        "FROM {}".format(base_image),
+        "COPY --from=deps /install /usr/local",
+    ]
+    # 공통 모듈을 먼저, entry가 있는 디렉토리를 마지막 layer로 복사한다.
+    for source in reversed(sources):
+        lines.append("COPY {}/ {}/{}/".format(source, APP_DIR, source))
+    lines.append("ENV PYTHONPATH={}".format(':'.join('{}/{}'.format(APP_DIR, s) for s in sources)))
+    lines.append("CMD {}".format(json.dumps(['python', '{}/{}/{}'.format(APP_DIR, sources[0], entry)])))
+    return '\n'.join(lines) + '\n'
+
+
+def context_hash(context, paths):
+    """Return the sha256 of the relative paths and contents of paths in the build context"""
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(os.path.relpath(path, context).encode('utf-8') + b'\0')
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def image_info(tag):
+    """Return the size, layers and context hash of a local image, or None"""
+    result = subprocess.run(['docker', 'image', 'inspect', tag], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        return None
+    info = json.loads(result.stdout.decode('utf-8'))[0]
+    labels = (info.get('Config') or {}).get('Labels') or {}
+    return {'id': info['Id'], 'size': info['Size'], 'layers': info['RootFS'].get('Layers', []),
+            'context_hash': labels.get(CONTEXT_HASH_LABEL)}
+
+
+class TDBImageBuilder():
+    """Builds a slim TrainDB-ML image from the imports of its source directories
+
+    The source directories are copied into the build context, requirements.txt
+    lists only the third-party packages they import, and the Dockerfile is a
+    multi-stage build with dependencies and code in separate layers. The
+    build is skipped when the image already carries the same context hash.
+
+    :param tag: the image tag
+    :param entry: the script run by the container, in the first source directory
+    :param sources: the source directories (the first one holds entry)
+    :param context: the build context directory
+    :param base_image: the base image
+    :param extra_requirements: requirement lines to add, e.g. packages imported dynamically
+
+    Packages are pinned to the installed versions only with the default
+    base image, whose Python matches the running one; another base image
+    may have a Python those versions have no wheels for.
+    """
+
+    def __init__(self, tag, entry, sources, context='.', base_image=BASE_IMAGE, extra_requirements=()):
+        self.tag = tag
+        self.entry = entry
+        self.sources = [os.path.abspath(s) for s in sources]
+        self.context = os.path.abspath(context)
+        self.base_image = base_image
+        self.extra_requirements = list(extra_requirements)
+
+    def prepare(self):
+        """Write the sources, requirements.txt and Dockerfile into the build context and return its hash"""
+        # build context가 source 안에 있으면 (기본값 ./build) 이전에 복사한 파일을 다시 읽지 않는다.
+        files = source_files(self.sources, exclude=[self.context])
+        names = []
+        context_files = []
+        for source in self.sources:
+            name = os.path.basename(source.rstrip(os.sep))
+            names.append(name)
+            copied = os.path.join(self.context, name)
+            # 지워진 source가 hash 없이 이미지에 남지 않도록 이전에 복사한 디렉토리를 비운다.
+            if os.path.isdir(copied) and not any(s == copied or s.startswith(copied + os.sep) for s in self.sources):
+                shutil.rmtree(copied)
+            for path in source_files([source], exclude=[self.context]):
+                target = os.path.join(self.context, name, os.path.relpath(path, source))
+                if os.path.abspath(path) != os.path.abspath(target):
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    with open(path, 'rb') as src, open(target, 'wb') as dst:
+                        dst.write(src.read())
+                context_files.append(target)
+        with open(os.path.join(self.context, REQUIREMENTS), 'w') as f:
+            pinned = requirements(files, pin=self.base_image == BASE_IMAGE)
+            f.write('\n'.join(sorted(set(pinned) | set(self.extra_requirements))) + '\n')
+        with open(os.path.join(self.context, DOCKERFILE), 'w') as f:
+            f.write(dockerfile(self.entry, names, self.base_image))
+        context_files += [os.path.join(self.context, REQUIREMENTS), os.path.join(self.context, DOCKERFILE)]
+        return context_hash(self.context, context_files)
+
+    def build(self, force=False):
+        """Build the image unless its context hash is unchanged, and return a report
+
+        The report holds the context hash, whether the build was skipped,
+        the build seconds, the image size and how many of its layers were
+        reused from the previous image of the tag.
+        """
+        digest = self.prepare()
+        previous = image_info(self.tag)
+        report = {'tag': self.tag, 'context_hash': digest, 'skipped': False, 'seconds': 0.0}
+        if not force and previous is not None and previous['context_hash'] == digest:
+            report.update(skipped=True, size=previous['size'], layers=len(previous['layers']),
+                          reused_layers=len(previous['layers']))
+            return report
+        started = time.time()
+        subprocess.run(['docker', 'build', '--label', '{}={}'.format(CONTEXT_HASH_LABEL, digest),
+                        '-t', self.tag, self.context], check=True)
+        report['seconds'] = time.time() - started
+        current = image_info(self.tag)
+        reused = set(previous['layers']) if previous is not None else set()
+        report.update(size=current['size'], layers=len(current['layers']),
+                      reused_layers=sum(1 for layer in current['layers'] if layer in reused))
+        return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='TrainDB-ML image builder')
+    parser.add_argument('--tag', required=True)
+    parser.add_argument('--entry', required=True, help='the script run by the container, in the first source')
+    parser.add_argument('--source', action='append', default=[], help='a source directory (repeatable)')
+    parser.add_argument('--context', default='./build')
+    parser.add_argument('--base-image', default=BASE_IMAGE)
+    parser.add_argument('--requirement', action='append', default=[], help='an extra requirement line')
+    parser.add_argument('--force', action='store_true', help='build even if the context hash is unchanged')
+    parser.add_argument('--prepare-only', action='store_true', help='only write the build context')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.makedirs(args.context, exist_ok=True)
+    builder = TDBImageBuilder(args.tag, args.entry, args.source or ['.'], args.context, args.base_image,
+                              args.requirement)
+    if args.prepare_only:
+        print(json.dumps({'context_hash': builder.prepare()}))
+        return
+    print(json.dumps(builder.build(args.force)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_MAX_WAIT_MS = 5.0
+# worker thread 종료 표시
+_STOP = object()
+
+
+class TDBMicroBatcher:
+    """Merges concurrent predict requests into one forward pass
+
+    Requests queue up until max_batch_size instances are pending or
+    max_wait_ms has passed since the first of them arrived. The merged
+    instances go to predict_fn in a single call and each caller gets back
+    its own slice of the predictions. With a tracer (see tdbtrace), the
+    wait of every request in the queue is recorded as 'serve.queue' and
+    every batched call of predict_fn as 'serve.forward'.
+    """
+
+    def __init__(self, predict_fn: Callable[[List], List], max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms: float = DEFAULT_MAX_WAIT_MS, tracer=None):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be positive.")
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.tracer = tracer
+        self._requests = queue.Queue()
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'batches': 0, 'instances': 0, 'max_batch_size': 0, 'max_queue_depth': 0}
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, inputs: List) -> Future:
+        """Queue the inputs of one request and return a future of its predictions"""
+        future = Future()
+        # close()와 같은 lock 안에서 확인하고 넣어야 _STOP 뒤에 들어가 처리되지 않는 요청이 없다.
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The batcher is closed.")
+            self._requests.put((list(inputs), future, time.perf_counter()))
+            self._stats['requests'] += 1
+            self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], self._requests.qsize())
+        return future
+
+    def predict(self, inputs: List) -> List:
+        """Return the predictions of the inputs, batched with concurrent requests"""
+        return self.submit(inputs).result()
+
+    def stats(self) -> dict:
+        """Return the queue depth and batch size statistics"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self._requests.qsize()
+        stats['mean_batch_size'] = stats['instances'] / stats['batches'] if stats['batches'] else 0.0
+        return stats
+
+    def close(self):
+        """Serve the queued requests and stop the worker thread"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._requests.put(_STOP)
+        self._worker.join()
+
+    def _run(self):
+        pending = None
+        while True:
+            first = pending if pending is not None else self._requests.get()
+            pending = None
+            if first is _STOP:
+                return
+            batch, size = [first], len(first[0])
+            deadline = time.monotonic() + self.max_wait
+            # 첫 요청 도착 후 max_wait 동안 또는 max_batch_size가 찰 때까지 모은다.
+            while size < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self._requests.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if request is _STOP or size + len(request[0]) > self.max_batch_size:
+                    # 현재 batch를 처리한 뒤 다음 차례로 넘긴다.
+                    pending = request
+                    break
+                batch.append(request)
+                size += len(request[0])
+            self._serve(batch, size)
+
+    def _serve(self, batch, size):
+        # 호출한 쪽이 취소한 요청은 빼고, 나머지는 취소할 수 없게 running 상태로 바꾼다.
+        batch = [request for request in batch if request[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        size = sum(len(inputs) for inputs, _, _ in batch)
+        with self._lock:
+            self._stats['batches'] += 1
+            self._stats['instances'] += size
+            self._stats['max_batch_size'] = max(self._stats['max_batch_size'], size)
+        merged = [instance for inputs, _, _ in batch for instance in inputs]
+        started = time.perf_counter()
+        if self.tracer is not None:
+            for _, _, queued in batch:
+                self.tracer.record('serve.queue', started - queued, queued)
+        try:
+            outputs = self.predict_fn(merged)
+            if self.tracer is not None:
+                self.tracer.record('serve.forward', time.perf_counter() - started, started, batch_size=size)
+            if len(outputs) != len(merged):
+                raise ValueError("The predictor returned {} predictions for {} inputs."
+                                 .format(len(outputs), len(merged)))
+        except Exception as e:
+            LOG.error("Batched prediction failed: %s", e)
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        start = 0
+        for inputs, future, _ in batch:
+            future.set_result(list(outputs[start:start + len(inputs)]))
+            start += len(inputs)
@@ -0,0 +1,253 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from kubernetes.client import V1ObjectMeta
+
+LOG = logging.getLogger(__name__)
+
+SERVE_LABEL_SELECTOR = 'system=traindb,subsystem=ml,podtype=serve'
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_TIMEOUT_SECONDS = 600
+# watch 연결 하나의 최대 시간 (끝나면 다시 연결)
+WATCH_TIMEOUT_SECONDS = 60
+
+# 배포 결과 상태
+STATUS_READY = 'ready'
+STATUS_TIMEOUT = 'timeout'
+STATUS_ERROR = 'error'
+# InferenceService를 만들었는지 이미 있던 것을 갱신했는지
+ACTION_CREATED = 'created'
+ACTION_UPDATED = 'updated'
+# 이미 있는 객체를 만들 때 API server의 응답 코드
+CONFLICT_STATUS = 409
+
+
+def serving_name(modeltype: str, modelname: str) -> str:
+    """Return the InferenceService name of a TrainDB model"""
+    return "traindb-ml-serve-" + modeltype + "-" + modelname
+
+
+def isvc_spec(modeltype: str, modelname: str, nspace: str, uri_storage: str) -> 'V1beta1InferenceService':
+    """Return the TorchServe InferenceService of a TrainDB model"""
+    from kserve import constants
+    from kserve import V1beta1InferenceService
+    from kserve import V1beta1InferenceServiceSpec
+    from kserve import V1beta1PredictorSpec
+    from kserve import V1beta1TorchServeSpec
+    return V1beta1InferenceService(
+        api_version=constants.KSERVE_V1BETA1,
+        kind=constants.KSERVE_KIND,
+        metadata=V1ObjectMeta(
+            name=serving_name(modeltype, modelname),
+            labels={"system": "traindb", "subsystem": "ml", "podtype": "serve",
+                    "modeltype": modeltype, "modelname": modelname},
+            namespace=nspace),
+        spec=V1beta1InferenceServiceSpec(
+            predictor=V1beta1PredictorSpec(
+                pytorch=V1beta1TorchServeSpec(storage_uri=uri_storage))))
+
+
+def isvc_ready(isvc: Dict) -> bool:
+    """Return whether the Ready condition of an InferenceService object is True
+
+    A status older than the spec (observedGeneration below generation) is
+    that of the previous rollout and does not count.
+    """
+    status = isvc.get('status') or {}
+    generation = (isvc.get('metadata') or {}).get('generation')
+    observed = status.get('observedGeneration')
+    if generation is not None and observed is not None and observed < generation:
+        return False
+    for condition in status.get('conditions') or []:
+        if condition.get('type') == 'Ready':
+            return str(condition.get('status', '')).lower() == 'true'
+    return False
+
+
+class KServeAPI:
+    """The KServe calls of TDBBulkDeployer
+
+    create and update raise the kubernetes ApiException, so a service that
+    already exists is seen as a status of CONFLICT_STATUS. A fake with the
+    same create, update and watch methods can stand in for it.
+    """
+
+    def __init__(self, kserve=None):
+        if kserve is None:
+            from kserve import KServeClient
+            kserve = KServeClient()
+        self.kserve = kserve
+
+    def create(self, isvc, namespace):
+        """Create an InferenceService and return the created object"""
+        from kserve import constants
+        return self.kserve.api_instance.create_namespaced_custom_object(
+            constants.KSERVE_GROUP, constants.KSERVE_V1BETA1_VERSION, namespace, constants.KSERVE_PLURAL, isvc)
+
+    def update(self, isvc, namespace):
+        """Merge the spec and labels of isvc into the existing InferenceService and return the object"""
+        from kserve import constants
+        return self.kserve.api_instance.patch_namespaced_custom_object(
+            constants.KSERVE_GROUP, constants.KSERVE_V1BETA1_VERSION, namespace, constants.KSERVE_PLURAL,
+            isvc.metadata.name, isvc)
+
+    def watch(self, namespace, label_selector, timeout_seconds):
+        """Yield the ADDED/MODIFIED/DELETED events of the InferenceServices of namespace"""
+        from kubernetes import watch as k8s_watch
+        from kserve import constants
+        return k8s_watch.Watch().stream(
+            self.kserve.api_instance.list_namespaced_custom_object,
+            constants.KSERVE_GROUP, constants.KSERVE_V1BETA1_VERSION, namespace, constants.KSERVE_PLURAL,
+            label_selector=label_selector, timeout_seconds=timeout_seconds)
+
+
+class TDBBulkDeployer:
+    """Rolls out many InferenceServices and waits for them through one watch
+
+    At most max_concurrency services are in flight (created, not yet ready)
+    at a time; the next one is created as soon as one finishes. Readiness of
+    all of them is tracked by a single watch stream of the namespace instead
+    of a get/watch/poll sequence per service. A service that already exists
+    (a retrained model, a new storage_uri under the same name) is updated
+    instead, and is ready once its status reflects the update. Each service
+    has its own timeout, and a failed create or a timeout is reported for
+    that service without stopping the others.
+    """
+
+    def __init__(self, api=None, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS, label_selector: str = SERVE_LABEL_SELECTOR,
+                 watch_timeout_seconds: int = WATCH_TIMEOUT_SECONDS):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be positive.")
+        self.api = api if api is not None else KServeAPI()
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout_seconds
+        self.label_selector = label_selector
+        self.watch_timeout = watch_timeout_seconds
+
+    def deploy(self, isvcs: List['V1beta1InferenceService'], namespace: str) -> Dict[str, Dict]:
+        """Create or update the InferenceServices and wait until each is ready, failed or timed out
+
+        Returns a dict of InferenceService name to its result:
+        {'status': 'ready' | 'timeout' | 'error', 'seconds': ..., 'url': ..., 'error': ...},
+        with 'action': 'created' | 'updated' once the service was written.
+
+        :param isvcs: the InferenceService specs (e.g. from isvc_spec)
+        :param namespace: the namespace of the InferenceServices
+
+        """
+        cond = threading.Condition()
+        ready = {}  # watch로 Ready가 확인된 서비스 -> (확인 시각, url, observedGeneration)
+        created, failed = {}, {}  # 생성/갱신 성공 -> (action, 완료 시각, generation), 실패 -> error
+        stop = threading.Event()
+        watcher = threading.Thread(target=self._watch, args=(namespace, cond, ready, stop), daemon=True)
+        watcher.start()
+
+        pending = deque(isvcs)
+        started = {}  # name -> 시작 시각
+        results = {}
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        try:
+            with cond:
+                while pending or started:
+                    # 빈 자리만큼 다음 서비스를 생성
+                    while pending and len(started) < self.max_concurrency:
+                        isvc = pending.popleft()
+                        started[isvc.metadata.name] = time.monotonic()
+                        executor.submit(self._create, isvc, namespace, cond, created, failed)
+                    now = time.monotonic()
+                    for name, start in list(started.items()):
+                        ready_at, url, _ = ready.get(name, (-1.0, None, None))
+                        if name in failed:
+                            results[name] = {'status': STATUS_ERROR, 'seconds': now - start, 'error': failed[name]}
+                        elif name in created and self._fresh(ready.get(name), start, *created[name]):
+                            results[name] = {'status': STATUS_READY, 'seconds': ready_at - start, 'url': url,
+                                             'action': created[name][0]}
+                        elif now - start >= self.timeout:
+                            results[name] = {'status': STATUS_TIMEOUT, 'seconds': now - start,
+                                             'error': "not ready after {}s".format(self.timeout)}
+                            if name in created:
+                                results[name]['action'] = created[name][0]
+                        else:
+                            continue
+                        del started[name]
+                        LOG.info("InferenceService %s: %s", name, results[name])
+                    if started:
+                        deadline = min(started.values()) + self.timeout
+                        cond.wait(max(0.0, min(deadline - time.monotonic(), 1.0)))
+        finally:
+            stop.set()
+            executor.shutdown(wait=False)
+        return results
+
+    @staticmethod
+    def _fresh(seen, start, action, done_at, generation):
+        # 이번 rollout 전의 Ready(이전 배포의 상태)는 무시한다.
+        if seen is None:
+            return False
+        ready_at, _, observed = seen
+        if generation is not None and observed is not None:
+            return observed >= generation
+        # generation을 모르면 시각으로 판단: 갱신은 갱신 이후에 본 Ready만
+        return ready_at >= (start if action == ACTION_CREATED else done_at)
+
+    def _create(self, isvc, namespace, cond, created, failed):
+        name = isvc.metadata.name
+        action = ACTION_CREATED
+        try:
+            try:
+                response = self.api.create(isvc, namespace)
+            except Exception as e:
+                if getattr(e, 'status', None) != CONFLICT_STATUS:
+                    raise
+                # 이미 있는 서비스는 spec을 갱신해 새 모델로 rollout 한다.
+                action = ACTION_UPDATED
+                response = self.api.update(isvc, namespace)
+        except Exception as e:
+            LOG.error("Failed to %s InferenceService %s: %s", 'update' if action == ACTION_UPDATED else 'create',
+                      name, e)
+            with cond:
+                failed[name] = str(e)
+                cond.notify_all()
+            return
+        generation = ((response.get('metadata') or {}).get('generation')
+                      if isinstance(response, dict) else None)
+        with cond:
+            created[name] = (action, time.monotonic(), generation)
+            cond.notify_all()
+
+    def _watch(self, namespace, cond, ready, stop):
+        # watch 연결이 끝나거나 끊기면 다시 연결 (처음 이벤트로 기존 서비스 상태도 전달됨)
+        while not stop.is_set():
+            try:
+                for event in self.api.watch(namespace, self.label_selector, self.watch_timeout):
+                    if stop.is_set():
+                        return
+                    isvc = event['object']
+                    if event['type'] != 'DELETED' and isvc_ready(isvc):
+                        status = isvc.get('status') or {}
+                        with cond:
+                            ready[isvc['metadata']['name']] = (time.monotonic(), status.get('url'),
+                                                               status.get('observedGeneration'))
+                            cond.notify_all()
+            except Exception as e:
+                LOG.warning("InferenceService watch failed, reconnecting: %s", e)
+                stop.wait(1.0)
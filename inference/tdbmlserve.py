@@ -12,64 +12,262 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
+import os
 import sys
+import time
 sys.path.append('../metadata/')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../storage/'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../common/'))
 
 # 필요한 라이브러리 import
 from typing import List
 
-from kubernetes import client 
-from kubernetes import config 
-from kubernetes import utils 
-from kubernetes.client import V1PodTemplateSpec 
-from kubernetes.client import V1ObjectMeta 
-from kubernetes.client import V1PodSpec 
-from kubernetes.client import V1Container 
-from kubernetes.client import V1ResourceRequirements 
-from kubernetes.client import V1PersistentVolumeClaimVolumeSource 
-from kubernetes.client import V1Volume
-from kubernetes.client import V1VolumeMount
-
-from kserve import KServeClient
-from kserve import constants
-from kserve import utils
-from kserve import V1beta1InferenceService
-from kserve import V1beta1InferenceServiceSpec
-from kserve import V1beta1PredictorSpec
-from kserve import V1beta1TorchServeSpec
-from kserve import Predictor, KServe
+from tdbbatcher import TDBMicroBatcher, DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_WAIT_MS
+from tdbpredcache import TDBPredictionCache
+from tdbdeploy import TDBBulkDeployer, KServeAPI, isvc_spec, serving_name, STATUS_READY
+from tdbdeploy import DEFAULT_MAX_CONCURRENCY, DEFAULT_TIMEOUT_SECONDS
+from tdbconstants import PVC_DEFAULT_MOUNT_PATH
+
+PVC_URI_PREFIX = 'pvc://'
+
+def model_identity(uri_storage: str, mount_path: str = PVC_DEFAULT_MOUNT_PATH) -> str:
+    """Return a version identity of the model at uri_storage that changes when the model is rewritten
+
+    A pvc://<pvc>/<path> URI is read at mount_path/<path>. The identity is
+    the URI with the size and latest modification time of its files. When
+    they cannot be read here, the deploy time is used, so every deploy
+    counts as a new version.
+    """
+    path = uri_storage
+    if uri_storage.startswith(PVC_URI_PREFIX):
+        parts = uri_storage[len(PVC_URI_PREFIX):].split('/', 1)
+        path = os.path.join(mount_path, parts[1] if len(parts) > 1 else '')
+    try:
+        if os.path.isdir(path):
+            # 디렉토리 안의 파일을 덮어써도 디렉토리 mtime은 바뀌지 않으므로 파일을 본다.
+            stats = [os.stat(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names]
+        else:
+            stats = [os.stat(path)]
+    except OSError:
+        stats = []
+    if not stats:
+        return '{}@deployed-{}'.format(uri_storage, time.time_ns())
+    return '{}@{}-{}'.format(uri_storage, sum(s.st_size for s in stats), max(s.st_mtime_ns for s in stats))
+
+class TDBArtifactPredictor:
+    """Predicts in-process with a model version loaded from a TDBArtifactStore
+
+    The weights are memory-mapped (see TDBArtifactStore.load_into), so
+    loading a version takes milliseconds and shares the page cache of the
+    store instead of holding a copy per process. load() builds a new model
+    with model_fn and swaps it in once loaded, so requests in flight keep
+    using the previous version.
+
+    :param model_fn: a callable returning a new, untrained model of the stored architecture
+    :param artifact_path: the TDBArtifactStore directory
+    :param name: the model name in the store, e.g. 'cnn-mnist'
+    :param version: the version to load (the latest if None)
+    """
+
+    def __init__(self, model_fn, artifact_path: str, name: str, version: str = None):
+        from tdbartifact import TDBArtifactStore
+        self.model_fn = model_fn
+        self.store = TDBArtifactStore(artifact_path)
+        self.name = name
+        self.model = None
+        self.version = None
+        self.load(version)
+
+    def load(self, version: str = None) -> str:
+        # 새 모델에 mmap으로 올린 뒤 교체하고 올린 버전 반환
+        version = version or self.store.latest(self.name)
+        if version is None:
+            raise KeyError("No versions of {} in {}".format(self.name, self.store.root))
+        model = self.store.load_into(self.model_fn(), self.name, version)
+        model.eval()
+        self.model, self.version = model, version
+        return version
+
+    def predict(self, inputs: List):
+        import torch
+        model = self.model
+        with torch.no_grad():
+            return model(torch.tensor(inputs, dtype=torch.float32)).tolist()
 
 class ModelServer:
-    def __init__(self, model_type: str, model_name: str, model_uri: str):
+    def __init__(self, model_type: str, model_name: str, model_uri: str, batching: bool = False,
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_batch_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+                 endpoint: str = None, protocol: str = 'v1', client: 'TDBServeClient' = None,
+                 cache: TDBPredictionCache = None, predictor=None, tracer=None):
         # 모델 이름과 모델 uri를 인자로 받아 Predictor 객체 생성
+        # (predictor: predict(inputs)를 가진 객체로 대신할 수 있음, 예: benchmark의 stub)
         self.modeltype = model_type
         self.modelname = model_name
-        self.pod_name = "traindb-ml-serve-" + model_type + "-" + model_name
-        self.kserve = KServeClient()
-        self.predictor = Predictor(model_name=model_name, model_uri=model_uri)
+        self.pod_name = serving_name(model_type, model_name)
+        self._kserve = None
+        if predictor is None:
+            from kserve import Predictor
+            predictor = Predictor(model_name=model_name, model_uri=model_uri)
+        self.predictor = predictor
+        # 예측 경로의 구간별 시간 측정 (tdbtrace.TDBTracer, 없으면 측정 안 함)
+        self.tracer = tracer
+        # batching을 켜면 동시에 들어온 요청을 모아 한 번에 예측
+        self.batcher = None
+        if batching:
+            self.batcher = TDBMicroBatcher(self.predictor.predict, max_batch_size, max_batch_wait_ms, tracer)
+        # apredict가 사용하는 InferenceService URL (register_serving 후 자동 설정)
+        # (protocol: tdbserveclient.PROTOCOLS 중 하나, client는 aiohttp가 필요하므로 apredict에서 생성)
+        self.endpoint = endpoint
+        self.protocol = protocol
+        self.client = client
+        # 예측 결과 cache (모델 버전 = storage uri와 그 내용, 다시 배포될 때 바뀌었으면 무효화)
+        self.cache = cache
+        self.model_version = model_uri
+
+    @property
+    def kserve(self):
+        # kubeconfig가 필요한 KServeClient는 배포할 때 처음 생성
+        if self._kserve is None:
+            from kserve import KServeClient
+            self._kserve = KServeClient()
+        return self._kserve
 
     def predict(self, inputs: List):
         # 입력값을 Predictor 객체의 predict 메소드에 전달하여 예측값 반환
+        if self.cache is None:
+            return self._predict(inputs)
+        outputs, missing = self.cache.lookup(self.pod_name, self.model_version, inputs)
+        if missing:
+            # cache에 없는 입력만 예측
+            self._fill(inputs, outputs, missing, self._predict([inputs[i] for i in missing]))
+        return outputs
+
+    def _predict(self, inputs: List):
+        if self.batcher is not None:
+            return self.batcher.predict(inputs)
+        if self.tracer is None:
+            return self.predictor.predict(inputs)
+        with self.tracer.span('serve.forward', batch_size=len(inputs)):
+            return self.predictor.predict(inputs)
+
+    async def apredict(self, inputs: List, timeout: float = None):
+        # InferenceService endpoint에 비동기로 요청 (endpoint별 keep-alive 연결 재사용)
+        if self.cache is None:
+            return await self._apredict(inputs, timeout)
+        outputs, missing = self.cache.lookup(self.pod_name, self.model_version, inputs)
+        if missing:
+            self._fill(inputs, outputs, missing, await self._apredict([inputs[i] for i in missing], timeout))
+        return outputs
+
+    async def _apredict(self, inputs: List, timeout: float = None):
+        return await self._client().predict(self._endpoint(), self.modelname, inputs, self.protocol, timeout)
 
-        return self.predictor.predict(inputs)
+    async def apredict_many(self, batches: List[List], timeout: float = None, return_exceptions: bool = False):
+        # 여러 입력 batch를 동시에 요청하고 순서대로 결과 반환
+        if self.cache is None:
+            return await self._client().predict_many(self._endpoint(), self.modelname, batches, self.protocol,
+                                                     timeout, return_exceptions)
+        return await asyncio.gather(*[self.apredict(inputs, timeout) for inputs in batches],
+                                    return_exceptions=return_exceptions)
+
+    def _fill(self, inputs, outputs, missing, predictions):
+        if len(predictions) != len(missing):
+            raise ValueError("The predictor returned {} predictions for {} inputs."
+                             .format(len(predictions), len(missing)))
+        self.cache.store(self.pod_name, self.model_version, [inputs[i] for i in missing], predictions)
+        for i, prediction in zip(missing, predictions):
+            outputs[i] = prediction
+
+    @classmethod
+    def from_artifact(cls, model_type: str, model_name: str, model_fn, artifact_path: str, version: str = None,
+                      **kwargs):
+        # TDBArtifactStore의 버전('<model_type>-<model_name>')을 mmap으로 올려 프로세스 안에서 예측
+        predictor = TDBArtifactPredictor(model_fn, artifact_path, '{}-{}'.format(model_type, model_name), version)
+        server = cls(model_type, model_name, None, predictor=predictor, **kwargs)
+        server.model_version = '{}@{}'.format(predictor.name, predictor.version)
+        return server
+
+    def reload(self, version: str = None) -> str:
+        # TDBArtifactPredictor의 다른 버전(기본값 최신)으로 교체하고 이전 버전의 cache를 버린다.
+        version = self.predictor.load(version)
+        self._set_model_version('{}@{}'.format(self.predictor.name, version))
+        return version
+
+    def _set_model_version(self, model_version: str):
+        if model_version != self.model_version:
+            self.model_version = model_version
+            if self.cache is not None:
+                self.cache.invalidate(self.pod_name, keep_version=model_version)
+
+    def cache_stats(self):
+        # cache hit/miss 통계 반환
+        return self.cache.stats() if self.cache is not None else None
+
+    async def aclose(self):
+        # 비동기 client의 연결 pool 종료
+        if self.client is not None:
+            await self.client.close()
+
+    def _client(self):
+        if self.client is None:
+            from tdbserveclient import TDBServeClient
+            self.client = TDBServeClient(tracer=self.tracer)
+        return self.client
+
+    def _endpoint(self):
+        if not self.endpoint:
+            raise RuntimeError("No endpoint for {}: pass endpoint or call register_serving first.".format(self.pod_name))
+        return self.endpoint
+
+    def span_stats(self):
+        # 구간(serve.queue, serve.forward, serve.serialize 등)별 시간 통계 반환
+        return self.tracer.stats() if self.tracer is not None else None
+
+    def batch_stats(self):
+        # batching 큐 길이, batch 크기 통계 반환
+        return self.batcher.stats() if self.batcher is not None else None
+
+    def close(self):
+        # batching 큐에 남은 요청을 처리하고 종료
+        if self.batcher is not None:
+            self.batcher.close()
     
-    def register_serving(self, nspace: str, uri_storage: str):
-        isvc = V1beta1InferenceService(
-    		api_version=constants.KSERVE_V1BETA1,
-            kind=constants.KSERVE_KIND,
-            metadata=V1ObjectMeta(
-                name=self.pod_name,
-                labels={"system":"traindb", "subsystem":"ml","podtype":"serve","modeltype":self.modeltype,"modelname":self.modelname},
-                namespace=nspace
-                ),
-                spec=V1beta1InferenceServiceSpec(
-    			  predictor=V1beta1PredictorSpec(
-    				    pytorch=V1beta1TorchServeSpec(storage_uri=uri_storage))))
-        
-        self.kserve.create(isvc, namespace=nspace)
-        self.kserve.get(self.pod_name, namespace=nspace)
-        self.kserve.get(self.pod_name, namespace=nspace, watch=True, timeout_seconds=120)
-        self.kserve.wait_isvc_ready(self.pod_name, namespace=nspace)
+    def register_serving(self, nspace: str, uri_storage: str, timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS,
+                         model_version: str = None, api=None):
+        # InferenceService를 생성(이미 있으면 갱신)하고 Ready가 될 때까지 대기
+        # (model_version: cache에 쓸 모델 버전, 예: artifact store 버전. 없으면 model_identity)
+        result = register_servings([self], nspace, [uri_storage], timeout_seconds=timeout_seconds,
+                                   api=api, model_versions=[model_version])[self.pod_name]
+        if result['status'] != STATUS_READY:
+            raise RuntimeError("Failed to start the InferenceService {}: {}".format(self.pod_name, result['error']))
+
+    def _deployed(self, uri_storage: str, url: str, model_version: str = None):
+        if not self.endpoint:
+            self.endpoint = url
+        # 같은 uri라도 다시 훈련한 모델이면 이전 버전의 예측 결과는 버린다.
+        self._set_model_version(model_version or model_identity(uri_storage))
+
+def register_servings(servers: List[ModelServer], nspace: str, uri_storages: List[str],
+                      max_concurrency: int = DEFAULT_MAX_CONCURRENCY, timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS,
+                      api=None, model_versions: List[str] = None):
+    # 여러 모델을 동시에 배포하고 하나의 watch로 Ready 상태를 추적
+    # 반환값: InferenceService 이름 -> {'status', 'seconds', 'url' 또는 'error'}
+    # model_versions: 서버별 cache 모델 버전 (없으면 model_identity(uri_storage))
+    if len(servers) != len(uri_storages):
+        raise ValueError("servers and uri_storages have different lengths.")
+    model_versions = list(model_versions or [None] * len(servers))
+    if not servers:
+        return {}
+    deployer = TDBBulkDeployer(api or KServeAPI(servers[0].kserve), max_concurrency, timeout_seconds)
+    results = deployer.deploy([isvc_spec(server.modeltype, server.modelname, nspace, uri_storage)
+                               for server, uri_storage in zip(servers, uri_storages)], nspace)
+    for server, uri_storage, model_version in zip(servers, uri_storages, model_versions):
+        result = results[server.pod_name]
+        if result['status'] == STATUS_READY:
+            server._deployed(uri_storage, result['url'], model_version)
+    return results
 
 if __name__ == '__main__':
     # 모델 서버 생성
@@ -0,0 +1,132 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Tuple
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 300.0
+
+
+def input_hash(instance) -> str:
+    """Return a canonical hash of one input instance
+
+    Tuples and lists hash alike and dict keys are sorted, so equal inputs
+    hash the same regardless of how the caller built them.
+    """
+    data = json.dumps(instance, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def entry_size(key, value) -> int:
+    """Return the approximate size in bytes of a cache entry"""
+    return len(key) + len(json.dumps(value, separators=(',', ':'), default=str))
+
+
+class TDBPredictionCache:
+    """Memory-bounded LRU cache of predictions with a TTL
+
+    Entries are keyed by (model name, model version, input hash), one per
+    input instance, so a request whose instances were partly seen before
+    only sends the new ones to the model. When the cache holds more than
+    max_bytes the least recently used entries are evicted; an entry older
+    than ttl_seconds is a miss.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_bytes = max_bytes
+        self.ttl = ttl_seconds
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (value, size, expires)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def lookup(self, model_name: str, version: str, inputs: List) -> Tuple[List, List[int]]:
+        """Return the cached predictions of the inputs and the indexes of the missing ones
+
+        The predictions list has None at every missing index.
+        """
+        now = self.clock()
+        outputs, missing = [None] * len(inputs), []
+        with self._lock:
+            for i, instance in enumerate(inputs):
+                key = (model_name, version, input_hash(instance))
+                entry = self._entries.get(key)
+                if entry is not None and entry[2] <= now:
+                    self._remove(key)
+                    self._stats['expirations'] += 1
+                    entry = None
+                if entry is None:
+                    missing.append(i)
+                    self._stats['misses'] += 1
+                    continue
+                self._entries.move_to_end(key)
+                outputs[i] = entry[0]
+                self._stats['hits'] += 1
+        return outputs, missing
+
+    def store(self, model_name: str, version: str, inputs: List, outputs: List):
+        """Cache the predictions of the inputs"""
+        if len(inputs) != len(outputs):
+            raise ValueError("inputs and outputs have different lengths.")
+        expires = self.clock() + self.ttl
+        with self._lock:
+            for instance, value in zip(inputs, outputs):
+                digest = input_hash(instance)
+                size = entry_size(digest, value)
+                if size > self.max_bytes:
+                    continue
+                key = (model_name, version, digest)
+                if key in self._entries:
+                    self._remove(key)
+                self._entries[key] = (value, size, expires)
+                self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+
+    def invalidate(self, model_name: str, keep_version: str = None) -> int:
+        """Drop the entries of a model, except those of keep_version, and return how many were dropped"""
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == model_name and key[1] != keep_version]
+            for key in keys:
+                self._remove(key)
+            self._stats['invalidations'] += len(keys)
+        return len(keys)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """Return the hit/miss counters and the current size"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
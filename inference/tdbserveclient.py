@@ -0,0 +1,186 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+import time
+from typing import Dict, List
+
+import aiohttp
+
+# KServe 추론 프로토콜
+PROTOCOL_V1 = 'v1'  # POST /v1/models/<name>:predict {"instances": [...]}
+PROTOCOL_V2 = 'v2'  # POST /v2/models/<name>/infer {"inputs": [{"name", "shape", "datatype", "data"}]}
+PROTOCOLS = (PROTOCOL_V1, PROTOCOL_V2)
+
+DEFAULT_MAX_CONNECTIONS = 16
+DEFAULT_MAX_CONCURRENCY = 64
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_KEEPALIVE_TIMEOUT = 60.0
+V2_INPUT_NAME = 'input-0'
+
+
+def tensor_shape(data) -> List[int]:
+    """Return the shape of a nested list of numbers"""
+    shape = []
+    while isinstance(data, (list, tuple)):
+        shape.append(len(data))
+        if not data:
+            break
+        data = data[0]
+    return shape
+
+
+def flatten(data) -> List:
+    """Return the numbers of a nested list in row-major order"""
+    if not isinstance(data, (list, tuple)):
+        return [data]
+    return [value for item in data for value in flatten(item)]
+
+
+def unflatten(data: List, shape: List[int]):
+    """Return a flat list of numbers as a nested list of the given shape"""
+    if len(shape) <= 1:
+        return list(data)
+    step = len(data) // shape[0] if shape[0] else 0
+    return [unflatten(data[i * step:(i + 1) * step], shape[1:]) for i in range(shape[0])]
+
+
+def predict_path(model_name: str, protocol: str = PROTOCOL_V1) -> str:
+    """Return the predict URL path of the model"""
+    if protocol == PROTOCOL_V1:
+        return '/v1/models/{}:predict'.format(model_name)
+    if protocol == PROTOCOL_V2:
+        return '/v2/models/{}/infer'.format(model_name)
+    raise ValueError("Unsupported protocol: {} (expected one of {})".format(protocol, PROTOCOLS))
+
+
+def encode_request(inputs: List, protocol: str = PROTOCOL_V1, datatype: str = 'FP32') -> Dict:
+    """Return the request body of the inputs"""
+    if protocol == PROTOCOL_V1:
+        return {'instances': list(inputs)}
+    if protocol == PROTOCOL_V2:
+        return {'inputs': [{'name': V2_INPUT_NAME, 'shape': tensor_shape(inputs), 'datatype': datatype,
+                            'data': flatten(inputs)}]}
+    raise ValueError("Unsupported protocol: {} (expected one of {})".format(protocol, PROTOCOLS))
+
+
+def decode_response(body: Dict, protocol: str = PROTOCOL_V1) -> List:
+    """Return the predictions of a response body (the first output for v2)"""
+    if protocol == PROTOCOL_V1:
+        return body['predictions']
+    if protocol == PROTOCOL_V2:
+        output = body['outputs'][0]
+        return unflatten(output['data'], output['shape'])
+    raise ValueError("Unsupported protocol: {} (expected one of {})".format(protocol, PROTOCOLS))
+
+
+class TDBServeClient:
+    """asyncio client of KServe InferenceService endpoints
+
+    Every endpoint URL gets its own aiohttp session, so the connections to
+    it stay open (HTTP keep-alive) and are reused by later requests. A
+    semaphore bounds the requests in flight across all endpoints and every
+    request has a total timeout. With a tracer (see tdbtrace), the
+    request encoding is recorded as 'serve.serialize', the HTTP round trip
+    as 'serve.request' and the response decoding as 'serve.deserialize'.
+
+    A client belongs to the event loop it was first used in.
+    """
+
+    def __init__(self, max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY, timeout: float = DEFAULT_TIMEOUT,
+                 keepalive_timeout: float = DEFAULT_KEEPALIVE_TIMEOUT, tracer=None):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be positive.")
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.tracer = tracer
+        self._sessions = {}
+        self._semaphore = None
+
+    def session(self, url: str) -> aiohttp.ClientSession:
+        """Return the pooled session of an endpoint URL, creating it on first use"""
+        url = url.rstrip('/')
+        session = self._sessions.get(url)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=self.keepalive_timeout)
+            session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+            self._sessions[url] = session
+        return session
+
+    async def predict(self, url: str, model_name: str, inputs: List, protocol: str = PROTOCOL_V1,
+                      timeout: float = None) -> List:
+        """Return the predictions of the model served at url for the inputs
+
+        :param url: the InferenceService URL (e.g. http://my-model.default.example.com)
+        :param model_name: the model name in the predict path
+        :param inputs: the instances to predict
+        :param protocol: 'v1' or 'v2'
+        :param timeout: the total timeout of this request in seconds (the client timeout if None)
+
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        kwargs = {}
+        if timeout is not None:
+            kwargs['timeout'] = aiohttp.ClientTimeout(total=timeout)
+        started = time.perf_counter()
+        body = json.dumps(encode_request(inputs, protocol))
+        self._record('serve.serialize', started)
+        async with self._semaphore:
+            request_url = url.rstrip('/') + predict_path(model_name, protocol)
+            started = time.perf_counter()
+            async with self.session(url).post(request_url, data=body, headers={'Content-Type': 'application/json'},
+                                              **kwargs) as response:
+                if response.status >= 400:
+                    text = await response.text()
+                    raise aiohttp.ClientResponseError(
+                        response.request_info, response.history, status=response.status,
+                        message="{} {}".format(response.reason, text[:200]), headers=response.headers)
+                content = await response.read()
+            self._record('serve.request', started)
+        started = time.perf_counter()
+        predictions = decode_response(json.loads(content), protocol)
+        self._record('serve.deserialize', started)
+        return predictions
+
+    def _record(self, name, started):
+        if self.tracer is not None:
+            self.tracer.record(name, time.perf_counter() - started, started)
+
+    async def predict_many(self, url: str, model_name: str, batches: List[List], protocol: str = PROTOCOL_V1,
+                           timeout: float = None, return_exceptions: bool = False) -> List:
+        """Send the input batches concurrently and return their predictions in order
+
+        :param batches: a list of input lists, each sent as one request
+        :param return_exceptions: whether to return the error of a failed request in its place instead of raising
+
+        """
+        return await asyncio.gather(*[self.predict(url, model_name, inputs, protocol, timeout) for inputs in batches],
+                                    return_exceptions=return_exceptions)
+
+    async def close(self):
+        """Close the pooled connections of every endpoint"""
+        sessions, self._sessions = list(self._sessions.values()), {}
+        for session in sessions:
+            await session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
@@ -0,0 +1,229 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_BATCH_SIZE = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS models (
+    id INTEGER PRIMARY KEY,
+    modeltype TEXT NOT NULL,
+    modelname TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    image TEXT,
+    pvc_name TEXT,
+    model_path TEXT,
+    version TEXT,
+    hyperparams TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (modeltype, modelname, tag)
+);
+CREATE INDEX IF NOT EXISTS models_tag ON models (tag);
+CREATE TABLE IF NOT EXISTS metrics (
+    model_id INTEGER NOT NULL REFERENCES models (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (model_id, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS metrics_name_value ON metrics (name, value);
+"""
+
+MODEL_COLUMNS = ('modeltype', 'modelname', 'tag', 'image', 'pvc_name', 'model_path', 'version', 'hyperparams')
+# 이전 스키마의 카탈로그에 없는 열 -> 타입
+ADDED_COLUMNS = {'version': 'TEXT'}
+
+UPSERT_MODEL = """
+INSERT INTO models (modeltype, modelname, tag, image, pvc_name, model_path, version, hyperparams, created_at,
+                    updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (modeltype, modelname, tag) DO UPDATE SET
+    image = coalesce(excluded.image, image),
+    pvc_name = coalesce(excluded.pvc_name, pvc_name),
+    model_path = coalesce(excluded.model_path, model_path),
+    version = coalesce(excluded.version, version),
+    hyperparams = coalesce(excluded.hyperparams, hyperparams),
+    updated_at = excluded.updated_at
+"""
+
+
+class TDBModelCatalog():
+    """An indexed SQLite catalog of the trained TrainDB models
+
+    A model is identified by (modeltype, modelname, tag) and records its
+    image, PVC, model path, version (e.g. its TDBArtifactStore version),
+    hyperparams and numeric metrics. Metrics are
+    stored one row per (model, name) with an index on (name, value), so
+    range filters and best-model queries are index lookups.
+
+    Writes go through add() into a buffer that is committed in one
+    transaction every batch_size records (or on flush/close);
+    register() writes one record immediately.
+    """
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.batch_size = batch_size
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._pending = []
+        with self._lock:
+            if path != ':memory:':
+                # 읽기와 쓰기가 서로 막지 않도록 WAL 사용
+                self._conn.execute('PRAGMA journal_mode=WAL')
+                self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute('PRAGMA foreign_keys=ON')
+            self._conn.executescript(SCHEMA)
+            columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(models)')}
+            for column, column_type in ADDED_COLUMNS.items():
+                if column not in columns:
+                    self._conn.execute('ALTER TABLE models ADD COLUMN {} {}'.format(column, column_type))
+
+    def register(self, modeltype, modelname, tag='latest', image=None, pvc_name=None, model_path=None,
+                 hyperparams=None, metrics=None, version=None):
+        """Insert or update a model and its metrics now
+
+        Fields left as None keep their recorded value; given metrics
+        replace all the recorded metrics of the model.
+        """
+        self.add(modeltype, modelname, tag, image, pvc_name, model_path, hyperparams, metrics, version)
+        self.flush()
+
+    def add(self, modeltype, modelname, tag='latest', image=None, pvc_name=None, model_path=None,
+            hyperparams=None, metrics=None, version=None):
+        """Buffer a register() write, committing the buffer once it holds batch_size records"""
+        record = dict(modeltype=modeltype, modelname=modelname, tag=tag, image=image, pvc_name=pvc_name,
+                      model_path=model_path, hyperparams=hyperparams, metrics=metrics, version=version)
+        with self._lock:
+            self._pending.append(record)
+            if len(self._pending) < self.batch_size:
+                return
+        self.flush()
+
+    def register_many(self, records):
+        """Insert or update many models (dicts of register() arguments) in one transaction"""
+        with self._lock:
+            self._pending.extend(records)
+        self.flush()
+
+    def flush(self):
+        """Commit the buffered writes"""
+        with self._lock:
+            records, self._pending = self._pending, []
+            if not records:
+                return
+            now = time.time()
+            with self._conn:
+                for record in records:
+                    hyperparams = record.get('hyperparams')
+                    key = (record['modeltype'], record['modelname'], record.get('tag', 'latest'))
+                    self._conn.execute(UPSERT_MODEL, key + (
+                        record.get('image'), record.get('pvc_name'), record.get('model_path'), record.get('version'),
+                        json.dumps(hyperparams, sort_keys=True) if hyperparams is not None else None, now, now))
+                    if record.get('metrics') is None:
+                        continue
+                    metrics = {name: float(value) for name, value in record['metrics'].items() if value is not None}
+                    model_id = self._conn.execute(
+                        'SELECT id FROM models WHERE modeltype = ? AND modelname = ? AND tag = ?', key).fetchone()[0]
+                    # 새 실행이 더 이상 보고하지 않는 metric이 범위 검색에 걸리지 않도록 모두 바꾼다.
+                    self._conn.execute('DELETE FROM metrics WHERE model_id = ?', (model_id,))
+                    if metrics:
+                        self._conn.executemany('INSERT OR REPLACE INTO metrics (model_id, name, value) VALUES (?, ?, ?)',
+                                               [(model_id, name, value) for name, value in metrics.items()])
+
+    def get(self, modeltype, modelname, tag='latest'):
+        """Return a model record (with its hyperparams and metrics), or None"""
+        models = self.find(modeltype=modeltype, modelname=modelname, tag=tag, limit=1)
+        return models[0] if models else None
+
+    def find(self, modeltype=None, modelname=None, tag=None, metrics=None, order_by=None, descending=True,
+             limit=None):
+        """Return the model records matching the filters
+
+        :param modeltype: the model type, or None for any
+        :param modelname: the model name, or None for any
+        :param tag: the tag, or None for any
+        :param metrics: a dict of metric name to a (min, max) range, either bound None for open
+        :param order_by: a metric name to sort by, or None to sort by last update
+        :param descending: whether to sort from the largest value
+        :param limit: the maximum number of records
+
+        """
+        self.flush()
+        query = ['SELECT models.* FROM models']
+        join_params, where, where_params = [], [], []
+        order = 'models.updated_at'
+        for i, (name, (low, high)) in enumerate((metrics or {}).items()):
+            # metric 하나마다 (name, value) index로 join
+            query.append('JOIN metrics m{0} ON m{0}.model_id = models.id AND m{0}.name = ?'.format(i))
+            join_params.append(name)
+            if low is not None:
+                where.append('m{}.value >= ?'.format(i))
+                where_params.append(low)
+            if high is not None:
+                where.append('m{}.value <= ?'.format(i))
+                where_params.append(high)
+        if order_by is not None:
+            query.append('JOIN metrics morder ON morder.model_id = models.id AND morder.name = ?')
+            join_params.append(order_by)
+            order = 'morder.value'
+        for column, value in (('modeltype', modeltype), ('modelname', modelname), ('tag', tag)):
+            if value is not None:
+                where.append('models.{} = ?'.format(column))
+                where_params.append(value)
+        if where:
+            query.append('WHERE ' + ' AND '.join(where))
+        query.append('ORDER BY {} {}'.format(order, 'DESC' if descending else 'ASC'))
+        params = join_params + where_params
+        if limit is not None:
+            query.append('LIMIT ?')
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(' '.join(query), params).fetchall()
+            return [self._record(row) for row in rows]
+
+    def best(self, modeltype, metric, higher_is_better=True, modelname=None, tag=None):
+        """Return the model of modeltype with the best value of metric, or None"""
+        models = self.find(modeltype=modeltype, modelname=modelname, tag=tag, order_by=metric,
+                           descending=higher_is_better, limit=1)
+        return models[0] if models else None
+
+    def delete(self, modeltype, modelname, tag='latest'):
+        """Remove a model and its metrics and return whether it existed"""
+        self.flush()
+        with self._lock, self._conn:
+            cursor = self._conn.execute('DELETE FROM models WHERE modeltype = ? AND modelname = ? AND tag = ?',
+                                        (modeltype, modelname, tag))
+            return cursor.rowcount > 0
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def _record(self, row):
+        record = {column: row[column] for column in MODEL_COLUMNS}
+        record['hyperparams'] = json.loads(row['hyperparams']) if row['hyperparams'] else None
+        record['created_at'], record['updated_at'] = row['created_at'], row['updated_at']
+        record['metrics'] = {name: value for name, value in self._conn.execute(
+            'SELECT name, value FROM metrics WHERE model_id = ?', (row['id'],))}
+        return record
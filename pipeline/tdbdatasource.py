@@ -0,0 +1,319 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import json
+import logging
+import queue
+import re
+import threading
+
+import torch
+from torch.utils.data import IterableDataset
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 4096
+DEFAULT_PREFETCH = 4
+
+# 엔진별 식별자 quoting 문자
+_QUOTE_CHARS = {'mysql': '`', 'sqlite': '"'}
+# 엔진별 query 인자 자리 표시
+_PARAM_MARKS = {'mysql': '%s', 'sqlite': '?'}
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_$]*$')
+# producer thread가 queue에 넣는 종료 표시
+_END = object()
+
+
+def load_datasource_config(conf_file):
+    """Return the datasource block of a TrainDB-ML training config
+
+    :param conf_file: the path of the config file (e.g. conf/train_cnn_mnist.json)
+
+    """
+    with open(conf_file) as f:
+        return json.load(f)['datasource']
+
+
+def quote_identifier(engine, identifier):
+    """Return the quoted identifier for the given engine
+
+    :param engine: the datasource engine ('mysql' or 'sqlite')
+    :param identifier: the table or column name
+
+    """
+    if engine not in _QUOTE_CHARS:
+        raise ValueError("Unsupported datasource engine: {}".format(engine))
+    if not _IDENTIFIER.match(identifier):
+        raise ValueError("Invalid identifier: {}".format(identifier))
+    q = _QUOTE_CHARS[engine]
+    return '{}{}{}'.format(q, identifier, q)
+
+
+def build_query(engine, table, columnlist, where=None):
+    """Return a SELECT statement that reads only the columns in columnlist
+
+    :param engine: the datasource engine ('mysql' or 'sqlite')
+    :param table: the table name
+    :param columnlist: the list of column names to read
+    :param where: an optional WHERE clause (without the keyword)
+
+    """
+    if not columnlist:
+        raise ValueError("columnlist is empty.")
+    columns = ', '.join(quote_identifier(engine, c) for c in columnlist)
+    query = 'SELECT {} FROM {}'.format(columns, quote_identifier(engine, table))
+    if where:
+        query += ' WHERE ' + where
+    return query
+
+
+def watermark_where(engine, column, low=None, high=None):
+    """Return a WHERE clause and its arguments selecting the rows with low < column <= high
+
+    :param engine: the datasource engine ('mysql' or 'sqlite')
+    :param column: the high-water mark column (a monotonic key or timestamp)
+    :param low: the high-water mark of the previous run (None reads from the first row)
+    :param high: the high-water mark of this run (None reads to the last row)
+
+    """
+    column = quote_identifier(engine, column)
+    conditions, args = [], []
+    if low is not None:
+        conditions.append('{} > {}'.format(column, _PARAM_MARKS[engine]))
+        args.append(low)
+    if high is not None:
+        conditions.append('{} <= {}'.format(column, _PARAM_MARKS[engine]))
+        args.append(high)
+    return ' AND '.join(conditions) or None, tuple(args)
+
+
+def connect(engine, parameters):
+    """Open a DB-API connection for the datasource
+
+    MySQL connections use an unbuffered server-side cursor (SSCursor), so
+    rows are streamed from the server instead of being loaded all at once.
+
+    :param engine: the datasource engine ('mysql' or 'sqlite')
+    :param parameters: the 'parameters' block of the datasource config
+
+    """
+    if engine == 'mysql':
+        import pymysql
+        import pymysql.cursors
+        return pymysql.connect(
+            host=parameters['host'],
+            port=int(parameters.get('port', 3306)),
+            user=parameters['user'],
+            password=parameters['password'],
+            database=parameters['database'],
+            cursorclass=pymysql.cursors.SSCursor)
+    if engine == 'sqlite':
+        import sqlite3
+        # sqlite3 cursor는 기본적으로 행을 lazy하게 읽는다.
+        return sqlite3.connect(parameters['database'], check_same_thread=False)
+    raise ValueError("Unsupported datasource engine: {}".format(engine))
+
+
+class TDBTableDataset(IterableDataset):
+    """A streaming dataset over a datasource table
+
+    Rows are fetched in chunks of chunk_size by a background thread and at
+    most prefetch chunks are buffered, so memory use does not depend on the
+    size of the table. Each item is a float tensor of shape
+    (rows, len(columnlist)), or a (features, labels) pair when the
+    parameters name a 'labelcolumn'.
+    """
+
+    def __init__(self, engine, parameters, where=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE, prefetch=DEFAULT_PREFETCH, connect_fn=None, args=()):
+        """Create the dataset
+
+        :param engine: the datasource engine ('mysql' or 'sqlite')
+        :param parameters: the 'parameters' block of the datasource config
+        :param where: an optional WHERE clause (without the keyword)
+        :param chunk_size: the number of rows fetched per chunk
+        :param prefetch: the maximum number of chunks buffered ahead
+        :param connect_fn: a callable returning a DB-API connection (defaults to connect)
+        :param args: the query arguments of the placeholders in where
+
+        """
+        super(TDBTableDataset, self).__init__()
+        if chunk_size < 1 or prefetch < 1:
+            raise ValueError("chunk_size and prefetch must be positive.")
+        self.engine = engine
+        self.parameters = parameters
+        self.columnlist = list(parameters['columnlist'])
+        self.labelcolumn = parameters.get('labelcolumn')
+        self.columns = self.columnlist + ([self.labelcolumn] if self.labelcolumn else [])
+        self.query = build_query(engine, parameters['table'], self.columns, where)
+        self.args = tuple(args)
+        self.chunk_size = chunk_size
+        self.prefetch = prefetch
+        self.connect_fn = connect_fn or (lambda: connect(engine, parameters))
+
+    def _produce(self, chunks, stop):
+        conn = None
+        try:
+            conn = self.connect_fn()
+            cursor = conn.cursor()
+            if self.args:
+                cursor.execute(self.query, self.args)
+            else:
+                cursor.execute(self.query)
+            while not stop.is_set():
+                rows = cursor.fetchmany(self.chunk_size)
+                if not rows:
+                    break
+                self._put(chunks, stop, rows)
+            if not stop.is_set():
+                # 중단된 경우 SSCursor.close()는 남은 행을 모두 읽으므로 connection만 닫는다.
+                cursor.close()
+        except Exception as e:  # consumer 쪽에서 다시 raise 한다.
+            self._put(chunks, stop, e)
+        finally:
+            if conn is not None:
+                conn.close()
+            self._put(chunks, stop, _END)
+
+    @staticmethod
+    def _put(chunks, stop, item):
+        # consumer가 먼저 끝나면 queue가 비워지지 않으므로 stop을 확인하며 대기
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def chunks(self):
+        """Yield the raw rows of the table, chunk_size rows at a time"""
+        chunks = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        producer = threading.Thread(target=self._produce, args=(chunks, stop), daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = chunks.get()
+                if item is _END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            producer.join()
+
+    def split(self, chunk):
+        """Return a chunk tensor as (features, labels) when labelcolumn is set
+
+        :param chunk: a float tensor of shape (rows, len(columns))
+
+        """
+        if self.labelcolumn:
+            return chunk[:, :-1], chunk[:, -1]
+        return chunk
+
+    def __iter__(self):
+        for rows in self.chunks():
+            yield self.split(torch.tensor(rows, dtype=torch.float32))
+
+
+def table_version(engine, parameters, connect_fn=None):
+    """Return a string that changes whenever the datasource table changes
+
+    A 'version' entry in the parameters takes precedence. Otherwise MySQL uses
+    the table's UPDATE_TIME and TABLE_ROWS from information_schema and sqlite
+    uses the row count and the largest rowid.
+
+    :param engine: the datasource engine ('mysql' or 'sqlite')
+    :param parameters: the 'parameters' block of the datasource config
+    :param connect_fn: a callable returning a DB-API connection (defaults to connect)
+
+    """
+    if parameters.get('version'):
+        return str(parameters['version'])
+    table = quote_identifier(engine, parameters['table'])
+    if engine == 'mysql':
+        query = ('SELECT UPDATE_TIME, TABLE_ROWS FROM information_schema.TABLES '
+                 'WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s')
+        args = (parameters['database'], parameters['table'])
+    else:
+        query, args = 'SELECT COUNT(*), MAX(rowid) FROM {}'.format(table), ()
+    conn = (connect_fn or (lambda: connect(engine, parameters)))()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query, args)
+        row = cursor.fetchone()
+        cursor.close()
+    finally:
+        conn.close()
+    if row is None:
+        raise ValueError("Table {} does not exist.".format(parameters['table']))
+    return '|'.join(str(v) for v in row)
+
+
+def max_watermark(engine, parameters, connect_fn=None):
+    """Return the largest value of the 'watermarkcolumn' of the datasource table (None if it is empty)
+
+    Values other than numbers are returned as strings (e.g. '2023-05-01 00:00:00'),
+    which both engines compare with the column.
+
+    :param engine: the datasource engine ('mysql' or 'sqlite')
+    :param parameters: the 'parameters' block of the datasource config
+    :param connect_fn: a callable returning a DB-API connection (defaults to connect)
+
+    """
+    if not parameters.get('watermarkcolumn'):
+        raise ValueError("The datasource has no watermarkcolumn.")
+    query = 'SELECT MAX({}) FROM {}'.format(quote_identifier(engine, parameters['watermarkcolumn']),
+                                            quote_identifier(engine, parameters['table']))
+    conn = (connect_fn or (lambda: connect(engine, parameters)))()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query)
+        row = cursor.fetchone()
+        cursor.close()
+    finally:
+        conn.close()
+    value = row[0] if row else None
+    if value is None or isinstance(value, (int, float)):
+        return value
+    # datetime, Decimal 등은 JSON에 기록할 수 있도록 문자열로
+    return str(value)
+
+
+def lag_watermark(value, lag):
+    """Return a high-water mark moved back by lag
+
+    Rows within lag of the largest value may still be committed with a
+    value at or below it (ties on a timestamp, auto-increment keys
+    committed out of order), so a run reads only up to the lagged mark and
+    leaves those rows to the next run.
+
+    :param value: the high-water mark from max_watermark (None if the table is empty)
+    :param lag: the lag, in column units for numbers and in seconds for timestamps (0 for none)
+
+    """
+    if not lag or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return value - lag
+    try:
+        timestamp = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError("watermarklag needs a numeric or timestamp watermarkcolumn, not {!r}.".format(value))
+    # 원래 값과 같은 형식(날짜와 시각 사이 구분자)으로 돌려줘야 문자열로도 비교된다.
+    sep = value[10] if len(value) > 10 else ' '
+    return (timestamp - datetime.timedelta(seconds=lag)).isoformat(sep=sep)
@@ -0,0 +1,87 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# DistributedDataParallel(gloo, CPU) 훈련 진입점
+#
+# PyTorchJob의 Master/Worker pod와 torchrun 모두 MASTER_ADDR, MASTER_PORT,
+# RANK, WORLD_SIZE 환경 변수를 설정하므로 같은 명령으로 실행된다.
+#
+#   torchrun --nproc_per_node=2 tdbddp.py --data-path /tmp/mnist --model-path /tmp/model.pt
+
+import argparse
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../storage/'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../common/'))
+
+import torch
+import torch.distributed as dist
+
+from tdbtrainer import run_training
+
+DDP_BACKEND = 'gloo'
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='TrainDB-ML distributed training')
+    parser.add_argument('--data-path', default='/mnt/data/mnist')
+    parser.add_argument('--model-path', default='/mnt/model/model.pt')
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--lr', type=float, default=0.001)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--test-batch-size', type=int, default=1000)
+    parser.add_argument('--momentum', type=float, default=0.9)
+    parser.add_argument('--patience', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--datasource', default='', help='datasource block of the training config (JSON)')
+    parser.add_argument('--input-mode', default='tensor')
+    parser.add_argument('--checkpoint-dir', default='')
+    parser.add_argument('--checkpoint-steps', type=int, default=0)
+    parser.add_argument('--progress-steps', type=int, default=100)
+    parser.add_argument('--progress-seconds', type=float, default=10.0)
+    parser.add_argument('--trace-dir', default='')
+    parser.add_argument('--profile-start-step', type=int, default=10)
+    parser.add_argument('--profile-steps', type=int, default=0)
+    parser.add_argument('--backend', default=DDP_BACKEND)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # 모든 rank가 같은 초기 가중치에서 시작하도록 seed 고정 (DDP도 rank 0 가중치를 broadcast 한다)
+    torch.manual_seed(args.seed)
+
+    distributed = int(os.environ.get('WORLD_SIZE', '1')) > 1
+    if distributed:
+        dist.init_process_group(backend=args.backend, init_method='env://')
+    try:
+        metrics = run_training(
+            args.data_path, args.model_path, args.epochs, args.lr, args.batch_size,
+            datasource=json.loads(args.datasource) if args.datasource else None,
+            input_mode=args.input_mode, test_batch_size=args.test_batch_size,
+            patience=args.patience, momentum=args.momentum,
+            checkpoint_dir=args.checkpoint_dir, checkpoint_steps=args.checkpoint_steps,
+            progress_steps=args.progress_steps, progress_seconds=args.progress_seconds,
+            trace_dir=args.trace_dir, profile_start_step=args.profile_start_step, profile_steps=args.profile_steps)
+        if not distributed or dist.get_rank() == 0:
+            print(json.dumps(metrics))
+    finally:
+        if distributed:
+            dist.destroy_process_group()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+import torch
+
+# torch 1.9 미만에서는 inference_mode가 없으므로 no_grad를 사용
+inference_mode = getattr(torch, 'inference_mode', torch.no_grad)
+
+
+def evaluate(model, batches, criterion, classify=True):
+    """Return the mean loss (and accuracy) of a model over evaluation batches
+
+    :param model: the model to evaluate
+    :param batches: an iterable of (inputs, labels) batches
+    :param criterion: the loss function (with the default 'mean' reduction)
+    :param classify: whether to also compute the classification accuracy
+
+    """
+    was_training = model.training
+    model.eval()
+    total_loss, correct, count = 0.0, 0, 0
+    try:
+        with inference_mode():
+            for inputs, labels in batches:
+                outputs = model(inputs)
+                total_loss += criterion(outputs, labels).item() * len(inputs)
+                if classify:
+                    correct += (outputs.argmax(dim=1) == labels).sum().item()
+                count += len(inputs)
+    finally:
+        model.train(was_training)
+    if count == 0:
+        raise ValueError("No evaluation data.")
+    metrics = {'loss': total_loss / count}
+    if classify:
+        metrics['accuracy'] = correct / count
+    return metrics
+
+
+class EarlyStopping():
+    """Patience-based early stopping that keeps the best model state in memory"""
+
+    def __init__(self, patience=0, min_delta=0.0):
+        """Create the early stopping monitor
+
+        :param patience: the number of epochs without improvement before stopping (0 disables stopping)
+        :param min_delta: the minimum decrease of the monitored loss counted as an improvement
+
+        """
+        self.patience = patience
+        self.min_delta = min_delta
+        self.best_loss = None
+        self.best_epoch = None
+        self.best_state = None
+        self.bad_epochs = 0
+
+    def step(self, epoch, loss, model):
+        """Record the loss of an epoch and return True if training should stop
+
+        :param epoch: the epoch number
+        :param loss: the monitored loss of the epoch
+        :param model: the model, whose state is kept when the loss improves
+
+        """
+        if self.best_loss is None or loss < self.best_loss - self.min_delta:
+            self.best_loss, self.best_epoch, self.bad_epochs = loss, epoch, 0
+            self.best_state = {k: v.detach().clone() for k, v in model.state_dict().items()}
+            return False
+        self.bad_epochs += 1
+        return self.stopped
+
+    @property
+    def stopped(self):
+        """Whether the patience has run out"""
+        return self.patience > 0 and self.bad_epochs >= self.patience
+
+    def state_dict(self):
+        """Return the monitor state for checkpointing"""
+        return {'best_loss': self.best_loss, 'best_epoch': self.best_epoch,
+                'best_state': self.best_state, 'bad_epochs': self.bad_epochs}
+
+    def load_state_dict(self, state):
+        """Restore the monitor state from a checkpoint"""
+        self.best_loss, self.best_epoch = state['best_loss'], state['best_epoch']
+        self.best_state, self.bad_epochs = state['best_state'], state['bad_epochs']
+
+
+def kfp_metrics(metrics):
+    """Return metrics in the Kubeflow Pipelines 'mlpipeline-metrics' format
+
+    :param metrics: a dict of metric name to number
+
+    """
+    return {'metrics': [{'name': name.replace('_', '-'), 'numberValue': float(value), 'format': 'RAW'}
+                        for name, value in metrics.items() if value is not None]}
+
+
+def write_kfp_metrics(metrics_path, metrics):
+    """Write metrics to a Kubeflow Pipelines 'mlpipeline-metrics' output
+
+    :param metrics_path: the output path of the metrics artifact
+    :param metrics: a dict of metric name to number
+
+    """
+    with open(metrics_path, 'w') as f:
+        json.dump(kfp_metrics(metrics), f)
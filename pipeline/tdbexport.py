@@ -0,0 +1,209 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import os
+import time
+
+import torch
+from torch import nn
+
+from tdbeval import inference_mode
+from tdbtrainer import Net, TableNet
+
+LOG = logging.getLogger(__name__)
+
+# export 형식
+FORMAT_TORCHSCRIPT = 'torchscript'
+FORMAT_ONNX = 'onnx'
+FORMATS = (FORMAT_TORCHSCRIPT, FORMAT_ONNX)
+
+ONNX_OPSET = 13
+EXPORT_REPORT = 'export.json'
+
+
+def load_model(model_path):
+    """Return the model saved by run_training and an example input batch of one sample
+
+    Net and TableNet are told apart by their state_dict keys, and the
+    TableNet sizes are read from its weights.
+
+    :param model_path: the path of the saved state_dict
+
+    """
+    state = torch.load(model_path, map_location='cpu')
+    if 'conv1.weight' in state:
+        model, example = Net(), torch.rand(1, 1, 28, 28)
+    else:
+        in_features, out_features = state['fc1.weight'].shape[1], state['fc2.weight'].shape[0]
+        model, example = TableNet(in_features, out_features), torch.randn(1, in_features)
+    model.load_state_dict(state)
+    return model.eval(), example
+
+
+def quantize(model):
+    """Return an int8 dynamically quantized copy of the model (Linear layers)"""
+    return torch.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+def to_torchscript(model, example, path):
+    """Trace the model to TorchScript, save it to path and return the traced module"""
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example)
+    if hasattr(torch.jit, 'freeze'):
+        # 가중치를 상수로 고정해 eval 전용 그래프로 최적화
+        traced = torch.jit.freeze(traced)
+    torch.jit.save(traced, path)
+    return torch.jit.load(path)
+
+
+def to_onnx(model, example, path):
+    """Export the model to ONNX with a dynamic batch dimension
+
+    Returns a predict function backed by onnxruntime, or None when
+    onnxruntime is not installed (the file is still written).
+    """
+    with torch.no_grad():
+        torch.onnx.export(model, example, path, opset_version=ONNX_OPSET, input_names=['input'],
+                          output_names=['output'], dynamic_axes={'input': {0: 'batch'}, 'output': {0: 'batch'}})
+    try:
+        import onnxruntime
+    except ImportError:
+        LOG.warning("onnxruntime is not installed, %s is not checked.", path)
+        return None
+    session = onnxruntime.InferenceSession(path, providers=['CPUExecutionProvider'])
+    return lambda inputs: torch.from_numpy(session.run(None, {'input': inputs.numpy()})[0])
+
+
+def agreement(reference, candidate, inputs):
+    """Return how closely the candidate outputs match the reference outputs
+
+    :param reference: the float model
+    :param candidate: a function or module returning the outputs of an input batch
+    :param inputs: the input batch
+
+    """
+    with inference_mode():
+        expected, actual = reference(inputs), candidate(inputs)
+    diff = (expected - actual).abs().max().item()
+    result = {'max_abs_diff': diff, 'max_rel_diff': diff / max(expected.abs().max().item(), 1e-12)}
+    if expected.dim() == 2 and expected.shape[1] > 1:
+        result['top1_agreement'] = (expected.argmax(1) == actual.argmax(1)).float().mean().item()
+    return result
+
+
+def benchmark(predict, example, batch_size, iterations=50, warmup=5):
+    """Return the CPU latency of one sample and the throughput at batch_size
+
+    :param predict: a function or module returning the outputs of an input batch
+    :param example: an input batch of one sample
+    :param batch_size: the batch size of the throughput measurement
+    :param iterations: the number of timed calls
+    :param warmup: the number of untimed calls before timing
+
+    """
+    batch = example.repeat(batch_size, *([1] * (example.dim() - 1)))
+    latencies = []
+    with inference_mode():
+        for i in range(warmup + iterations):
+            start = time.perf_counter()
+            predict(example)
+            if i >= warmup:
+                latencies.append(time.perf_counter() - start)
+        for _ in range(warmup):
+            predict(batch)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            predict(batch)
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {'latency_ms_p50': latencies[len(latencies) // 2] * 1000,
+            'latency_ms_p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+            'samples_per_sec': batch_size * iterations / elapsed}
+
+
+def export_model(model_path, export_dir, formats=(FORMAT_TORCHSCRIPT,), quantized=True, batch_size=64,
+                 iterations=50, atol=1e-4, min_top1_agreement=0.99, max_rel_diff=0.05, seed=1):
+    """Export the trained model for CPU serving and report every variant
+
+    Each variant (format, float or int8) is checked against the float
+    eager model on a random input batch and timed on CPU. The report,
+    also written to export_dir/export.json, names the fastest variant
+    that agrees with the float model as 'best'.
+
+    :param model_path: the path of the state_dict saved by run_training
+    :param export_dir: the directory the exported artifacts are written to
+    :param formats: the export formats ('torchscript', 'onnx')
+    :param quantized: whether to also export int8 dynamically quantized variants
+    :param batch_size: the batch size of the agreement check and throughput measurement
+    :param iterations: the number of timed calls per measurement
+    :param atol: the largest absolute output difference accepted for a float variant
+    :param min_top1_agreement: the smallest top-1 agreement accepted for an int8 classifier
+    :param max_rel_diff: the largest output difference, relative to the largest output, accepted for an int8 regressor
+    :param seed: the seed of the random inputs
+
+    """
+    for fmt in formats:
+        if fmt not in FORMATS:
+            raise ValueError("Unsupported export format: {} (expected one of {})".format(fmt, FORMATS))
+    os.makedirs(export_dir, exist_ok=True)
+    torch.manual_seed(seed)
+    model, example = load_model(model_path)
+    inputs = torch.rand(batch_size, *example.shape[1:]) if isinstance(model, Net) \
+        else torch.randn(batch_size, *example.shape[1:])
+
+    report = {'eager': dict(path=model_path, format='eager', quantized=False, agrees=True,
+                            **benchmark(model, example, batch_size, iterations))}
+    candidates = [(False, model)]
+    if quantized:
+        candidates.append((True, quantize(model)))
+    for fmt in formats:
+        for is_quantized, variant_model in candidates:
+            if fmt == FORMAT_ONNX and is_quantized:
+                # 동적 양자화 모듈은 ONNX로 export 되지 않는다.
+                continue
+            name = fmt + ('-int8' if is_quantized else '')
+            path = os.path.join(export_dir, 'model-{}.{}'.format(name, 'onnx' if fmt == FORMAT_ONNX else 'pt'))
+            exported = (to_onnx if fmt == FORMAT_ONNX else to_torchscript)(variant_model, example, path)
+            entry = {'path': path, 'format': fmt, 'quantized': is_quantized, 'bytes': os.path.getsize(path)}
+            if exported is not None:
+                entry.update(agreement(model, exported, inputs))
+                entry.update(benchmark(exported, example, batch_size, iterations))
+                if is_quantized and 'top1_agreement' in entry:
+                    entry['agrees'] = entry['top1_agreement'] >= min_top1_agreement
+                elif is_quantized:
+                    entry['agrees'] = entry['max_rel_diff'] <= max_rel_diff
+                else:
+                    entry['agrees'] = entry['max_abs_diff'] <= atol
+            report[name] = entry
+            LOG.info("Exported %s: %s", name, entry)
+
+    passed = [name for name, entry in report.items() if entry.get('agrees')]
+    report['best'] = max(passed, key=lambda name: report[name]['samples_per_sec']) if passed else 'eager'
+    with open(os.path.join(export_dir, EXPORT_REPORT), 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def export_metrics(report):
+    """Return the per-variant latency/throughput of an export report as a flat metrics dict"""
+    metrics = {}
+    for name, entry in report.items():
+        if not isinstance(entry, dict):
+            continue
+        for key in ('latency_ms_p50', 'samples_per_sec', 'max_abs_diff'):
+            if key in entry:
+                metrics['{}_{}'.format(name.replace('-', '_'), key)] = entry[key]
+    return metrics
@@ -0,0 +1,177 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import collections
+import json
+import logging
+import os
+import tempfile
+
+import torch
+
+LOG = logging.getLogger(__name__)
+
+# optimizer 상태는 모델과 같은 버전으로 '<모델 이름>.optimizer'에 저장
+OPTIMIZER_SUFFIX = '.optimizer'
+STATUS_TRAINED = 'trained'
+STATUS_UNCHANGED = 'unchanged'
+
+
+def flatten_optimizer_state(state_dict):
+    """Return an optimizer state_dict as a flat dict of tensors and a JSON-serializable dict of the rest
+
+    :param state_dict: the state_dict of a torch optimizer
+
+    """
+    tensors, scalars = collections.OrderedDict(), {}
+    for index, state in state_dict['state'].items():
+        for key, value in state.items():
+            name = '{}.{}'.format(index, key)
+            if torch.is_tensor(value):
+                tensors[name] = value
+            else:
+                scalars[name] = value
+    return tensors, {'scalars': scalars, 'param_groups': state_dict['param_groups']}
+
+
+def unflatten_optimizer_state(tensors, metadata):
+    """Return the optimizer state_dict flattened by flatten_optimizer_state
+
+    :param tensors: the flat dict of tensors
+    :param metadata: the dict of scalars and param_groups
+
+    """
+    state = {}
+    for name, value in list(tensors.items()) + list(metadata['scalars'].items()):
+        index, key = name.split('.', 1)
+        state.setdefault(int(index), {})[key] = value
+    return {'state': state, 'param_groups': metadata['param_groups']}
+
+
+def previous_state(store, name, version=None):
+    """Return the manifest and the warm-start state of a stored model version, or (None, None)
+
+    :param store: the TDBArtifactStore
+    :param name: the model name
+    :param version: the version (the latest if None)
+
+    """
+    version = version or store.latest(name)
+    if version is None:
+        return None, None
+    manifest = store.manifest(name, version)
+    state = {'model': store.load(name, version)}
+    if version in store.versions(name + OPTIMIZER_SUFFIX):
+        optimizer = store.manifest(name + OPTIMIZER_SUFFIX, version)
+        state['optimizer'] = unflatten_optimizer_state(store.load(name + OPTIMIZER_SUFFIX, version),
+                                                       optimizer['metadata'])
+    return manifest, state
+
+
+def run_incremental(artifact_path, name, datasource, model_path, epochs, learning_rate, batch_size,
+                    version=None, full=False, **options):
+    """Train a datasource model on the rows appended since its latest version and commit a new version
+
+    The datasource parameters name a 'watermarkcolumn', a column that only
+    grows as rows are appended (an auto-increment key or an insert
+    timestamp). Each version records the largest value it was trained on
+    as its high-water mark; the next run reads only the rows above it, up
+    to the largest value at the time the run starts, and starts from the
+    weights and Adam state of that version instead of a new model. Rows
+    appended while the run trains are left for the next one.
+
+    A row committed later with a value at or below a recorded mark is never
+    read. Without a 'watermarklag' parameter the column must therefore be
+    strictly increasing in commit order. With one, each run stops that far
+    below the largest value (column units, or seconds for a timestamp) and
+    leaves the newest rows, which may still gain ties or late commits, to
+    the next run.
+
+    The first run, or a run with full, trains a new model on every row up
+    to the current mark. Nothing is trained or committed when no rows were
+    appended.
+
+    :param artifact_path: the TDBArtifactStore directory on the PVC
+    :param name: the model name in the store, e.g. 'tablenet-orders'
+    :param datasource: the datasource block of the training config
+    :param model_path: the path the trained state_dict is saved to
+    :param epochs: the maximum number of epochs over the new rows
+    :param learning_rate: the learning rate
+    :param batch_size: the training batch size
+    :param version: the version to commit (a timestamp if None)
+    :param full: whether to ignore the previous versions and train on all rows
+    :param options: other tdbtrainer.run_training arguments
+    :return: a dict with the status, the previous and new version, the (low, high] watermark range and the metrics
+
+    """
+    from tdbartifact import TDBArtifactStore
+    from tdbdatasource import lag_watermark, max_watermark
+    from tdbtrainer import run_training
+
+    parameters = datasource['parameters']
+    column = parameters.get('watermarkcolumn')
+    if not column:
+        raise ValueError("Incremental training needs a watermarkcolumn in the datasource parameters.")
+
+    store = TDBArtifactStore(artifact_path)
+    manifest, init_state = (None, None) if full else previous_state(store, name)
+    previous = manifest['version'] if manifest else None
+    low = manifest['metadata'].get('watermark') if manifest else None
+    if manifest and low is None:
+        LOG.warning("Version %s of %s has no watermark; training on every row", previous, name)
+    # 훈련 중에 추가되는 행은 다음 실행에서 읽도록 시작 시점의 최댓값(에서 lag를 뺀 값)까지만 읽는다.
+    high = lag_watermark(max_watermark(datasource['engine'], parameters), parameters.get('watermarklag', 0))
+    result = {'previous_version': previous, 'watermark': [low, high]}
+    if high is None or (low is not None and high <= low):
+        LOG.info("No rows appended to %s since %s=%s; keeping version %s", parameters['table'], column, low, previous)
+        return dict(result, status=STATUS_UNCHANGED, version=previous, metrics={})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        optimizer_path = os.path.join(tmp, 'optimizer.pt')
+        metrics = run_training('', model_path, epochs, learning_rate, batch_size, datasource=datasource,
+                               watermark=(low, high), init_state=init_state, optimizer_path=optimizer_path,
+                               **options)
+        tensors, optimizer_metadata = flatten_optimizer_state(torch.load(optimizer_path, map_location='cpu'))
+
+    # optimizer를 먼저 기록해야 LATEST가 바뀐 모델 버전에 항상 optimizer 상태가 있다.
+    model_state = torch.load(model_path, map_location='cpu')
+    committed = store.commit(name + OPTIMIZER_SUFFIX, tensors, version, optimizer_metadata)
+    committed = store.commit(name, model_state, committed['version'],
+                             dict(metrics, watermark=high, watermark_column=column, previous_version=previous))
+    LOG.info("Trained %s on %s in (%s, %s]: version %s, %d of %d tensors unchanged", name, column, low, high,
+             committed['version'], committed['stats']['deduplicated'], committed['stats']['tensors'])
+    return dict(result, status=STATUS_TRAINED, version=committed['version'], metrics=metrics)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Train a datasource model on its newly appended rows')
+    parser.add_argument('conf_file', help='training config with a datasource watermarkcolumn')
+    parser.add_argument('--artifact-path', default='/tmp/traindb-ml/artifacts')
+    parser.add_argument('--name', required=True, help="the model name in the store, e.g. 'tablenet-orders'")
+    parser.add_argument('--model-path', default='/tmp/traindb-ml/model.pt')
+    parser.add_argument('--full', action='store_true', help='train a new model on every row')
+    args = parser.parse_args()
+
+    from tdbsweep import HYPERPARAM_ARGS
+    with open(args.conf_file) as f:
+        conf = json.load(f)
+    kwargs = {HYPERPARAM_ARGS[k]: v for k, v in conf.get('hyperparams', {}).items() if k in HYPERPARAM_ARGS}
+    kwargs.setdefault('epochs', 1)
+    kwargs.setdefault('learning_rate', 0.001)
+    kwargs.setdefault('batch_size', 64)
+    result = run_incremental(args.artifact_path, args.name, conf['datasource'], args.model_path,
+                             full=args.full, **kwargs)
+    print(json.dumps(result, indent=2, default=str))
@@ -0,0 +1,109 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import torch
+from torch.utils.data import DataLoader
+
+# 입력 파이프라인 모드
+INPUT_MODE_TENSOR = 'tensor'  # 전체 데이터를 한 번에 하나의 tensor로 변환
+INPUT_MODE_LOADER = 'loader'  # DataLoader worker 프로세스 사용
+INPUT_MODES = (INPUT_MODE_TENSOR, INPUT_MODE_LOADER)
+
+
+class TensorBatches():
+    """Batches sliced from contiguous in-memory input and label tensors
+
+    Slicing is a view, so a batch costs no per-sample Python work or copy.
+    With a sampler (e.g. a DistributedSampler) only the sampled rows are
+    used, in the sampler's order.
+    """
+
+    def __init__(self, inputs, labels, batch_size, shuffle=False, sampler=None):
+        if len(inputs) != len(labels):
+            raise ValueError("inputs and labels have different lengths.")
+        self.inputs, self.labels = inputs.contiguous(), labels.contiguous()
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.sampler = sampler
+
+    def __len__(self):
+        rows = len(self.sampler) if self.sampler is not None else len(self.inputs)
+        return (rows + self.batch_size - 1) // self.batch_size
+
+    def __iter__(self):
+        inputs, labels = self.inputs, self.labels
+        if self.sampler is not None:
+            order = torch.tensor(list(self.sampler), dtype=torch.long)
+            inputs, labels = inputs[order], labels[order]
+        elif self.shuffle:
+            order = torch.randperm(len(inputs))
+            inputs, labels = inputs[order], labels[order]
+        for start in range(0, len(inputs), self.batch_size):
+            yield inputs[start:start + self.batch_size], labels[start:start + self.batch_size]
+
+
+def decode_mnist(dataset):
+    """Return the whole MNIST dataset as (inputs, labels) tensors
+
+    Equivalent to applying ToTensor() to every sample, done once for the
+    whole uint8 image tensor.
+
+    :param dataset: a torchvision MNIST dataset
+
+    """
+    inputs = dataset.data.unsqueeze(1).to(torch.float32).div_(255)
+    return inputs, dataset.targets.clone()
+
+
+def mnist_batches(dataset, batch_size, input_mode=INPUT_MODE_TENSOR,
+                  num_workers=0, prefetch_factor=2, pin_memory=False, shuffle=False, sampler=None):
+    """Return an iterable of (inputs, labels) batches over an MNIST dataset
+
+    :param dataset: a torchvision MNIST dataset (with transform=ToTensor() for the loader mode)
+    :param batch_size: the batch size
+    :param input_mode: 'tensor' to decode the dataset once, 'loader' to use DataLoader workers
+    :param num_workers: the number of DataLoader worker processes
+    :param prefetch_factor: the number of batches loaded in advance by each worker
+    :param pin_memory: whether to copy batches into pinned memory (only when CUDA is available)
+    :param shuffle: whether to reshuffle the data every epoch
+    :param sampler: an optional sampler (e.g. a DistributedSampler) choosing the rows
+
+    """
+    if input_mode == INPUT_MODE_TENSOR:
+        inputs, labels = decode_mnist(dataset)
+        return TensorBatches(inputs, labels, batch_size, shuffle=shuffle, sampler=sampler)
+    if input_mode == INPUT_MODE_LOADER:
+        return make_loader(dataset, batch_size, num_workers, prefetch_factor, pin_memory, shuffle, sampler)
+    raise ValueError("Unsupported input mode: {} (expected one of {})".format(input_mode, INPUT_MODES))
+
+
+def make_loader(dataset, batch_size, num_workers=0, prefetch_factor=2, pin_memory=False, shuffle=False,
+                sampler=None):
+    """Return a DataLoader with persistent, prefetching workers
+
+    :param dataset: the map-style dataset
+    :param batch_size: the batch size
+    :param num_workers: the number of DataLoader worker processes
+    :param prefetch_factor: the number of batches loaded in advance by each worker
+    :param pin_memory: whether to copy batches into pinned memory (only when CUDA is available)
+    :param shuffle: whether to reshuffle the data every epoch
+    :param sampler: an optional sampler (e.g. a DistributedSampler) choosing the rows
+
+    """
+    kwargs = {}
+    if num_workers > 0:
+        # epoch 마다 worker를 다시 띄우지 않는다.
+        kwargs.update(persistent_workers=True, prefetch_factor=prefetch_factor)
+    return DataLoader(dataset, batch_size=batch_size, shuffle=shuffle and sampler is None, sampler=sampler,
+                      num_workers=num_workers, pin_memory=pin_memory and torch.cuda.is_available(), **kwargs)
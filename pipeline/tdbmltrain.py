@@ -13,81 +13,186 @@
 # limitations under the License.
 
 # 필요한 라이브러리 import
+import json
+import os
+import sys
+from functools import partial
+from typing import NamedTuple
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../common/'))
+
+import tdbconstants
+
 import kfp
 from kfp import dsl
-from kfp.components import InputPath, OutputPath
+from kfp.components import OutputPath
 from kfp.components import func_to_container_op
 
 # 훈련 스크립트를 실행할 컨테이너 이미지 지정
 BASE_IMAGE = "pytorch/pytorch:1.7.1-cuda11.0-cudnn8-runtime"
+# BASE_IMAGE에 TrainDB-ML 모듈(tdbdatasource 등)을 추가한 이미지 (pipeline/Dockerfile 참고)
+TRAIN_IMAGE = "traindb/traindb-ml-train:latest"
+# 훈련 step 실패 시 재시도 횟수
+TRAIN_RETRIES = 3
+
+def datasource_from_conf(conf_file):
+    """Return the datasource block of a training config as a pipeline argument
+
+    :param conf_file: the path of the config file (e.g. conf/train_cnn_mnist.json)
+
+    """
+    with open(conf_file) as f:
+        return json.dumps(json.load(f)['datasource'])
+
+# 이전 실행 결과를 재사용할 수 있는지 확인하는 함수 정의
+@partial(func_to_container_op, base_image=TRAIN_IMAGE)
+def check_run_cache(
+    data_path: str,  # 입력 데이터 경로
+    model_path: str,  # 모델 저장 경로
+    epochs: int,  # 에폭 수
+    learning_rate: float,  # 학습률
+    batch_size: int,  # 배치 크기
+    datasource: str,  # datasource 설정 (JSON), 비어 있으면 MNIST 사용
+    run_cache_path: str,  # 실행 결과 캐시 경로 (PVC)
+    skip_if_unchanged: bool,  # fingerprint가 같으면 훈련 생략
+    patience: int,  # 조기 종료 patience
+    min_delta: float,  # 개선으로 인정할 최소 loss 감소량
+    momentum: float,  # 모멘텀 (Adam beta1)
+    chunk_size: int,  # datasource에서 한 번에 읽을 행 수 (datasource batch 경계가 달라짐)
+    input_mode: str,  # 입력 파이프라인 모드
+) -> NamedTuple('Outputs', [('status', str), ('fingerprint', str), ('mlpipeline_metrics', 'Metrics')]):
+    import json
+    import os
+    from collections import namedtuple
+    from tdbruncache import TDBRunCache, run_fingerprint
+
+    if not datasource:
+        # MNIST 원본 파일로 data hash를 계산한다.
+        from torchvision.datasets import MNIST
+        MNIST(data_path, train=True, download=True)
+        MNIST(data_path, train=False, download=True)
+        data_path = os.path.join(data_path, 'MNIST', 'raw')
+
+    # 같은 데이터라도 batch 구성이 달라지는 인자는 fingerprint에 포함
+    hyperparams = {'epochs': epochs, 'learning_rate': learning_rate, 'batch_size': batch_size,
+                   'patience': patience, 'min_delta': min_delta, 'momentum': momentum,
+                   'chunk_size': chunk_size, 'input_mode': input_mode}
+    fp = run_fingerprint(hyperparams, data_path, json.loads(datasource) if datasource else None)
+
+    status, metrics = 'miss', None
+    if skip_if_unchanged:
+        metrics = TDBRunCache(run_cache_path).restore(fp, model_path)
+        if metrics is not None:
+            status = 'hit'
+    print("Run fingerprint {}: {}".format(fp, status))
+
+    # 재사용한 실행의 기록된 metric을 출력
+    from tdbeval import kfp_metrics
+    outputs = namedtuple('Outputs', ['status', 'fingerprint', 'mlpipeline_metrics'])
+    return outputs(status, fp, json.dumps(kfp_metrics(metrics or {})))
 
 # 훈련 스크립트를 실행할 함수 정의
-@func_to_container_op
+@partial(func_to_container_op, base_image=TRAIN_IMAGE)
 def train(
-    data_path: InputPath(),  # 입력 데이터 경로
-    model_path: OutputPath(),  # 모델 저장 경로
+    data_path: str,  # 입력 데이터 경로
+    model_path: str,  # 모델 저장 경로 (PVC, check_run_cache와 export가 같은 경로를 사용)
     epochs: int,  # 에폭 수
     learning_rate: float,  # 학습률
     batch_size: int,  # 배치 크기
+    datasource: str,  # datasource 설정 (JSON), 비어 있으면 MNIST 사용
+    chunk_size: int,  # datasource에서 한 번에 읽을 행 수
+    prefetch: int,  # 미리 읽어 둘 chunk 수
+    cache_path: str,  # datasource 캐시 경로 (PVC), 비어 있으면 캐시 사용 안 함
+    cache_max_bytes: int,  # datasource 캐시 최대 크기
+    input_mode: str,  # 입력 파이프라인 모드 ('tensor' 또는 'loader')
+    num_workers: int,  # DataLoader worker 프로세스 수 ('loader' 모드)
+    prefetch_factor: int,  # worker 당 미리 읽어 둘 batch 수 ('loader' 모드)
+    pin_memory: bool,  # pinned memory 사용 여부 ('loader' 모드, CUDA 사용 시)
+    fingerprint: str,  # 실행 fingerprint (check_run_cache 출력)
+    run_id: str,  # pipeline 실행 ID (같은 실행의 재시도끼리만 checkpoint를 공유)
+    run_cache_path: str,  # 실행 결과 캐시 경로 (PVC)
+    test_batch_size: int,  # 평가 배치 크기
+    patience: int,  # 개선 없이 허용할 에폭 수 (0이면 조기 종료 안 함)
+    min_delta: float,  # 개선으로 인정할 최소 loss 감소량
+    momentum: float,  # 모멘텀 (Adam beta1)
+    checkpoint_path: str,  # checkpoint 경로 (PVC), 비어 있으면 checkpoint 사용 안 함
+    checkpoint_steps: int,  # checkpoint 간격 (batch 수, 0이면 에폭마다)
+    checkpoint_keep: int,  # 보관할 checkpoint 수
+    catalog_path: str,  # 모델 카탈로그 경로 (PVC), 비어 있으면 기록 안 함
+    modeltype: str,  # 카탈로그에 기록할 모델 타입
+    modelname: str,  # 카탈로그에 기록할 모델 이름
+    trace_path: str,  # 구간별 시간 trace, metric 경로 (PVC), 비어 있으면 기록 안 함
+    profile_start_step: int,  # torch profiler로 기록을 시작할 step
+    profile_steps: int,  # torch profiler로 기록할 step 수 (0이면 기록 안 함)
+    artifact_path: str,  # 모델 버전 저장소 경로 (PVC), 비어 있으면 기록 안 함
+    mlpipeline_metrics_path: OutputPath('Metrics'),  # 평가 metric 출력
 ):
-    import torch
-    from torch.utils.data import DataLoader
-    from torchvision.datasets import MNIST
-    from torchvision.transforms import ToTensor
-    from torch import nn, optim
-
-    # 데이터 로드
-    train_data = MNIST(data_path, train=True, download=True, transform=ToTensor())
-    test_data = MNIST(data_path, train=False, download=True, transform=ToTensor())
-
-    # 데이터 로더 생성
-    train_loader = DataLoader(train_data, batch_size=batch_size)
-    test_loader = DataLoader(test_data, batch_size=batch_size)
-
-    # 모델 정의
-    class Net(nn.Module):
-        def __init__(self):
-            super(Net, self).__init__()
-            self.conv1 = nn.Conv2d(1, 32, 3, 1)
-            self.conv2 = nn.Conv2d(32, 64, 3, 1)
-            self.dropout1 = nn.Dropout2d(0.25)
-            self.dropout2 = nn.Dropout2d(0.5)
-            self.fc1 = nn.Linear(9216, 128)
-            self.fc2 = nn.Linear(128, 10)
-
-        def forward(self, x):
-            x = self.conv1(x)
-            x = nn.functional.relu(x)
-            x = self.conv2(x)
-            x = nn.functional.relu(x)
-            x = nn.functional.max_pool2d(x, 2)
-            x = self.dropout1(x)
-            x = torch.flatten(x, 1)
-            x = self.fc1(x)
-            x = nn.functional.relu(x)
-            x = self.dropout2(x)
-            x = self.fc2(x)
-            output = nn.functional.log_softmax(x, dim=1)
-            return output
-
-    # 모델 초기화
-    model = Net()
-
-    # 손실 함수와 옵티마이저 정의
-    criterion = nn.CrossEntropyLoss()
-    optimizer = optim.Adam(model.parameters(), lr=learning_rate)
-
-    # 훈련
-    for epoch in range(epochs):
-        for i, (inputs, labels) in enumerate(train_loader):
-            optimizer.zero_grad()
-            outputs = model(inputs)
-            loss = criterion(outputs, labels)
-            loss.backward()
-            optimizer.step()
-
-    # 모델 저장
-    torch.save(model.state_dict(), model_path)
+    import json
+    import os
+    from tdbeval import write_kfp_metrics
+    from tdbtrainer import run_training
+
+    # 같은 pipeline 실행의 step이 재시도되면 그 checkpoint에서 이어서 훈련
+    checkpoint_dir = os.path.join(checkpoint_path, run_id) if checkpoint_path and run_id else ''
+    trace_dir = os.path.join(trace_path, run_id) if trace_path and run_id else ''
+
+    os.makedirs(os.path.dirname(os.path.abspath(model_path)), exist_ok=True)
+    metrics = run_training(
+        data_path, model_path, epochs, learning_rate, batch_size,
+        datasource=json.loads(datasource) if datasource else None,
+        chunk_size=chunk_size, prefetch=prefetch, cache_path=cache_path, cache_max_bytes=cache_max_bytes,
+        input_mode=input_mode, num_workers=num_workers, prefetch_factor=prefetch_factor, pin_memory=pin_memory,
+        test_batch_size=test_batch_size, patience=patience, min_delta=min_delta, momentum=momentum,
+        checkpoint_dir=checkpoint_dir, checkpoint_steps=checkpoint_steps, checkpoint_keep=checkpoint_keep,
+        trace_dir=trace_dir, profile_start_step=profile_start_step, profile_steps=profile_steps)
+    write_kfp_metrics(mlpipeline_metrics_path, metrics)
+
+    # 같은 fingerprint로 다시 실행되면 재사용할 수 있도록 결과 기록
+    # (model_path는 다음 실행이 덮어쓰므로 카탈로그에는 실행마다 남는 경로를 기록)
+    stored_path = model_path
+    if fingerprint and run_cache_path:
+        from tdbruncache import MODEL_FILE, TDBRunCache
+        TDBRunCache(run_cache_path).store(fingerprint, model_path, metrics)
+        stored_path = os.path.join(run_cache_path, fingerprint, MODEL_FILE)
+
+    # 바뀌지 않은 tensor는 이전 버전과 공유하는 content-addressed 저장소에 새 버전으로 기록
+    version = fingerprint[:16] if fingerprint else run_id
+    if artifact_path:
+        import torch
+        from tdbartifact import TDBArtifactStore
+        version = TDBArtifactStore(artifact_path).commit(
+            '{}-{}'.format(modeltype, modelname), torch.load(model_path, map_location='cpu'),
+            version=fingerprint[:16] if fingerprint else None, metadata=metrics)['version']
+
+    # 클러스터나 PVC를 뒤지지 않고 모델을 찾을 수 있도록 카탈로그에 기록
+    # (실행마다 자기 버전을 tag로 기록해야 실행과 trial 사이에서 가장 좋은 모델을 고를 수 있다)
+    if catalog_path:
+        from tdbcatalog import TDBModelCatalog
+        from traindbmodelinfo import TDBModelInfo
+        hyperparams = {'epochs': epochs, 'learning_rate': learning_rate, 'batch_size': batch_size,
+                       'patience': patience, 'min_delta': min_delta, 'momentum': momentum}
+        record = TDBModelInfo("traindb", "traindb-ml-", "latest", modeltype).catalog_record(
+            modelname, model_path=stored_path, hyperparams=hyperparams, metrics=metrics, version=version or None)
+        catalog = TDBModelCatalog(catalog_path)
+        catalog.register(**record)
+        catalog.close()
+
+# 훈련된 모델을 CPU 서빙용으로 export 하는 함수 정의
+@partial(func_to_container_op, base_image=TRAIN_IMAGE)
+def export(
+    model_path: str,  # 훈련된 모델(state_dict) 경로
+    export_path: str,  # export 결과 경로 (PVC)
+    export_formats: str,  # export 형식 (쉼표로 구분, 'torchscript', 'onnx')
+    export_quantize: bool,  # int8 동적 양자화 버전도 export
+    mlpipeline_metrics_path: OutputPath('Metrics'),  # 버전별 지연 시간, 처리량 출력
+) -> str:
+    from tdbeval import write_kfp_metrics
+    from tdbexport import export_model, export_metrics
+
+    formats = tuple(fmt.strip() for fmt in export_formats.split(',') if fmt.strip())
+    report = export_model(model_path, export_path, formats=formats, quantized=export_quantize)
+    write_kfp_metrics(mlpipeline_metrics_path, export_metrics(report))
+    # 서빙할 버전 (agreement 검사를 통과한 가장 빠른 버전)의 경로
+    return report[report['best']]['path']
 
 # 파이프라인 정의
 @dsl.pipeline(name="pytorch-mnist")
@@ -97,10 +202,204 @@ def pytorch_mnist(
     epochs: int = 10,
     learning_rate: float = 0.001,
     batch_size: int = 64,
+    datasource: str = "",
+    chunk_size: int = 4096,
+    prefetch: int = 4,
+    cache_path: str = tdbconstants.DATASET_CACHE_PATH,
+    cache_max_bytes: int = tdbconstants.DATASET_CACHE_MAX_BYTES,
+    input_mode: str = "tensor",
+    num_workers: int = 2,
+    prefetch_factor: int = 2,
+    pin_memory: bool = False,
+    run_cache_path: str = tdbconstants.RUN_CACHE_PATH,
+    skip_if_unchanged: bool = True,
+    test_batch_size: int = 1000,
+    patience: int = 3,
+    min_delta: float = 0.0,
+    momentum: float = 0.9,
+    checkpoint_path: str = tdbconstants.CHECKPOINT_PATH,
+    checkpoint_steps: int = 500,
+    checkpoint_keep: int = 3,
+    export_path: str = "/mnt/model/export",
+    export_formats: str = "torchscript",
+    export_quantize: bool = True,
+    catalog_path: str = tdbconstants.MODEL_CATALOG_PATH,
+    modeltype: str = "cnn",
+    modelname: str = "mnist",
+    trace_path: str = tdbconstants.TRACE_PATH,
+    profile_start_step: int = 10,
+    profile_steps: int = 0,
+    artifact_path: str = tdbconstants.ARTIFACT_PATH,
 ):
-    train_op = train(data_path, model_path, epochs, learning_rate, batch_size)
+    # 데이터, 모델, 캐시 경로가 있는 TrainDB PVC
+    pvolumes = {tdbconstants.PVC_DEFAULT_MOUNT_PATH: dsl.PipelineVolume(pvc=tdbconstants.DEFAULT_PVC_NAME)}
+
+    check_op = check_run_cache(
+        data_path=data_path, model_path=model_path, epochs=epochs, learning_rate=learning_rate,
+        batch_size=batch_size, datasource=datasource, run_cache_path=run_cache_path,
+        skip_if_unchanged=skip_if_unchanged, patience=patience, min_delta=min_delta, momentum=momentum,
+        chunk_size=chunk_size, input_mode=input_mode)
+    check_op.add_pvolumes(pvolumes)
+
+    # fingerprint가 같은 실행 결과가 있으면 훈련하지 않는다.
+    with dsl.Condition(check_op.outputs['status'] != 'hit'):
+        train_op = train(
+            data_path=data_path, model_path=model_path, epochs=epochs, learning_rate=learning_rate,
+            batch_size=batch_size, datasource=datasource, chunk_size=chunk_size, prefetch=prefetch,
+            cache_path=cache_path, cache_max_bytes=cache_max_bytes, input_mode=input_mode,
+            num_workers=num_workers, prefetch_factor=prefetch_factor, pin_memory=pin_memory,
+            fingerprint=check_op.outputs['fingerprint'], run_id=dsl.RUN_ID_PLACEHOLDER,
+            run_cache_path=run_cache_path, test_batch_size=test_batch_size, patience=patience,
+            min_delta=min_delta, momentum=momentum, checkpoint_path=checkpoint_path,
+            checkpoint_steps=checkpoint_steps, checkpoint_keep=checkpoint_keep, catalog_path=catalog_path,
+            modeltype=modeltype, modelname=modelname, trace_path=trace_path,
+            profile_start_step=profile_start_step, profile_steps=profile_steps, artifact_path=artifact_path)
+        train_op.add_pvolumes(pvolumes)
+        # preempt, OOM 등으로 실패하면 다시 실행해 checkpoint에서 재시작
+        train_op.set_retry(TRAIN_RETRIES)
+
+        # 서빙 전에 TorchScript/ONNX, int8 버전을 만들고 비교
+        export_op = export(model_path=model_path, export_path=export_path, export_formats=export_formats,
+                           export_quantize=export_quantize)
+        export_op.add_pvolumes(pvolumes).after(train_op)
+
+# datasource에 새로 추가된 행만으로 이전 버전에서 이어서 훈련하는 함수 정의
+@partial(func_to_container_op, base_image=TRAIN_IMAGE)
+def train_incremental(
+    model_path: str,  # 모델 저장 경로
+    epochs: int,  # 새로 추가된 행에 대한 에폭 수
+    learning_rate: float,  # 학습률
+    batch_size: int,  # 배치 크기
+    datasource: str,  # datasource 설정 (JSON, parameters에 watermarkcolumn 필요)
+    chunk_size: int,  # datasource에서 한 번에 읽을 행 수
+    prefetch: int,  # 미리 읽어 둘 chunk 수
+    momentum: float,  # 모멘텀 (Adam beta1)
+    full: bool,  # 이전 버전을 무시하고 모든 행으로 새로 훈련
+    artifact_path: str,  # 모델 버전 저장소 경로 (PVC)
+    catalog_path: str,  # 모델 카탈로그 경로 (PVC), 비어 있으면 기록 안 함
+    modeltype: str,  # 모델 타입
+    modelname: str,  # 모델 이름
+    mlpipeline_metrics_path: OutputPath('Metrics'),  # 평가 metric 출력
+) -> str:
+    import json
+    from tdbeval import write_kfp_metrics
+    from tdbincremental import STATUS_TRAINED, run_incremental
+
+    result = run_incremental(
+        artifact_path, '{}-{}'.format(modeltype, modelname), json.loads(datasource), model_path,
+        epochs, learning_rate, batch_size, full=full, chunk_size=chunk_size, prefetch=prefetch, momentum=momentum)
+    write_kfp_metrics(mlpipeline_metrics_path, result['metrics'])
+
+    # 새 버전을 훈련한 경우에만 카탈로그에 기록
+    if catalog_path and result['status'] == STATUS_TRAINED:
+        from tdbcatalog import TDBModelCatalog
+        from traindbmodelinfo import TDBModelInfo
+        hyperparams = {'epochs': epochs, 'learning_rate': learning_rate, 'batch_size': batch_size,
+                       'momentum': momentum, 'watermark': result['watermark']}
+        record = TDBModelInfo("traindb", "traindb-ml-", "latest", modeltype).catalog_record(
+            modelname, model_path=model_path, hyperparams=hyperparams, metrics=result['metrics'],
+            version=result['version'])
+        catalog = TDBModelCatalog(catalog_path)
+        catalog.register(**record)
+        catalog.close()
+    # 훈련한 (또는 그대로 유지한) 버전
+    return result['version'] or ''
+
+# 테이블이 커질 때마다 실행하는 증분 훈련 파이프라인 정의
+@dsl.pipeline(name="table-incremental")
+def table_incremental(
+    datasource: str,
+    model_path: str = "/mnt/model/model.pt",
+    epochs: int = 1,
+    learning_rate: float = 0.001,
+    batch_size: int = 64,
+    chunk_size: int = 4096,
+    prefetch: int = 4,
+    momentum: float = 0.9,
+    full: bool = False,
+    artifact_path: str = tdbconstants.ARTIFACT_PATH,
+    catalog_path: str = tdbconstants.MODEL_CATALOG_PATH,
+    modeltype: str = "tablenet",
+    modelname: str = "table",
+):
+    pvolumes = {tdbconstants.PVC_DEFAULT_MOUNT_PATH: dsl.PipelineVolume(pvc=tdbconstants.DEFAULT_PVC_NAME)}
+    train_op = train_incremental(
+        model_path=model_path, epochs=epochs, learning_rate=learning_rate, batch_size=batch_size,
+        datasource=datasource, chunk_size=chunk_size, prefetch=prefetch, momentum=momentum, full=full,
+        artifact_path=artifact_path, catalog_path=catalog_path, modeltype=modeltype, modelname=modelname)
+    train_op.add_pvolumes(pvolumes)
+    train_op.set_retry(TRAIN_RETRIES)
+
+# sweep trial 하나를 훈련하는 함수 정의
+@partial(func_to_container_op, base_image=TRAIN_IMAGE)
+def sweep_trial(
+    trial: str,  # trial (JSON, tdbsweep.generate_trials)
+    epochs: int,  # 이 rung의 에폭 수
+    rung: int,  # rung 번호
+    data_path: str,  # 입력 데이터 경로
+    sweep_dir: str,  # sweep 결과 경로 (PVC)
+    datasource: str,  # datasource 설정 (JSON), 비어 있으면 MNIST 사용
+):
+    import json
+    from tdbsweep import train_trial
+
+    train_trial(json.loads(trial), epochs, rung, data_path, sweep_dir,
+                json.loads(datasource) if datasource else None)
+
+# 다음 rung으로 올라갈 trial을 고르는 함수 정의
+@partial(func_to_container_op, base_image=TRAIN_IMAGE)
+def select_sweep_trials(
+    trials: str,  # 이전 rung의 trial 목록 (JSON)
+    rung: int,  # 이전 rung 번호
+    keep: int,  # 남길 trial 수
+    sweep_dir: str,  # sweep 결과 경로 (PVC)
+) -> str:
+    import json
+    from tdbsweep import select_trials
+
+    return json.dumps(select_trials(json.loads(trials), rung, keep, sweep_dir))
+
+def sweep_pipeline(conf_file):
+    """Return a pipeline that fans the trials of a sweep config out as parallel ops
+
+    Trials run in dsl.ParallelFor loops capped at the sweep's 'parallelism'.
+    With successive halving, each rung after the first trains only the best
+    trials of the previous rung, chosen by select_sweep_trials.
+
+    :param conf_file: the path of the sweep config (e.g. conf/sweep_cnn_mnist.json)
+
+    """
+    from tdbsweep import load_sweep_config, generate_trials, sweep_rungs
+
+    hyperparams, sweep = load_sweep_config(conf_file)
+    trials = generate_trials(hyperparams, sweep)
+    rungs = sweep_rungs(hyperparams, sweep, len(trials))
+    parallelism = sweep.get('parallelism', len(trials))
+
+    @dsl.pipeline(name="pytorch-mnist-sweep")
+    def pytorch_mnist_sweep(
+        data_path: str = "/mnt/data/mnist",
+        sweep_dir: str = "/mnt/model/sweep",
+        datasource: str = "",
+    ):
+        pvolumes = {tdbconstants.PVC_DEFAULT_MOUNT_PATH: dsl.PipelineVolume(pvc=tdbconstants.DEFAULT_PVC_NAME)}
+        # 첫 rung은 컴파일 시점의 trial 목록, 이후 rung은 select_sweep_trials 출력
+        items, items_arg, previous = trials, json.dumps(trials), None
+        for rung, (epochs, keep) in enumerate(rungs):
+            if rung > 0:
+                # 이전 rung이 끝나면 상위 trial만 남긴다.
+                select_op = select_sweep_trials(items_arg, rung - 1, keep, sweep_dir)
+                select_op.add_pvolumes(pvolumes).after(previous)
+                items = items_arg = select_op.output
+            with dsl.ParallelFor(items, parallelism=parallelism) as trial:
+                previous = sweep_trial(trial, epochs, rung, data_path, sweep_dir, datasource)
+                previous.add_pvolumes(pvolumes)
+
+    return pytorch_mnist_sweep
 
 # 파이프라인 실행
 if __name__ == "__main__":
     kfp.compiler.Compiler().compile(pytorch_mnist, "pytorch-mnist.tar.gz")
+    kfp.compiler.Compiler().compile(table_incremental, "table-incremental.tar.gz")
+    kfp.compiler.Compiler().compile(sweep_pipeline("../conf/sweep_cnn_mnist.json"), "pytorch-mnist-sweep.tar.gz")
 
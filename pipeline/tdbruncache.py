@@ -0,0 +1,180 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import shutil
+import uuid
+
+LOG = logging.getLogger(__name__)
+
+# 모델 결과에 영향을 주는 훈련 코드 모듈
+CODE_MODULES = ('tdbmltrain', 'tdbdatasource', 'tdbinput', 'tdbdatacache', 'tdbruncache', 'tdbeval', 'tdbtrainer')
+# fingerprint 계산 시 제외할 datasource 파라미터
+SECRET_PARAMETERS = ('user', 'password')
+
+MODEL_FILE = 'model.pt'
+METRICS_FILE = 'metrics.json'
+FINGERPRINT_FILE = 'fingerprint.json'
+
+_BLOCK_SIZE = 1 << 20
+
+
+def _update_file(digest, filename):
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(_BLOCK_SIZE), b''):
+            digest.update(block)
+
+
+def code_version(modules=CODE_MODULES):
+    """Return a hash of the source files of the training code
+
+    :param modules: the names of the modules to hash (missing modules are skipped)
+
+    """
+    digest = hashlib.sha256()
+    for name in modules:
+        spec = importlib.util.find_spec(name)
+        if spec is None or not spec.origin or not os.path.isfile(spec.origin):
+            continue
+        digest.update(name.encode('utf-8'))
+        _update_file(digest, spec.origin)
+    return digest.hexdigest()
+
+
+def path_hash(data_path):
+    """Return a hash of the contents of every file under data_path
+
+    :param data_path: a file or directory
+
+    """
+    digest = hashlib.sha256()
+    if os.path.isfile(data_path):
+        _update_file(digest, data_path)
+        return digest.hexdigest()
+    for root, dirs, files in os.walk(data_path):
+        dirs.sort()
+        for name in sorted(files):
+            filename = os.path.join(root, name)
+            digest.update(os.path.relpath(filename, data_path).encode('utf-8'))
+            _update_file(digest, filename)
+    return digest.hexdigest()
+
+
+def datasource_hash(datasource, version):
+    """Return a hash of a datasource config and its table version
+
+    :param datasource: the datasource block of the training config
+    :param version: the table version (see tdbdatasource.table_version)
+
+    """
+    parameters = {k: v for k, v in datasource['parameters'].items() if k not in SECRET_PARAMETERS}
+    conf = {'engine': datasource['engine'], 'parameters': parameters, 'version': version}
+    return hashlib.sha256(json.dumps(conf, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def fingerprint(hyperparams, data_digest, code_digest):
+    """Return the fingerprint of a training run
+
+    :param hyperparams: a dict of the hyperparameters that affect the model
+    :param data_digest: the hash of the training data
+    :param code_digest: the hash of the training code
+
+    """
+    inputs = {'hyperparams': hyperparams, 'data': data_digest, 'code': code_digest}
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class TDBRunCache():
+    """Models and metrics of finished training runs on the PVC, keyed by fingerprint"""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def lookup(self, fp):
+        """Return the recorded metrics of a run, or None if it was never stored
+
+        :param fp: the run fingerprint
+
+        """
+        path = os.path.join(self.root, fp)
+        if not os.path.exists(os.path.join(path, MODEL_FILE)):
+            return None
+        with open(os.path.join(path, METRICS_FILE)) as f:
+            return json.load(f)
+
+    def restore(self, fp, model_path):
+        """Copy the stored model of a run to model_path and return its metrics
+
+        :param fp: the run fingerprint
+        :param model_path: the destination of the model artifact
+
+        """
+        metrics = self.lookup(fp)
+        if metrics is None:
+            return None
+        os.makedirs(os.path.dirname(os.path.abspath(model_path)), exist_ok=True)
+        shutil.copyfile(os.path.join(self.root, fp, MODEL_FILE), model_path)
+        LOG.info("Reused the model of run %s", fp)
+        return metrics
+
+    def store(self, fp, model_path, metrics, inputs=None):
+        """Record the model and metrics of a finished run
+
+        :param fp: the run fingerprint
+        :param model_path: the path of the trained model artifact
+        :param metrics: a dict of the run metrics
+        :param inputs: an optional dict describing the fingerprint inputs
+
+        """
+        path = os.path.join(self.root, fp)
+        tmp = os.path.join(self.root, '.tmp-{}-{}'.format(fp, uuid.uuid4().hex))
+        os.makedirs(tmp)
+        try:
+            shutil.copyfile(model_path, os.path.join(tmp, MODEL_FILE))
+            with open(os.path.join(tmp, METRICS_FILE), 'w') as f:
+                json.dump(metrics, f)
+            with open(os.path.join(tmp, FINGERPRINT_FILE), 'w') as f:
+                json.dump(inputs or {}, f)
+            # 다시 훈련한 결과(skip_if_unchanged=False)가 이전 결과를 대체
+            if os.path.exists(path):
+                old = os.path.join(self.root, '.old-{}-{}'.format(fp, uuid.uuid4().hex))
+                os.rename(path, old)
+                os.rename(tmp, path)
+                shutil.rmtree(old, ignore_errors=True)
+            else:
+                os.rename(tmp, path)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+
+def run_fingerprint(hyperparams, data_path=None, datasource=None):
+    """Return the fingerprint of a training run on MNIST or a datasource
+
+    :param hyperparams: a dict of the hyperparameters that affect the model
+    :param data_path: the MNIST data directory (used when datasource is empty)
+    :param datasource: the datasource block of the training config
+
+    """
+    if datasource:
+        from tdbdatasource import table_version
+        data_digest = datasource_hash(datasource, table_version(datasource['engine'], datasource['parameters']))
+    else:
+        data_digest = path_hash(data_path)
+    return fingerprint(hyperparams, data_digest, code_version())
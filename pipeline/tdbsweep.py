@@ -0,0 +1,248 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import itertools
+import json
+import logging
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+LOG = logging.getLogger(__name__)
+
+# 설정 파일의 hyperparams 이름 -> tdbtrainer.run_training 인자 이름
+HYPERPARAM_ARGS = {
+    'epochs': 'epochs',
+    'lr': 'learning_rate',
+    'batch-size': 'batch_size',
+    'test-batch-size': 'test_batch_size',
+    'momentum': 'momentum',
+    'patience': 'patience',
+    'min-delta': 'min_delta',
+}
+SWEEP_GRID = 'grid'
+SWEEP_RANDOM = 'random'
+METRICS_FILE = 'metrics.json'
+
+
+def load_sweep_config(conf_file):
+    """Return the hyperparams and sweep blocks of a sweep config
+
+    :param conf_file: the path of the config file (e.g. conf/sweep_cnn_mnist.json)
+
+    """
+    with open(conf_file) as f:
+        conf = json.load(f)
+    return conf['hyperparams'], conf['sweep']
+
+
+def _sample(spec, rng):
+    # 목록이면 하나를 고르고, {min, max[, log]} 범위면 균등(또는 로그 균등) 샘플링
+    if isinstance(spec, list):
+        return rng.choice(spec)
+    low, high = spec['min'], spec['max']
+    if spec.get('log'):
+        value = math.exp(rng.uniform(math.log(low), math.log(high)))
+    else:
+        value = rng.uniform(low, high)
+    if isinstance(low, int) and isinstance(high, int):
+        return int(round(value))
+    return value
+
+
+def generate_trials(hyperparams, sweep):
+    """Return the list of trials of a sweep
+
+    Each trial is a dict with a 'trial' id and 'hyperparams', the base
+    hyperparams overridden by the swept values.
+
+    :param hyperparams: the base hyperparams block
+    :param sweep: the sweep block ('method', 'parameters' and, for random search, 'trials' and 'seed')
+
+    """
+    parameters = sweep['parameters']
+    unknown = set(parameters) - set(HYPERPARAM_ARGS) - {'seed'}
+    if unknown:
+        raise ValueError("Unknown sweep parameters: {}".format(sorted(unknown)))
+
+    method = sweep.get('method', SWEEP_GRID)
+    if method == SWEEP_GRID:
+        names = sorted(parameters)
+        for name in names:
+            if not isinstance(parameters[name], list):
+                raise ValueError("Grid sweep parameter {} must be a list.".format(name))
+        points = [dict(zip(names, values)) for values in itertools.product(*(parameters[n] for n in names))]
+    elif method == SWEEP_RANDOM:
+        rng = random.Random(sweep.get('seed', hyperparams.get('seed')))
+        points = [{name: _sample(spec, rng) for name, spec in sorted(parameters.items())}
+                  for _ in range(sweep['trials'])]
+    else:
+        raise ValueError("Unsupported sweep method: {}".format(method))
+
+    return [{'trial': i, 'hyperparams': dict(hyperparams, **point)} for i, point in enumerate(points)]
+
+
+def halving_rungs(num_trials, max_epochs, eta=3, min_epochs=1):
+    """Return the successive halving schedule as a list of (epochs, trials) per rung
+
+    Every rung trains the best 1/eta of the trials of the previous rung for
+    eta times as many epochs, up to max_epochs.
+
+    :param num_trials: the number of trials in the first rung
+    :param max_epochs: the number of epochs of the last rung
+    :param eta: the reduction factor
+    :param min_epochs: the number of epochs of the first rung
+
+    """
+    if eta < 2:
+        raise ValueError("eta must be at least 2.")
+    rungs, epochs, keep = [], min(min_epochs, max_epochs), num_trials
+    while epochs < max_epochs and keep > 1:
+        rungs.append((epochs, keep))
+        epochs, keep = epochs * eta, max(1, keep // eta)
+    rungs.append((max_epochs, keep))
+    return rungs
+
+
+def sweep_rungs(hyperparams, sweep, num_trials):
+    """Return the rungs of a sweep, a single rung when successive halving is off
+
+    :param hyperparams: the base hyperparams block
+    :param sweep: the sweep block (with an optional 'halving' block of 'eta' and 'min-epochs')
+    :param num_trials: the number of trials
+
+    """
+    halving = sweep.get('halving')
+    if not halving:
+        return [(hyperparams['epochs'], num_trials)]
+    return halving_rungs(num_trials, hyperparams['epochs'], halving.get('eta', 3), halving.get('min-epochs', 1))
+
+
+def trial_dir(sweep_dir, trial, rung):
+    """Return the output directory of a trial in a rung"""
+    return os.path.join(sweep_dir, 'trial-{}'.format(trial['trial']), 'rung-{}'.format(rung))
+
+
+def objective(metrics):
+    """Return the loss that trials are ranked by (lower is better)"""
+    if metrics is None:
+        return float('inf')
+    return metrics.get('test_loss', metrics.get('train_loss', float('inf')))
+
+
+def train_trial(trial, epochs, rung, data_path, sweep_dir, datasource=None):
+    """Train one trial for the given number of epochs and record its metrics
+
+    :param trial: the trial (see generate_trials)
+    :param epochs: the number of epochs of the rung
+    :param rung: the rung index
+    :param data_path: the MNIST data directory
+    :param sweep_dir: the output directory of the sweep
+    :param datasource: the datasource block of the training config
+
+    """
+    import torch
+    from tdbtrainer import run_training
+
+    hyperparams = trial['hyperparams']
+    if 'seed' in hyperparams:
+        torch.manual_seed(hyperparams['seed'])
+    kwargs = {HYPERPARAM_ARGS[k]: v for k, v in hyperparams.items() if k in HYPERPARAM_ARGS}
+    kwargs['epochs'] = epochs
+
+    out_dir = trial_dir(sweep_dir, trial, rung)
+    os.makedirs(out_dir, exist_ok=True)
+    metrics = run_training(data_path, os.path.join(out_dir, 'model.pt'), datasource=datasource, **kwargs)
+    with open(os.path.join(out_dir, METRICS_FILE), 'w') as f:
+        json.dump({'trial': trial, 'epochs': epochs, 'metrics': metrics}, f)
+    return metrics
+
+
+def select_trials(trials, rung, keep, sweep_dir):
+    """Return the best keep trials of a finished rung, read from their metrics files
+
+    :param trials: the trials that ran in the rung
+    :param rung: the rung index
+    :param keep: the number of trials to keep
+    :param sweep_dir: the output directory of the sweep
+
+    """
+    def loss(trial):
+        try:
+            with open(os.path.join(trial_dir(sweep_dir, trial, rung), METRICS_FILE)) as f:
+                return objective(json.load(f)['metrics'])
+        except (OSError, ValueError, KeyError):  # 실패한 trial
+            return float('inf')
+    return sorted(trials, key=loss)[:keep]
+
+
+def _init_worker(num_threads):
+    # 프로세스들이 CPU 코어를 나눠 쓰도록 intra-op 스레드 수를 제한
+    import torch
+    torch.set_num_threads(num_threads)
+
+
+def run_sweep_local(trials, rungs, data_path, sweep_dir, max_workers=None, datasource=None):
+    """Run a sweep on a local process pool and return the last rung's results, best first
+
+    :param trials: the trials (see generate_trials)
+    :param rungs: the (epochs, trials) schedule (see sweep_rungs)
+    :param data_path: the MNIST data directory
+    :param sweep_dir: the output directory of the sweep
+    :param max_workers: the maximum number of concurrent trials
+    :param datasource: the datasource block of the training config
+
+    """
+    max_workers = max_workers or os.cpu_count()
+    num_threads = max(1, os.cpu_count() // max_workers)
+    survivors, results = list(trials), []
+    with ProcessPoolExecutor(max_workers, initializer=_init_worker, initargs=(num_threads,)) as pool:
+        for rung, (epochs, keep) in enumerate(rungs):
+            survivors = survivors[:keep]
+            futures = {pool.submit(train_trial, t, epochs, rung, data_path, sweep_dir, datasource): t
+                       for t in survivors}
+            results = []
+            for future in as_completed(futures):
+                trial = futures[future]
+                try:
+                    metrics = future.result()
+                except Exception as e:
+                    LOG.error("Trial %d failed in rung %d: %s", trial['trial'], rung, e)
+                    metrics = None
+                results.append((trial, metrics))
+            results.sort(key=lambda r: objective(r[1]))
+            survivors = [trial for trial, _ in results]
+            LOG.info("Rung %d (%d epochs): best trial %d, loss %s", rung, epochs,
+                     results[0][0]['trial'], objective(results[0][1]))
+    return results
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Run a TrainDB-ML hyperparameter sweep locally')
+    parser.add_argument('conf_file', help='sweep config (e.g. conf/sweep_cnn_mnist.json)')
+    parser.add_argument('--data-path', default='/tmp/traindb-ml/data/mnist')
+    parser.add_argument('--sweep-dir', default='/tmp/traindb-ml/sweep')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    hyperparams, sweep = load_sweep_config(args.conf_file)
+    trials = generate_trials(hyperparams, sweep)
+    rungs = sweep_rungs(hyperparams, sweep, len(trials))
+    results = run_sweep_local(trials, rungs, args.data_path, args.sweep_dir,
+                              args.workers or sweep.get('parallelism'))
+    for trial, metrics in results:
+        print(trial['trial'], objective(metrics), trial['hyperparams'])
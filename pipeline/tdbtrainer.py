@@ -0,0 +1,381 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import itertools
+import os
+import random
+import time
+
+import torch
+import torch.distributed as dist
+from torch import nn, optim
+from torch.nn.parallel import DistributedDataParallel
+
+from tdbeval import EarlyStopping, evaluate
+from tdbinput import INPUT_MODE_TENSOR
+
+
+# 모델 정의
+class Net(nn.Module):
+    def __init__(self):
+        super(Net, self).__init__()
+        self.conv1 = nn.Conv2d(1, 32, 3, 1)
+        self.conv2 = nn.Conv2d(32, 64, 3, 1)
+        self.dropout1 = nn.Dropout2d(0.25)
+        self.dropout2 = nn.Dropout2d(0.5)
+        self.fc1 = nn.Linear(9216, 128)
+        self.fc2 = nn.Linear(128, 10)
+
+    def forward(self, x):
+        x = self.conv1(x)
+        x = nn.functional.relu(x)
+        x = self.conv2(x)
+        x = nn.functional.relu(x)
+        x = nn.functional.max_pool2d(x, 2)
+        x = self.dropout1(x)
+        x = torch.flatten(x, 1)
+        x = self.fc1(x)
+        x = nn.functional.relu(x)
+        x = self.dropout2(x)
+        x = self.fc2(x)
+        output = nn.functional.log_softmax(x, dim=1)
+        return output
+
+
+# datasource 테이블용 모델 정의
+class TableNet(nn.Module):
+    def __init__(self, in_features, out_features):
+        super(TableNet, self).__init__()
+        self.fc1 = nn.Linear(in_features, 128)
+        self.fc2 = nn.Linear(128, out_features)
+
+    def forward(self, x):
+        x = self.fc1(x)
+        x = nn.functional.relu(x)
+        return self.fc2(x)
+
+
+def table_data(datasource, batch_size, chunk_size, prefetch, cache_path='', cache_max_bytes=0,
+               rank=0, world_size=1, watermark=None):
+    """Return the datasource dataset and a callable yielding its (inputs, labels) batches
+
+    In distributed training every rank reads the table and keeps every
+    world_size-th chunk of chunk_size rows, starting at its rank. Cached
+    shards are split into chunks of the same size.
+
+    :param datasource: the datasource block of the training config
+    :param batch_size: the batch size
+    :param chunk_size: the number of rows read from the table at a time
+    :param prefetch: the maximum number of chunks buffered ahead
+    :param cache_path: the dataset cache directory on the PVC (empty disables the cache)
+    :param cache_max_bytes: the maximum size of the dataset cache
+    :param rank: the rank of this process in distributed training
+    :param world_size: the number of processes in distributed training
+    :param watermark: a (low, high) pair to read only the rows with low < watermarkcolumn <= high
+
+    """
+    from tdbdatasource import TDBTableDataset, watermark_where
+
+    # datasource 테이블을 chunk 단위로 스트리밍
+    parameters = datasource['parameters']
+    where, args = None, ()
+    if watermark is not None:
+        where, args = watermark_where(datasource['engine'], parameters['watermarkcolumn'], *watermark)
+    dataset = TDBTableDataset(datasource['engine'], parameters, where=where, chunk_size=chunk_size,
+                              prefetch=prefetch, args=args)
+
+    if cache_path:
+        from tdbdatasource import table_version
+        from tdbdatacache import TDBDatasetCache
+
+        # 같은 query, 같은 테이블 버전이면 PVC의 mmap 캐시를 재사용
+        cache = TDBDatasetCache(cache_path, cache_max_bytes)
+        query = '{} {}'.format(dataset.query, list(dataset.args)) if dataset.args else dataset.query
+        key = cache.key(query, table_version(datasource['engine'], parameters))
+        cached = cache.get_or_put(key, dataset.columns, dataset.chunks)
+
+        # 캐시 shard(최대 DEFAULT_SHARD_ROWS 행)를 그대로 나누면 작은 테이블은 rank 0이 모두 가져가므로
+        # chunk_size 단위로 다시 나눈다.
+        def table_chunks():
+            for chunk in cached.chunks(rows=chunk_size):
+                yield dataset.split(torch.from_numpy(chunk))
+    else:
+        table_chunks = dataset.__iter__
+
+    def table_batches():
+        # chunk를 batch_size 크기로 나눈다. labelcolumn이 없으면 입력 자체를 복원한다.
+        for index, chunk in enumerate(table_chunks()):
+            if index % world_size != rank:
+                continue
+            inputs, labels = chunk if dataset.labelcolumn else (chunk, chunk)
+            labels = labels.reshape(len(labels), -1)
+            yield from zip(inputs.split(batch_size), labels.split(batch_size))
+
+    return dataset, table_batches
+
+
+def mnist_data(data_path, batch_size, test_batch_size, input_mode=INPUT_MODE_TENSOR,
+               num_workers=0, prefetch_factor=2, pin_memory=False, distributed=False):
+    """Return the MNIST train and test batches, and the train DistributedSampler if distributed
+
+    :param data_path: the MNIST data directory
+    :param batch_size: the training batch size
+    :param test_batch_size: the evaluation batch size
+    :param input_mode: the input pipeline mode (see tdbinput.mnist_batches)
+    :param num_workers: the number of DataLoader worker processes
+    :param prefetch_factor: the number of batches loaded in advance by each worker
+    :param pin_memory: whether to use pinned memory
+    :param distributed: whether to shard the training data across the process group
+
+    """
+    from torchvision.datasets import MNIST
+    from torchvision.transforms import ToTensor
+    from torch.utils.data.distributed import DistributedSampler
+    from tdbinput import mnist_batches
+
+    # 데이터 로드. 분산 훈련에서는 rank 0이 먼저 내려받는다.
+    main = not distributed or dist.get_rank() == 0
+    if not main:
+        dist.barrier()
+    train_data = MNIST(data_path, train=True, download=True, transform=ToTensor())
+    test_data = MNIST(data_path, train=False, download=True, transform=ToTensor())
+    if distributed and main:
+        dist.barrier()
+
+    # 데이터 로더 생성
+    sampler = DistributedSampler(train_data, shuffle=False) if distributed else None
+    loader_options = dict(input_mode=input_mode, num_workers=num_workers,
+                          prefetch_factor=prefetch_factor, pin_memory=pin_memory)
+    train_loader = mnist_batches(train_data, batch_size, sampler=sampler, **loader_options)
+    test_loader = mnist_batches(test_data, test_batch_size, **loader_options)
+    return train_loader, test_loader, sampler
+
+
+def run_training(data_path, model_path, epochs, learning_rate, batch_size,
+                 datasource=None, chunk_size=4096, prefetch=4, cache_path='', cache_max_bytes=0,
+                 input_mode=INPUT_MODE_TENSOR, num_workers=0, prefetch_factor=2, pin_memory=False,
+                 test_batch_size=1000, patience=0, min_delta=0.0, momentum=0.9,
+                 checkpoint_dir='', checkpoint_steps=0, checkpoint_keep=3, progress_steps=100, progress_seconds=10.0,
+                 trace_dir='', profile_start_step=0, profile_steps=0, watermark=None, init_state=None,
+                 optimizer_path=''):
+    """Train Net on MNIST (or TableNet on a datasource), save the best model and return its metrics
+
+    :param data_path: the MNIST data directory (used when datasource is empty)
+    :param model_path: the path the trained state_dict is saved to
+    :param epochs: the maximum number of epochs
+    :param learning_rate: the learning rate
+    :param batch_size: the training batch size
+    :param datasource: the datasource block of the training config
+    :param momentum: the momentum (Adam beta1)
+    :param checkpoint_dir: the checkpoint directory on the PVC (empty disables checkpointing)
+    :param checkpoint_steps: the number of batches between checkpoints (0 checkpoints once per epoch)
+    :param checkpoint_keep: the number of checkpoints to keep
+    :param progress_steps: the number of batches between progress events (0 for time only)
+    :param progress_seconds: the seconds between progress events (0 for steps only)
+    :param trace_dir: the directory on the PVC for the span trace and metrics files (empty writes none)
+    :param profile_start_step: the first step of the torch profiler capture
+    :param profile_steps: the number of steps to profile into trace_dir (0, or an empty trace_dir, profiles nothing)
+    :param watermark: a (low, high) pair to train only on the datasource rows with low < watermarkcolumn <= high
+    :param init_state: a dict with the 'model' and optionally 'optimizer' state_dicts to warm-start from
+    :param optimizer_path: the path the final optimizer state_dict is saved to (empty saves none)
+
+    With init_state, training starts from the given weights and optimizer
+    state (see tdbincremental) with the given learning_rate and momentum.
+    When checkpoint_dir holds a checkpoint, training resumes from it; the
+    checkpoints are removed once the model is saved.
+    When a torch.distributed process group is initialized, the model is
+    trained with DistributedDataParallel on a shard of the data per rank, and
+    only rank 0 writes checkpoints and the model.
+    Every rank writes progress events (see tdbprogress) to stdout while it
+    trains, unless both progress_steps and progress_seconds are 0.
+    The data loading, forward/backward and optimizer time of every step is
+    measured with a TDBTracer (see tdbtrace); the totals are added to the
+    returned metrics and, with trace_dir, each rank writes
+    trace-rank<N>.json and metrics-rank<N>.prom there.
+    The remaining parameters are described in the train component of tdbmltrain.
+    """
+    distributed = dist.is_available() and dist.is_initialized()
+    rank, world_size = (dist.get_rank(), dist.get_world_size()) if distributed else (0, 1)
+    main = rank == 0
+
+    train_sampler = None
+    if datasource:
+        train_data, table_batches = table_data(datasource, batch_size, chunk_size, prefetch,
+                                               cache_path, cache_max_bytes, rank, world_size, watermark)
+        num_features = len(train_data.columnlist)
+    else:
+        train_loader, test_loader, train_sampler = mnist_data(
+            data_path, batch_size, test_batch_size, input_mode, num_workers, prefetch_factor, pin_memory,
+            distributed)
+
+    # 모델 초기화, 손실 함수 정의
+    if datasource:
+        model = TableNet(num_features, 1 if train_data.labelcolumn else num_features)
+        criterion = nn.MSELoss()
+    else:
+        model = Net()
+        criterion = nn.CrossEntropyLoss()
+
+    # 분산 훈련에서는 gradient를 all-reduce 하는 DDP 모델로 forward/backward 한다.
+    train_model = DistributedDataParallel(model) if distributed else model
+
+    # 옵티마이저 정의
+    optimizer = optim.Adam(model.parameters(), lr=learning_rate, betas=(momentum, 0.999))
+
+    # 이전 버전의 가중치와 optimizer 상태에서 이어서 훈련 (학습률 등은 이번 인자를 사용)
+    if init_state is not None:
+        model.load_state_dict(init_state['model'])
+        if init_state.get('optimizer') is not None:
+            optimizer.load_state_dict(init_state['optimizer'])
+            for group in optimizer.param_groups:
+                group.update(lr=learning_rate, betas=(momentum, 0.999))
+
+    early_stopping = EarlyStopping(patience, min_delta)
+    best_metrics = {}
+
+    # 가장 최근 checkpoint에서 재시작
+    checkpointer, start_epoch, start_step, epoch_rng = None, 0, 0, None
+    if checkpoint_dir:
+        from tdbcheckpoint import TDBCheckpointer
+        checkpointer = TDBCheckpointer(checkpoint_dir, checkpoint_keep)
+        latest = checkpointer.load_latest()
+        if latest is not None:
+            state, start_epoch, start_step = latest
+            model.load_state_dict(state['model'])
+            optimizer.load_state_dict(state['optimizer'])
+            early_stopping.load_state_dict(state['early_stopping'])
+            best_metrics = state['best_metrics']
+            epoch_rng = state['rng']
+            if state['epoch_done']:
+                start_epoch, start_step, epoch_rng = start_epoch + 1, 0, None
+
+    def save_checkpoint(epoch, step, epoch_done):
+        if not main:
+            return
+        checkpointer.save({'model': model.state_dict(), 'optimizer': optimizer.state_dict(),
+                           'early_stopping': early_stopping.state_dict(), 'best_metrics': best_metrics,
+                           'rng': epoch_rng, 'epoch_done': epoch_done}, epoch, step)
+
+    # 학습 중 진행 상황을 로그로 내보내 TDBJobLogFollower가 바로 볼 수 있게 한다.
+    progress = None
+    if progress_steps > 0 or progress_seconds > 0:
+        from tdbprogress import TDBProgress
+        progress = TDBProgress(progress_steps, progress_seconds, rank)
+
+    # step마다 데이터 읽기, forward/backward, optimizer 시간을 측정
+    from tdbtrace import TDBProfilerWindow, TDBTracer
+    tracer = TDBTracer(labels={'rank': rank}, trace=bool(trace_dir))
+    if profile_steps > 0 and not trace_dir:
+        # trace_dir 없이 기록하면 profile이 작업 디렉터리에 남으므로 기록하지 않는다.
+        print("profile_steps is {} but trace_dir is empty; not profiling.".format(profile_steps))
+        profile_steps = 0
+    profiler = TDBProfilerWindow(profile_start_step, profile_steps,
+                                 os.path.join(trace_dir, 'profile-rank{}.json'.format(rank)))
+
+    # 훈련
+    started = time.time()
+    epochs_run = start_epoch
+    for epoch in range(start_epoch, epochs):
+        if early_stopping.stopped:  # 조기 종료 후 저장된 checkpoint에서 재시작한 경우
+            break
+        # 재시작 시 같은 순서로 batch를 만들 수 있도록 에폭 시작 시점의 난수 상태를 기록
+        if epoch_rng is None:
+            epoch_rng = {'torch': torch.get_rng_state(), 'python': random.getstate()}
+        else:
+            torch.set_rng_state(epoch_rng['torch'])
+            random.setstate(epoch_rng['python'])
+        if train_sampler is not None:
+            train_sampler.set_epoch(epoch)
+        batches = table_batches() if datasource else train_loader
+        steps, start_step = start_step, 0
+        train_loss, train_count = 0.0, 0
+        epoch_started = time.time()
+        model.train()
+        # datasource chunk는 rank마다 batch 수가 다를 수 있으므로 DDP join으로 맞춘다.
+        uneven = train_model.join() if distributed and datasource else contextlib.nullcontext()
+        with uneven:
+            data_started = time.perf_counter()
+            for inputs, labels in itertools.islice(batches, steps, None):
+                compute_started = time.perf_counter()
+                tracer.record('train.data', compute_started - data_started, data_started)
+                profiler.step()
+                optimizer.zero_grad()
+                outputs = train_model(inputs)
+                loss = criterion(outputs, labels)
+                loss.backward()
+                optimizer_started = time.perf_counter()
+                tracer.record('train.compute', optimizer_started - compute_started, compute_started)
+                optimizer.step()
+                tracer.record('train.optimizer', time.perf_counter() - optimizer_started, optimizer_started)
+                batch_loss = loss.item()
+                train_loss += batch_loss * len(inputs)
+                train_count += len(inputs)
+                steps += 1
+                if progress:
+                    progress.step(epoch, steps, batch_loss, len(inputs))
+                if checkpointer and checkpoint_steps > 0 and steps % checkpoint_steps == 0:
+                    with tracer.span('train.checkpoint'):
+                        save_checkpoint(epoch, steps, False)
+                data_started = time.perf_counter()
+
+        # 에폭마다 평가. datasource는 별도 평가 데이터가 없으므로 훈련 loss를 사용한다.
+        if datasource:
+            if distributed:
+                # 모든 rank가 같은 loss로 조기 종료를 판단하도록 합산
+                totals = torch.tensor([train_loss, train_count], dtype=torch.float64)
+                dist.all_reduce(totals)
+                train_loss, train_count = totals.tolist()
+            eval_metrics = {'loss': train_loss / max(train_count, 1)}
+        else:
+            with tracer.span('train.eval'):
+                eval_metrics = evaluate(model, test_loader, criterion)
+        if main:
+            print("epoch {}: {}".format(epoch, eval_metrics))
+            if progress:
+                progress.epoch(epoch, eval_metrics, time.time() - epoch_started)
+        stop = early_stopping.step(epoch, eval_metrics['loss'], model)
+        if early_stopping.best_epoch == epoch:
+            best_metrics = eval_metrics
+        epoch_rng, epochs_run = None, epoch + 1
+        if checkpointer:
+            save_checkpoint(epoch, steps, True)
+        if stop:
+            if main:
+                print("Early stopping at epoch {} (best epoch {}).".format(epoch, early_stopping.best_epoch))
+            break
+    if checkpointer:
+        checkpointer.close()
+    profiler.close()
+
+    # 가장 좋은 에폭의 모델 저장
+    if early_stopping.best_state is not None:
+        model.load_state_dict(early_stopping.best_state)
+    if main:
+        torch.save(model.state_dict(), model_path)
+        if optimizer_path:
+            torch.save(optimizer.state_dict(), optimizer_path)
+        # 끝난 실행의 checkpoint가 남아 있으면 같은 경로의 다음 실행이 훈련 없이 끝난다.
+        if checkpointer:
+            checkpointer.clear()
+
+    metrics = {'best_epoch': early_stopping.best_epoch, 'epochs_run': epochs_run,
+               'train_seconds': time.time() - started}
+    metrics.update({('train_' if datasource else 'test_') + k: v for k, v in best_metrics.items()})
+    # 시간이 어디에 쓰였는지 (train.data -> data_seconds 등)
+    metrics.update({name.split('.', 1)[1] + '_seconds': seconds for name, seconds in tracer.totals('train.').items()})
+    if trace_dir:
+        tracer.write_trace(os.path.join(trace_dir, 'trace-rank{}.json'.format(rank)))
+        tracer.write_prometheus(os.path.join(trace_dir, 'metrics-rank{}.prom'.format(rank)))
+    return metrics
@@ -0,0 +1,282 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import contextlib
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import zlib
+
+import numpy as np
+import torch
+
+LOG = logging.getLogger(__name__)
+
+OBJECTS_DIR = 'objects'
+MODELS_DIR = 'models'
+LATEST_FILE = 'LATEST'
+# commit()은 공유, gc()는 배타적으로 잡는 파일 lock
+LOCK_FILE = '.lock'
+MANIFEST_SUFFIX = '.json'
+COMPRESSED_SUFFIX = '.z'
+VERSION_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]*$')
+# 압축해서 이만큼 이상 줄어드는 tensor만 압축 (나머지는 mmap 할 수 있도록 그대로 저장)
+DEFAULT_MIN_COMPRESSION_SAVINGS = 0.2
+COMPRESSION_LEVEL = 6
+
+# numpy에 없는 dtype은 같은 크기의 정수형으로 저장
+_VIEW_DTYPES = {torch.bfloat16: torch.int16}
+
+
+def dtype_name(dtype):
+    return str(dtype).replace('torch.', '')
+
+
+def tensor_bytes(tensor):
+    """Return the dtype name, shape and raw bytes of a tensor"""
+    tensor = tensor.detach().to('cpu').contiguous()
+    name = dtype_name(tensor.dtype)
+    if tensor.dtype in _VIEW_DTYPES:
+        tensor = tensor.view(_VIEW_DTYPES[tensor.dtype])
+    return name, list(tensor.shape), tensor.numpy().tobytes()
+
+
+def from_array(array, name):
+    """Return a tensor sharing the memory of a numpy array, viewed as dtype name"""
+    tensor = torch.from_numpy(array)
+    dtype = getattr(torch, name)
+    return tensor.view(dtype) if dtype in _VIEW_DTYPES else tensor
+
+
+def write_atomic(path, data):
+    tmp = '{}.tmp{}'.format(path, os.getpid())
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class TDBArtifactStore():
+    """A content-addressed store of model versions on the PVC
+
+    Every tensor of a state_dict is stored once under the sha256 of its
+    bytes in objects/, so the weights a retrain left unchanged are shared
+    by all versions instead of written again. A version is a manifest
+    models/<name>/<version>.json mapping each state_dict key to the dtype,
+    shape and digest of its tensor, and models/<name>/LATEST names the
+    newest one.
+
+    A tensor is compressed only when that saves at least
+    min_compression_savings of its size; float weights rarely do, so they
+    stay raw and load() maps them into memory: the returned tensors share
+    the page cache of the files (copy-on-write), nothing is read until
+    used and no extra memory is held per process. load_into() puts them
+    into a model without copying.
+
+    commit() and gc() may run in different processes on the same PVC: a
+    file lock keeps gc() from removing the tensors of a version whose
+    manifest is not written yet.
+    """
+
+    def __init__(self, root, compress=True, min_compression_savings=DEFAULT_MIN_COMPRESSION_SAVINGS):
+        self.root = root
+        self.compress = compress
+        self.min_savings = min_compression_savings
+        os.makedirs(os.path.join(root, OBJECTS_DIR), exist_ok=True)
+        os.makedirs(os.path.join(root, MODELS_DIR), exist_ok=True)
+
+    def commit(self, name, state_dict, version=None, metadata=None):
+        """Store a state_dict as a new version of the model name and make it the latest
+
+        :param name: the model name, e.g. 'cnn-mnist'
+        :param state_dict: a dict of tensors
+        :param version: the version (a timestamp if None)
+        :param metadata: a JSON-serializable dict kept in the manifest
+        :return: the manifest, with the bytes written and the tensors deduplicated under 'stats'
+
+        """
+        version = version or time.strftime('%Y%m%d-%H%M%S')
+        if not VERSION_PATTERN.match(version):
+            raise ValueError("Invalid version: {}".format(version))
+        tensors = collections.OrderedDict()
+        stats = {'tensors': 0, 'deduplicated': 0, 'written_bytes': 0, 'logical_bytes': 0}
+        directory = self._model_dir(name)
+        # tensor를 쓰고 manifest를 기록할 때까지 gc()가 끼어들지 않도록
+        with self._lock(fcntl.LOCK_SH):
+            for key, tensor in state_dict.items():
+                dtype, shape, data = tensor_bytes(tensor)
+                digest = hashlib.sha256(data).hexdigest()
+                compressed, written = self._put(digest, data)
+                tensors[key] = {'dtype': dtype, 'shape': shape, 'digest': digest, 'size': len(data),
+                                'compressed': compressed}
+                stats['tensors'] += 1
+                stats['logical_bytes'] += len(data)
+                stats['written_bytes'] += written
+                stats['deduplicated'] += 0 if written else 1
+            manifest = {'name': name, 'version': version, 'created_at': time.time(), 'metadata': metadata or {},
+                        'tensors': tensors}
+            os.makedirs(directory, exist_ok=True)
+            write_atomic(os.path.join(directory, version + MANIFEST_SUFFIX), json.dumps(manifest).encode('utf-8'))
+            write_atomic(os.path.join(directory, LATEST_FILE), version.encode('utf-8'))
+        LOG.info("Committed %s version %s: %d tensors, %d deduplicated, %d bytes written",
+                 name, version, stats['tensors'], stats['deduplicated'], stats['written_bytes'])
+        return dict(manifest, stats=stats)
+
+    def versions(self, name):
+        """Return the versions of the model name, oldest first"""
+        directory = self._model_dir(name)
+        if not os.path.isdir(directory):
+            return []
+        manifests = [self._read_manifest(name, n[:-len(MANIFEST_SUFFIX)]) for n in os.listdir(directory)
+                     if n.endswith(MANIFEST_SUFFIX)]
+        return [m['version'] for m in sorted(manifests, key=lambda m: m['created_at'])]
+
+    def latest(self, name):
+        """Return the latest version of the model name, or None"""
+        try:
+            with open(os.path.join(self._model_dir(name), LATEST_FILE)) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def manifest(self, name, version=None):
+        """Return the manifest of a version (the latest if None)"""
+        version = version or self.latest(name)
+        if version is None:
+            raise KeyError("No versions of {}".format(name))
+        return self._read_manifest(name, version)
+
+    def load(self, name, version=None, mmap=True):
+        """Return the state_dict of a version (the latest if None)
+
+        With mmap, uncompressed tensors are memory-mapped copy-on-write
+        instead of read: they share the page cache across processes and
+        writing to one never changes the store.
+        """
+        manifest = self.manifest(name, version)
+        state = collections.OrderedDict()
+        for key, entry in manifest['tensors'].items():
+            state[key] = self._tensor(entry, mmap)
+        return state
+
+    def load_into(self, model, name, version=None, mmap=True):
+        """Load a version into model without copying its tensors, and return the model
+
+        The parameters and buffers of model are replaced by the loaded
+        tensors (memory-mapped with mmap); their keys and shapes must match.
+        """
+        state = self.load(name, version, mmap)
+        current = model.state_dict(keep_vars=True)
+        missing = sorted(set(current) - set(state))
+        unexpected = sorted(set(state) - set(current))
+        if missing or unexpected:
+            raise KeyError("State dict mismatch: missing {}, unexpected {}".format(missing, unexpected))
+        with torch.no_grad():
+            for key, tensor in state.items():
+                target = current[key]
+                if target.shape != tensor.shape:
+                    raise ValueError("Shape mismatch for {}: {} != {}".format(key, tuple(target.shape),
+                                                                            tuple(tensor.shape)))
+                target.data = tensor
+        return model
+
+    def delete(self, name, version):
+        """Remove a version's manifest; its tensors are removed by gc() when no version uses them"""
+        os.remove(os.path.join(self._model_dir(name), version + MANIFEST_SUFFIX))
+        if self.latest(name) == version:
+            remaining = self.versions(name)
+            latest_path = os.path.join(self._model_dir(name), LATEST_FILE)
+            if remaining:
+                write_atomic(latest_path, remaining[-1].encode('utf-8'))
+            else:
+                os.remove(latest_path)
+
+    def gc(self):
+        """Remove the stored tensors no version refers to and return the bytes freed
+
+        Waits for running commits and blocks new ones until it is done.
+        """
+        with self._lock(fcntl.LOCK_EX):
+            used = set()
+            models = os.path.join(self.root, MODELS_DIR)
+            for name in os.listdir(models):
+                for version in self.versions(name):
+                    used.update(e['digest'] for e in self._read_manifest(name, version)['tensors'].values())
+            freed = 0
+            objects = os.path.join(self.root, OBJECTS_DIR)
+            for prefix in os.listdir(objects):
+                for filename in os.listdir(os.path.join(objects, prefix)):
+                    if filename.split('.')[0] not in used:
+                        path = os.path.join(objects, prefix, filename)
+                        freed += os.path.getsize(path)
+                        os.remove(path)
+            return freed
+
+    @contextlib.contextmanager
+    def _lock(self, operation):
+        with open(os.path.join(self.root, LOCK_FILE), 'a') as f:
+            fcntl.flock(f.fileno(), operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _model_dir(self, name):
+        if not VERSION_PATTERN.match(name):
+            raise ValueError("Invalid model name: {}".format(name))
+        return os.path.join(self.root, MODELS_DIR, name)
+
+    def _read_manifest(self, name, version):
+        with open(os.path.join(self._model_dir(name), version + MANIFEST_SUFFIX)) as f:
+            return json.load(f)
+
+    def _object_path(self, digest, compressed):
+        path = os.path.join(self.root, OBJECTS_DIR, digest[:2], digest)
+        return path + COMPRESSED_SUFFIX if compressed else path
+
+    def _put(self, digest, data):
+        # 같은 내용이 이미 있으면 쓰지 않는다: (압축 여부, 쓴 바이트 수)
+        for compressed in (False, True):
+            if os.path.exists(self._object_path(digest, compressed)):
+                return compressed, 0
+        compressed = False
+        if self.compress and data:
+            packed = zlib.compress(data, COMPRESSION_LEVEL)
+            if len(packed) <= len(data) * (1 - self.min_savings):
+                data, compressed = packed, True
+        path = self._object_path(digest, compressed)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_atomic(path, data)
+        return compressed, len(data)
+
+    def _tensor(self, entry, mmap):
+        name, shape = entry['dtype'], tuple(entry['shape'])
+        dtype = getattr(torch, name)
+        storage_dtype = torch.empty(0, dtype=_VIEW_DTYPES.get(dtype, dtype)).numpy().dtype
+        path = self._object_path(entry['digest'], entry['compressed'])
+        if entry['compressed']:
+            with open(path, 'rb') as f:
+                array = np.frombuffer(bytearray(zlib.decompress(f.read())), dtype=storage_dtype)
+        elif mmap and entry['size'] > 0:
+            array = np.memmap(path, dtype=storage_dtype, mode='c')
+        else:
+            with open(path, 'rb') as f:
+                array = np.frombuffer(bytearray(f.read()), dtype=storage_dtype)
+        return from_array(array.reshape(shape), name)
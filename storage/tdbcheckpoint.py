@@ -0,0 +1,150 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import os
+import queue
+import re
+import threading
+
+import torch
+
+LOG = logging.getLogger(__name__)
+
+CHECKPOINT_FORMAT = 'ckpt-{:05d}-{:08d}.pt'
+CHECKPOINT_PATTERN = re.compile(r'^ckpt-(\d{5})-(\d{8})\.pt$')
+DEFAULT_KEEP = 3
+
+
+def _to_cpu(obj):
+    # 백그라운드에서 저장하는 동안 훈련이 값을 바꾸지 않도록 tensor를 복사
+    if torch.is_tensor(obj):
+        return obj.detach().to('cpu', copy=True)
+    if isinstance(obj, dict):
+        return {k: _to_cpu(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_to_cpu(v) for v in obj)
+    return obj
+
+
+class TDBCheckpointer():
+    """Periodic training checkpoints on the PVC, written by a background thread
+
+    save() copies the state to CPU memory and returns; the file is written to
+    a temporary name and renamed into place, so a pod killed mid-write never
+    leaves a truncated checkpoint. Only the newest keep checkpoints are kept.
+    """
+
+    def __init__(self, directory, keep=DEFAULT_KEEP):
+        """Create the checkpointer
+
+        :param directory: the checkpoint directory
+        :param keep: the number of checkpoints to keep (0 keeps all)
+
+        """
+        self.directory = directory
+        self.keep = keep
+        self.error = None
+        os.makedirs(directory, exist_ok=True)
+        # 쓰기 대기 중인 checkpoint는 하나로 제한해 메모리 사용을 묶어 둔다.
+        self._pending = queue.Queue(maxsize=1)
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def checkpoints(self):
+        """Return the checkpoint file names, oldest first"""
+        names = [n for n in os.listdir(self.directory) if CHECKPOINT_PATTERN.match(n)]
+        return sorted(names)
+
+    def save(self, state, epoch, step):
+        """Queue a checkpoint of state for writing
+
+        Blocks only while the previous checkpoint is still being written.
+
+        :param state: a dict of state_dicts and other picklable training state
+        :param epoch: the epoch the state belongs to
+        :param step: the number of batches finished in the epoch
+
+        """
+        if self.error is not None:
+            raise self.error
+        self._pending.put((_to_cpu(state), epoch, step))
+
+    def load_latest(self):
+        """Return the newest checkpoint that can be read, or None
+
+        :return: a (state, epoch, step) tuple
+
+        """
+        for name in reversed(self.checkpoints()):
+            try:
+                state = torch.load(os.path.join(self.directory, name), map_location='cpu')
+            except Exception as e:
+                LOG.warning("Skipping unreadable checkpoint %s: %s", name, e)
+                continue
+            epoch, step = (int(v) for v in CHECKPOINT_PATTERN.match(name).groups())
+            LOG.info("Resuming from checkpoint %s", name)
+            return state, epoch, step
+        return None
+
+    def wait(self):
+        """Block until every queued checkpoint is written"""
+        self._pending.join()
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        """Write the queued checkpoints and stop the writer thread"""
+        self._pending.put(None)
+        self._writer.join()
+        if self.error is not None:
+            raise self.error
+
+    def clear(self):
+        """Remove every checkpoint, and the directory when nothing else is left in it
+
+        Called once the trained model is saved, so that a later run using
+        the same directory starts over instead of resuming a finished run.
+        """
+        self.wait()
+        for name in os.listdir(self.directory):
+            if CHECKPOINT_PATTERN.match(name) or name.endswith('.pt.tmp'):
+                os.remove(os.path.join(self.directory, name))
+        if not os.listdir(self.directory):
+            os.rmdir(self.directory)
+
+    def _write_loop(self):
+        while True:
+            item = self._pending.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            except Exception as e:
+                LOG.error("Failed to write checkpoint: %s", e)
+                self.error = e
+            finally:
+                self._pending.task_done()
+
+    def _write(self, state, epoch, step):
+        name = CHECKPOINT_FORMAT.format(epoch, step)
+        tmp = os.path.join(self.directory, '.' + name + '.tmp')
+        with open(tmp, 'wb') as f:
+            torch.save(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.directory, name))
+        if self.keep > 0:
+            for old in self.checkpoints()[:-self.keep]:
+                os.remove(os.path.join(self.directory, old))
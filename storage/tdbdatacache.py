@@ -0,0 +1,223 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../common/'))
+
+import fcntl
+import hashlib
+import json
+import logging
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+
+import tdbconstants
+
+LOG = logging.getLogger(__name__)
+
+META_FILE = 'meta.json'
+LOCK_FILE = '.lock'
+DEFAULT_SHARD_ROWS = 1 << 20
+
+
+class TDBCachedDataset():
+    """A cached datasource query result opened as memory-mapped column shards"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        self.columns = self.meta['columns']
+        self.num_rows = self.meta['rows']
+
+    def __len__(self):
+        return self.num_rows
+
+    def shard(self, index, columns=None):
+        """Return a dict of column name to read-only memory-mapped array
+
+        :param index: the shard index
+        :param columns: the column names to open (defaults to all columns)
+
+        """
+        return {c: np.load(self._column_file(index, c), mmap_mode='r')
+                for c in (columns or self.columns)}
+
+    def chunks(self, columns=None, rows=None):
+        """Yield each shard as (rows, len(columns)) float arrays
+
+        :param columns: the column names to read (defaults to all columns)
+        :param rows: the maximum number of rows of each array (defaults to a whole shard)
+
+        """
+        columns = columns or self.columns
+        for index in range(len(self.meta['shards'])):
+            arrays = self.shard(index, columns)
+            shard_rows = len(arrays[columns[0]])
+            step = rows or shard_rows or 1
+            for start in range(0, shard_rows, step):
+                yield np.stack([arrays[c][start:start + step] for c in columns], axis=1)
+
+    def _column_file(self, index, column):
+        return os.path.join(self.path, '{:05d}-{}.npy'.format(index, self.columns.index(column)))
+
+
+class TDBDatasetCache():
+    """A size-bounded LRU cache of datasource query results on the TrainDB PVC
+
+    Each entry is a directory named by the hash of the query and the table
+    version, holding one .npy file per column and shard. Entries are written
+    to a temporary directory and renamed into place, so sibling pipeline steps
+    never see a partial entry.
+    """
+
+    def __init__(self, root=tdbconstants.DATASET_CACHE_PATH, max_bytes=tdbconstants.DATASET_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def key(query, version):
+        """Return the cache key of a query result
+
+        :param query: the SELECT statement of the datasource
+        :param version: the table version (see tdbdatasource.table_version)
+
+        """
+        return hashlib.sha256('{}\n{}'.format(query, version).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return the cached dataset for key, or None on a miss
+
+        :param key: the cache key
+
+        """
+        path = os.path.join(self.root, key)
+        if not os.path.exists(os.path.join(path, META_FILE)):
+            return None
+        # LRU 순서는 meta.json의 mtime으로 기록한다.
+        try:
+            os.utime(os.path.join(path, META_FILE))
+        except FileNotFoundError:  # 다른 프로세스가 방금 evict 한 경우
+            return None
+        return TDBCachedDataset(path)
+
+    def put(self, key, columns, chunks, shard_rows=DEFAULT_SHARD_ROWS):
+        """Write a query result to the cache and return it as a cached dataset
+
+        :param key: the cache key
+        :param columns: the column names of the query result
+        :param chunks: an iterable of (rows, len(columns)) arrays or row lists
+        :param shard_rows: the number of rows per shard
+
+        """
+        tmp = os.path.join(self.root, '.tmp-{}-{}'.format(key, uuid.uuid4().hex))
+        os.makedirs(tmp)
+        try:
+            shards, pending, pending_rows = [], [], 0
+            for chunk in chunks:
+                chunk = np.asarray(chunk, dtype=np.float32).reshape(-1, len(columns))
+                pending.append(chunk)
+                pending_rows += len(chunk)
+                if pending_rows >= shard_rows:
+                    shards.append(self._write_shard(tmp, len(shards), np.concatenate(pending)))
+                    pending, pending_rows = [], 0
+            if pending:
+                shards.append(self._write_shard(tmp, len(shards), np.concatenate(pending)))
+            meta = {'columns': list(columns), 'rows': sum(shards), 'shards': shards, 'created': time.time()}
+            with open(os.path.join(tmp, META_FILE), 'w') as f:
+                json.dump(meta, f)
+
+            path = os.path.join(self.root, key)
+            with self._lock():
+                if os.path.exists(path):
+                    # 다른 step이 같은 결과를 먼저 기록했다.
+                    shutil.rmtree(tmp)
+                else:
+                    os.rename(tmp, path)
+                self._evict(keep=key)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        return self.get(key)
+
+    def get_or_put(self, key, columns, chunks_fn, shard_rows=DEFAULT_SHARD_ROWS):
+        """Return the cached dataset for key, reading it with chunks_fn on a miss
+
+        :param key: the cache key
+        :param columns: the column names of the query result
+        :param chunks_fn: a callable returning the chunks of the query result
+        :param shard_rows: the number of rows per shard
+
+        """
+        cached = self.get(key)
+        if cached is not None:
+            LOG.info("Dataset cache hit: %s", key)
+            return cached
+        LOG.info("Dataset cache miss: %s", key)
+        return self.put(key, columns, chunks_fn(), shard_rows)
+
+    def size(self):
+        """Return the total size of the cache entries in bytes"""
+        return sum(size for _, _, size in self._entries())
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        with self._lock():
+            self._evict()
+
+    def _evict(self, keep=None):
+        entries = sorted(self._entries(), key=lambda e: e[1])
+        total = sum(size for _, _, size in entries)
+        for key, _, size in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            # 이미 mmap으로 열린 파일은 삭제 후에도 유효하다.
+            shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+            total -= size
+            LOG.info("Dataset cache evicted: %s (%d bytes)", key, size)
+
+    def _entries(self):
+        for key in os.listdir(self.root):
+            meta = os.path.join(self.root, key, META_FILE)
+            if key.startswith('.') or not os.path.exists(meta):
+                continue
+            path = os.path.join(self.root, key)
+            try:
+                size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+                yield key, os.path.getmtime(meta), size
+            except FileNotFoundError:  # 다른 프로세스가 evict 하는 중
+                continue
+
+    @contextmanager
+    def _lock(self):
+        with open(os.path.join(self.root, LOCK_FILE), 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _write_shard(path, index, data):
+        for i in range(data.shape[1]):
+            np.save(os.path.join(path, '{:05d}-{}.npy'.format(index, i)), np.ascontiguousarray(data[:, i]))
+        return len(data)
@@ -0,0 +1,49 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# 클러스터 없이 실행하는 TrainDB-ML 단위 테스트
+#
+#   python -m pytest -q tests
+#
+# 모듈들은 패키지가 아니라 디렉터리별 스크립트이므로 benchmark/tdbbench.py처럼 sys.path에 추가한다.
+
+import os
+import sqlite3
+import sys
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+for directory in ('../pipeline', '../inference', '../common', '../metadata', '../storage', '../training',
+                  '../daemon', '../benchmark'):
+    sys.path.append(os.path.join(BASE_DIR, directory))
+
+
+@pytest.fixture
+def sqlite_datasource(tmp_path):
+    """Return a factory of sqlite datasource blocks over a table of rows (id, x1, x2, label)"""
+
+    def make(rows=100, **parameters):
+        database = str(tmp_path / 'traindb.db')
+        conn = sqlite3.connect(database)
+        conn.execute('CREATE TABLE IF NOT EXISTS samples (id INTEGER, x1 REAL, x2 REAL, label REAL)')
+        conn.executemany('INSERT INTO samples VALUES (?, ?, ?, ?)',
+                         [(i, i * 0.01, -i * 0.01, float(i % 2)) for i in range(1, rows + 1)])
+        conn.commit()
+        conn.close()
+        return {'engine': 'sqlite',
+                'parameters': dict({'database': database, 'table': 'samples', 'columnlist': ['x1', 'x2'],
+                                    'labelcolumn': 'label', 'watermarkcolumn': 'id'}, **parameters)}
+
+    return make
@@ -0,0 +1,85 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from tdbbatcher import TDBMicroBatcher
+from tdbbench import StubPredictor
+
+
+def test_concurrent_requests_are_batched_and_sliced_back():
+    batcher = TDBMicroBatcher(StubPredictor(0).predict, max_batch_size=8, max_wait_ms=50)
+    try:
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(lambda i: batcher.predict([[i, 1.0], [i, 2.0]]), range(16)))
+        assert results == [[i + 1.0, i + 2.0] for i in range(16)]
+        stats = batcher.stats()
+        assert stats['requests'] == 16 and stats['instances'] == 32
+        assert stats['batches'] < 16 and stats['max_batch_size'] <= 8
+    finally:
+        batcher.close()
+
+
+def test_a_request_larger_than_the_batch_is_served_alone():
+    batcher = TDBMicroBatcher(StubPredictor(0).predict, max_batch_size=2, max_wait_ms=1)
+    try:
+        assert batcher.predict([[1.0]] * 5) == [1.0] * 5
+    finally:
+        batcher.close()
+
+
+def test_predictor_errors_reach_every_caller_of_the_batch():
+    batcher = TDBMicroBatcher(lambda inputs: inputs[:1], max_batch_size=4, max_wait_ms=50)
+    try:
+        futures = [batcher.submit([[1.0]]), batcher.submit([[2.0]])]
+        for future in futures:
+            with pytest.raises(ValueError, match='predictions'):
+                future.result(timeout=5)
+    finally:
+        batcher.close()
+
+
+def test_cancelled_requests_are_skipped_and_the_worker_keeps_serving():
+    release = threading.Event()
+    calls = []
+
+    def predict(inputs):
+        calls.append(list(inputs))
+        release.wait(5)
+        return inputs
+
+    batcher = TDBMicroBatcher(predict, max_batch_size=1, max_wait_ms=0)
+    try:
+        first = batcher.submit([1])  # worker가 이 요청에서 멈춰 있는 동안 다음 요청을 취소한다.
+        cancelled = batcher.submit([2])
+        assert cancelled.cancel()
+        release.set()
+        assert first.result(timeout=5) == [1]
+        assert batcher.predict([3]) == [3]
+        assert [2] not in calls
+    finally:
+        batcher.close()
+
+
+def test_close_serves_the_queued_requests_and_rejects_new_ones():
+    batcher = TDBMicroBatcher(StubPredictor(0).predict, max_batch_size=4, max_wait_ms=100)
+    futures = [batcher.submit([[float(i)]]) for i in range(10)]
+    batcher.close()
+    assert [future.result(timeout=0) for future in futures] == [[float(i)] for i in range(10)]
+    with pytest.raises(RuntimeError):
+        batcher.submit([[1.0]])
+    batcher.close()
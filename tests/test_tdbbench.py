@@ -0,0 +1,59 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+import pytest
+
+from tdbbench import compare, latency_metrics, main, percentile, run
+
+
+def test_percentile():
+    assert percentile([], 50) == 0.0
+    assert percentile([3.0, 1.0, 2.0], 50) == 2.0
+    assert percentile([0.0, 10.0], 99) == pytest.approx(9.9)
+
+
+def test_latency_metrics():
+    metrics = latency_metrics('predict', [0.001, 0.002, 0.003], 0.5)
+    assert metrics['predict_p50_ms'] == pytest.approx(2.0)
+    assert metrics['predict_requests_per_sec'] == pytest.approx(6.0)
+
+
+def test_compare_flags_only_regressions_beyond_the_tolerance():
+    baseline = {'predict_p50_ms': 10.0, 'predict_requests_per_sec': 100.0, 'train_samples_per_sec': 50.0,
+                'missing_ms': 1.0}
+    metrics = {'predict_p50_ms': 12.0, 'predict_requests_per_sec': 95.0, 'train_samples_per_sec': 60.0}
+    regressions = compare(metrics, baseline, tolerance=0.10)
+    assert [r['metric'] for r in regressions] == ['predict_p50_ms']
+    assert regressions[0]['change'] == pytest.approx(0.2)
+    assert compare({'predict_requests_per_sec': 80.0}, baseline)[0]['change'] == pytest.approx(-0.2)
+
+
+def test_run_rejects_unknown_suites():
+    with pytest.raises(ValueError):
+        run(['nope'])
+
+
+def test_main_writes_the_results_and_fails_on_regressions(tmp_path, capsys):
+    output, baseline = tmp_path / 'results.json', tmp_path / 'baseline.json'
+    assert main(['--suite', 'predict', '--quick', '--output', str(output)]) == 0
+    results = json.loads(output.read_text())
+    assert results['metrics']['predict_requests_per_sec'] > 0
+    assert set(results['suite_seconds']) == {'predict'}
+
+    # 불가능하게 빠른 baseline과 비교하면 regression으로 실패한다.
+    baseline.write_text(json.dumps({'metrics': {'predict_p50_ms': 1e-6}}))
+    assert main(['--suite', 'predict', '--quick', '--baseline', str(baseline)]) == 1
+    assert 'REGRESSION predict_p50_ms' in capsys.readouterr().out
@@ -0,0 +1,89 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sqlite3
+
+import pytest
+
+from tdbcatalog import TDBModelCatalog
+from traindbmodelinfo import TDBModelInfo
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = TDBModelCatalog(str(tmp_path / 'catalog' / 'models.db'), batch_size=2)
+    yield catalog
+    catalog.close()
+
+
+def test_find_and_best_by_metric(catalog):
+    for tag, accuracy in (('a', 0.90), ('b', 0.97), ('c', 0.95)):
+        catalog.add('cnn', 'mnist', tag, model_path='/mnt/model/' + tag, metrics={'test_accuracy': accuracy})
+    assert catalog.best('cnn', 'test_accuracy')['tag'] == 'b'
+    assert catalog.best('cnn', 'test_accuracy', higher_is_better=False)['tag'] == 'a'
+    found = catalog.find(modeltype='cnn', metrics={'test_accuracy': (0.92, None)}, order_by='test_accuracy')
+    assert [record['tag'] for record in found] == ['b', 'c']
+
+
+def test_reregistering_replaces_the_metric_set(catalog):
+    catalog.register('cnn', 'mnist', 'v1', model_path='/mnt/model/model.pt',
+                     metrics={'val_loss': 0.3, 'test_accuracy': 0.9})
+    catalog.register('cnn', 'mnist', 'v1', metrics={'test_accuracy': 0.95, 'test_loss': 0.1})
+    record = catalog.get('cnn', 'mnist', 'v1')
+    assert record['metrics'] == {'test_accuracy': 0.95, 'test_loss': 0.1}
+    # 이전 실행의 val_loss는 범위 검색에 더 이상 걸리지 않는다.
+    assert catalog.find(metrics={'val_loss': (None, 1.0)}) == []
+    # 지정하지 않은 필드와 metric은 그대로 둔다.
+    catalog.register('cnn', 'mnist', 'v1', hyperparams={'epochs': 3})
+    record = catalog.get('cnn', 'mnist', 'v1')
+    assert record['model_path'] == '/mnt/model/model.pt' and record['metrics'] == {'test_accuracy': 0.95,
+                                                                                   'test_loss': 0.1}
+    catalog.register('cnn', 'mnist', 'v1', metrics={})
+    assert catalog.get('cnn', 'mnist', 'v1')['metrics'] == {}
+
+
+def test_delete(catalog):
+    catalog.register('cnn', 'mnist', metrics={'test_accuracy': 0.9})
+    assert catalog.delete('cnn', 'mnist') and catalog.get('cnn', 'mnist') is None
+    assert not catalog.delete('cnn', 'mnist')
+
+
+def test_each_version_is_its_own_entry(catalog):
+    info = TDBModelInfo('traindb', 'traindb-ml-', 'latest', 'cnn')
+    for version, accuracy in (('0123456789abcdef', 0.9), ('fedcba9876543210', 0.95)):
+        catalog.register(**info.catalog_record('mnist', model_path='/mnt/runs/{}/model.pt'.format(version),
+                                               metrics={'test_accuracy': accuracy}, version=version))
+    best = catalog.best('cnn', 'test_accuracy')
+    assert best['tag'] == best['version'] == 'fedcba9876543210'
+    assert best['model_path'] == '/mnt/runs/fedcba9876543210/model.pt' and best['image'].endswith(':latest')
+    assert len(catalog.find(modeltype='cnn')) == 2
+
+
+def test_migrates_a_catalog_without_the_version_column(tmp_path):
+    path = str(tmp_path / 'models.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE models (id INTEGER PRIMARY KEY, modeltype TEXT NOT NULL, modelname TEXT NOT NULL, '
+                 'tag TEXT NOT NULL, image TEXT, pvc_name TEXT, model_path TEXT, hyperparams TEXT, '
+                 'created_at REAL NOT NULL, updated_at REAL NOT NULL, UNIQUE (modeltype, modelname, tag))')
+    conn.execute("INSERT INTO models (modeltype, modelname, tag, created_at, updated_at) "
+                 "VALUES ('cnn', 'mnist', 'latest', 0, 0)")
+    conn.commit()
+    conn.close()
+    catalog = TDBModelCatalog(path)
+    try:
+        assert catalog.get('cnn', 'mnist')['version'] is None
+        catalog.register('cnn', 'mnist', 'v2', version='v2')
+        assert catalog.get('cnn', 'mnist', 'v2')['version'] == 'v2'
+    finally:
+        catalog.close()
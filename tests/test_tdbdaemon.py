@@ -0,0 +1,58 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+import tdbdeploy
+from tdbbench import FakeKServeAPI
+from tdbdaemon import TDBControlPlane
+from tdbdeploy import ACTION_CREATED, ACTION_UPDATED, STATUS_READY, serving_name
+
+
+@pytest.fixture
+def control_plane(monkeypatch):
+    # isvc_spec은 kserve가 필요하다: TDBBulkDeployer와 FakeKServeAPI는 metadata.name만 읽는다.
+    monkeypatch.setattr(tdbdeploy, 'isvc_spec', lambda modeltype, modelname, nspace, uri_storage: SimpleNamespace(
+        metadata=SimpleNamespace(name=serving_name(modeltype, modelname))))
+    executor = ThreadPoolExecutor(max_workers=4)
+    control_plane = TDBControlPlane(executor, batch_wait_ms=5)
+    yield control_plane
+    control_plane.close()
+    executor.shutdown()
+
+
+def serve(control_plane, modelname, namespace='tenant-a'):
+    return control_plane.handle('serve', {'modeltype': 'cnn', 'modelname': modelname, 'namespace': namespace,
+                                          'uri_storage': 'pvc://traindb-ml-pvc/' + modelname})
+
+
+def test_serve_creates_new_and_updates_served_models(control_plane):
+    api = FakeKServeAPI(create_ms=1.0, ready_ms=10.0, existing=[('tenant-a', serving_name('cnn', 'served'))])
+    control_plane._clients['kserve_api'] = api
+    futures = [serve(control_plane, 'served'), serve(control_plane, 'new'), serve(control_plane, 'new', 'tenant-b')]
+    served, new, other = [future.result(timeout=10) for future in futures]
+    assert served['status'] == new['status'] == other['status'] == STATUS_READY
+    assert served['action'] == ACTION_UPDATED and new['action'] == other['action'] == ACTION_CREATED
+
+    # 같은 모델을 다시 serve 하면 409 오류 대신 갱신된다.
+    again = serve(control_plane, 'new').result(timeout=10)
+    assert again['status'] == STATUS_READY and again['action'] == ACTION_UPDATED
+
+
+def test_unknown_ops_fail(control_plane):
+    with pytest.raises(ValueError, match='Unknown op'):
+        control_plane.handle('nope', {}).result(timeout=1)
@@ -0,0 +1,89 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+import torch
+
+from tdbdatasource import (TDBTableDataset, build_query, lag_watermark, max_watermark, quote_identifier,
+                           table_version, watermark_where)
+
+
+def test_stream_reads_every_row_in_chunks(sqlite_datasource):
+    datasource = sqlite_datasource(rows=10)
+    dataset = TDBTableDataset(datasource['engine'], datasource['parameters'], chunk_size=3, prefetch=1)
+    chunks = list(dataset)
+    assert [len(labels) for _, labels in chunks] == [3, 3, 3, 1]
+    features = torch.cat([f for f, _ in chunks])
+    labels = torch.cat([l for _, l in chunks])
+    assert features.shape == (10, 2)
+    assert torch.allclose(features[:, 0], torch.arange(1, 11, dtype=torch.float32) * 0.01)
+    assert labels.tolist() == [float(i % 2) for i in range(1, 11)]
+
+
+def test_stream_without_labelcolumn_yields_tensors(sqlite_datasource):
+    datasource = sqlite_datasource(rows=5, labelcolumn=None)
+    dataset = TDBTableDataset(datasource['engine'], datasource['parameters'], chunk_size=10)
+    chunks = list(dataset)
+    assert len(chunks) == 1 and chunks[0].shape == (5, 2)
+
+
+def test_stream_stops_early_without_reading_the_rest(sqlite_datasource):
+    datasource = sqlite_datasource(rows=1000)
+    dataset = TDBTableDataset(datasource['engine'], datasource['parameters'], chunk_size=10, prefetch=2)
+    for i, _ in enumerate(dataset):
+        if i == 2:
+            break
+    # 중단 뒤에도 같은 dataset을 처음부터 다시 읽을 수 있다.
+    assert sum(len(labels) for _, labels in dataset) == 1000
+
+
+def test_stream_raises_query_errors(sqlite_datasource):
+    datasource = sqlite_datasource(rows=5, table='missing')
+    with pytest.raises(Exception, match='missing'):
+        list(TDBTableDataset(datasource['engine'], datasource['parameters']))
+
+
+def test_watermark_where_reads_the_range(sqlite_datasource):
+    datasource = sqlite_datasource(rows=20)
+    where, args = watermark_where('sqlite', 'id', 5, 12)
+    assert where == '"id" > ? AND "id" <= ?' and args == (5, 12)
+    dataset = TDBTableDataset(datasource['engine'], datasource['parameters'], where=where, args=args)
+    assert sum(len(labels) for _, labels in dataset) == 7
+    assert watermark_where('sqlite', 'id') == (None, ())
+
+
+def test_build_query_quotes_identifiers():
+    assert build_query('mysql', 'orders', ['a', 'b'], 'a > %s') == 'SELECT `a`, `b` FROM `orders` WHERE a > %s'
+    with pytest.raises(ValueError):
+        quote_identifier('sqlite', 'a; DROP TABLE orders')
+    with pytest.raises(ValueError):
+        build_query('sqlite', 'orders', [])
+
+
+def test_table_version_and_max_watermark(sqlite_datasource):
+    datasource = sqlite_datasource(rows=3)
+    version = table_version(datasource['engine'], datasource['parameters'])
+    assert max_watermark(datasource['engine'], datasource['parameters']) == 3
+    datasource = sqlite_datasource(rows=2)  # 같은 테이블에 2행 추가
+    assert table_version(datasource['engine'], datasource['parameters']) != version
+    assert table_version('sqlite', dict(datasource['parameters'], version='v7')) == 'v7'
+
+
+def test_lag_watermark():
+    assert lag_watermark(10, 3) == 7
+    assert lag_watermark(None, 3) is None
+    assert lag_watermark('2023-05-01 00:00:30', 60) == '2023-04-30 23:59:30'
+    assert lag_watermark('2023-05-01T00:00:30', 0) == '2023-05-01T00:00:30'
+    with pytest.raises(ValueError):
+        lag_watermark('abc', 1)
@@ -0,0 +1,56 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import socket
+
+import pytest
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+
+WORLD_SIZE = 2
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def run_rank(rank, port, argv):
+    # PyTorchJob의 Master/Worker pod가 설정하는 환경 변수
+    os.environ.update(MASTER_ADDR='127.0.0.1', MASTER_PORT=str(port), RANK=str(rank),
+                      WORLD_SIZE=str(WORLD_SIZE))
+    from tdbddp import main
+    main(argv)
+
+
+@pytest.mark.skipif(not dist.is_available(), reason='torch.distributed is not available')
+def test_two_ranks_train_on_sqlite(sqlite_datasource, tmp_path):
+    datasource = sqlite_datasource(rows=200)
+    model_path = tmp_path / 'model' / 'model.pt'
+    model_path.parent.mkdir()
+    trace_dir = tmp_path / 'trace'
+    argv = ['--model-path', str(model_path), '--datasource', json.dumps(datasource), '--epochs', '2',
+            '--batch-size', '16', '--test-batch-size', '50', '--progress-steps', '0', '--progress-seconds', '0',
+            '--trace-dir', str(trace_dir)]
+    mp.spawn(run_rank, args=(free_port(), argv), nprocs=WORLD_SIZE, join=True)
+
+    # rank 0만 모델을 저장하고, 모든 rank가 자기 trace를 남긴다.
+    state = torch.load(str(model_path), map_location='cpu')
+    assert state and all(torch.isfinite(v).all() for v in state.values() if v.is_floating_point())
+    assert sorted(os.listdir(str(trace_dir))) == ['metrics-rank0.prom', 'metrics-rank1.prom',
+                                                  'trace-rank0.json', 'trace-rank1.json']
@@ -0,0 +1,117 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from tdbbench import FakeKServeAPI
+from tdbdeploy import (ACTION_CREATED, ACTION_UPDATED, STATUS_ERROR, STATUS_READY, STATUS_TIMEOUT, TDBBulkDeployer,
+                       isvc_ready, isvc_spec, serving_name)
+
+
+def spec(name):
+    # TDBBulkDeployer는 spec에서 metadata.name만 읽는다 (isvc_spec은 kserve가 필요).
+    return SimpleNamespace(metadata=SimpleNamespace(name=name))
+
+
+class CountingKServeAPI(FakeKServeAPI):
+    """A FakeKServeAPI that records the peak number of concurrent creates and fails the names in fail"""
+
+    def __init__(self, fail=(), never_ready=(), **kwargs):
+        super(CountingKServeAPI, self).__init__(**kwargs)
+        self.fail, self.never_ready = set(fail), set(never_ready)
+        self.creating = self.peak = 0
+        self.created = []
+        self._lock = threading.Lock()
+
+    def create(self, isvc, namespace):
+        with self._lock:
+            self.creating += 1
+            self.peak = max(self.peak, self.creating)
+        try:
+            if isvc.metadata.name in self.fail:
+                raise RuntimeError("admission webhook denied {}".format(isvc.metadata.name))
+            if isvc.metadata.name in self.never_ready:
+                return
+            super(CountingKServeAPI, self).create(isvc, namespace)
+            self.created.append(isvc.metadata.name)
+        finally:
+            with self._lock:
+                self.creating -= 1
+
+
+def test_deploys_every_service_within_the_concurrency_limit():
+    api = CountingKServeAPI(create_ms=5.0, ready_ms=20.0)
+    deployer = TDBBulkDeployer(api, max_concurrency=4, timeout_seconds=10, watch_timeout_seconds=1)
+    names = ['svc{}'.format(i) for i in range(20)]
+    results = deployer.deploy([spec(name) for name in names], 'tenant-a')
+    assert sorted(results) == sorted(names)
+    assert all(result['status'] == STATUS_READY for result in results.values())
+    assert results['svc3']['url'] == 'http://svc3.tenant-a'
+    assert api.peak <= 4 and sorted(api.created) == sorted(names)
+
+
+def test_failed_and_timed_out_services_do_not_stop_the_others():
+    api = CountingKServeAPI(fail=['bad'], never_ready=['stuck'], create_ms=1.0, ready_ms=10.0)
+    deployer = TDBBulkDeployer(api, max_concurrency=2, timeout_seconds=0.5, watch_timeout_seconds=1)
+    results = deployer.deploy([spec(name) for name in ('bad', 'stuck', 'ok1', 'ok2')], 'tenant-a')
+    assert results['bad']['status'] == STATUS_ERROR and 'denied' in results['bad']['error']
+    assert results['stuck']['status'] == STATUS_TIMEOUT
+    assert results['ok1']['status'] == results['ok2']['status'] == STATUS_READY
+
+
+def test_existing_services_are_updated_and_wait_for_the_new_rollout():
+    api = FakeKServeAPI(create_ms=1.0, ready_ms=100.0, existing=[('tenant-a', 'old')])
+    deployer = TDBBulkDeployer(api, max_concurrency=2, timeout_seconds=5, watch_timeout_seconds=1)
+    results = deployer.deploy([spec('old'), spec('new')], 'tenant-a')
+    assert results['old']['status'] == results['new']['status'] == STATUS_READY
+    assert results['old']['action'] == ACTION_UPDATED and results['new']['action'] == ACTION_CREATED
+    assert api.updated == [('tenant-a', 'old')]
+    # 목록에서 처음 본 Ready는 이전 generation의 상태이므로 갱신된 rollout을 기다린다.
+    assert results['old']['seconds'] >= 0.1
+    assert api.services[('tenant-a', 'old')] == {'generation': 2, 'observed': 2}
+
+
+def test_a_failed_update_is_reported():
+    class FailingUpdate(FakeKServeAPI):
+        def update(self, isvc, namespace):
+            raise RuntimeError("spec is immutable")
+
+    api = FailingUpdate(create_ms=1.0, ready_ms=10.0, existing=[('tenant-a', 'old')])
+    results = TDBBulkDeployer(api, timeout_seconds=5, watch_timeout_seconds=1).deploy([spec('old')], 'tenant-a')
+    assert results['old']['status'] == STATUS_ERROR and 'immutable' in results['old']['error']
+
+
+def test_max_concurrency_must_be_positive():
+    with pytest.raises(ValueError):
+        TDBBulkDeployer(FakeKServeAPI(), max_concurrency=0)
+
+
+def test_isvc_ready():
+    assert isvc_ready({'status': {'conditions': [{'type': 'Ready', 'status': 'True'}]}})
+    assert not isvc_ready({'status': {'conditions': [{'type': 'Ready', 'status': 'False'}]}})
+    assert not isvc_ready({'status': None})
+    # 이전 generation의 Ready
+    assert not isvc_ready({'metadata': {'generation': 2},
+                           'status': {'observedGeneration': 1, 'conditions': [{'type': 'Ready', 'status': 'True'}]}})
+
+
+def test_isvc_spec():
+    pytest.importorskip('kserve')
+    isvc = isvc_spec('cnn', 'mnist', 'tenant-a', 'pvc://traindb-ml-pvc/models')
+    assert isvc.metadata.name == serving_name('cnn', 'mnist') == 'traindb-ml-serve-cnn-mnist'
+    assert isvc.metadata.labels['podtype'] == 'serve'
+    assert isvc.spec.predictor.pytorch.storage_uri == 'pvc://traindb-ml-pvc/models'
@@ -0,0 +1,82 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+import tdbmlserve
+from tdbbench import FakeKServeAPI, StubPredictor
+from tdbmlserve import ModelServer
+from tdbpredcache import TDBPredictionCache
+
+NAMESPACE = 'tenant-a'
+
+
+@pytest.fixture(autouse=True)
+def plain_isvc_spec(monkeypatch):
+    # isvc_spec은 kserve가 필요하다: TDBBulkDeployer와 FakeKServeAPI는 metadata.name만 읽는다.
+    monkeypatch.setattr(tdbmlserve, 'isvc_spec', lambda modeltype, modelname, nspace, uri_storage: SimpleNamespace(
+        metadata=SimpleNamespace(name=tdbmlserve.serving_name(modeltype, modelname))))
+
+
+def server():
+    return ModelServer('cnn', 'mnist', 'pvc://traindb-ml-pvc/models', predictor=StubPredictor(0),
+                       cache=TDBPredictionCache())
+
+
+def test_redeploying_an_existing_serving_invalidates_the_cache():
+    model = server()
+    api = FakeKServeAPI(create_ms=1.0, ready_ms=10.0, existing=[(NAMESPACE, model.pod_name)])
+    model.register_serving(NAMESPACE, 'pvc://traindb-ml-pvc/models', timeout_seconds=5, model_version='v1', api=api)
+    model.predict([[1.0, 2.0]])
+    assert model.cache_stats()['entries'] == 1
+
+    # 같은 uri에 다시 훈련한 모델: 서비스는 갱신되고 이전 버전의 예측 결과는 버려진다.
+    model.register_serving(NAMESPACE, 'pvc://traindb-ml-pvc/models', timeout_seconds=5, model_version='v2', api=api)
+    assert api.updated == [(NAMESPACE, model.pod_name)] * 2
+    assert model.model_version == 'v2' and model.endpoint == 'http://{}.{}'.format(model.pod_name, NAMESPACE)
+    stats = model.cache_stats()
+    assert stats['entries'] == 0 and stats['invalidations'] == 1
+
+
+def test_redeploying_without_a_version_uses_the_model_identity():
+    model = server()
+    api = FakeKServeAPI(create_ms=1.0, ready_ms=10.0)
+    model.register_serving(NAMESPACE, 'pvc://traindb-ml-pvc/models', timeout_seconds=5, api=api)
+    first = model.model_version
+    model.predict([[1.0]])
+    model.register_serving(NAMESPACE, 'pvc://traindb-ml-pvc/models', timeout_seconds=5, api=api)
+    # PVC가 mount되어 있지 않으면 배포 시각이 버전이 되어 매번 바뀐다.
+    assert model.model_version != first and model.cache_stats()['entries'] == 0
+
+
+def test_register_serving_raises_when_the_serving_fails():
+    class FailingCreate(FakeKServeAPI):
+        def create(self, isvc, namespace):
+            raise RuntimeError("quota exceeded")
+
+    model = server()
+    with pytest.raises(RuntimeError, match='quota exceeded'):
+        model.register_serving(NAMESPACE, 'pvc://traindb-ml-pvc/models', timeout_seconds=5, api=FailingCreate())
+    assert model.model_version == 'pvc://traindb-ml-pvc/models'
+
+
+def test_import_does_not_load_the_async_client():
+    # aiohttp는 apredict에서만 필요하다.
+    code = ('import sys; sys.path[:0] = {!r}; import tdbmlserve; '
+            'assert "aiohttp" not in sys.modules and "tdbserveclient" not in sys.modules').format(sys.path)
+    subprocess.run([sys.executable, '-c', code], check=True)
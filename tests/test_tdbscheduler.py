@@ -0,0 +1,148 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from tdbfaketraining import FakeTrainingClient
+from tdbscheduler import STATE_FAILED, STATE_QUEUED, STATE_SUCCEEDED, TDBJobScheduler, TDBTrainRequest
+from traindbmodelinfo import TDBModelInfo
+
+MODEL_INFO = TDBModelInfo("traindb", "traindb-ml-", "latest", "train")
+
+
+def job_name(modelname, modeltype='cnn'):
+    return MODEL_INFO.pod_name(modeltype, modelname)
+
+
+def scheduler(client, **kwargs):
+    kwargs.setdefault('backoff_seconds', 0.0)
+    kwargs.setdefault('poll_seconds', 0.01)
+    kwargs.setdefault('gc_after_seconds', 60.0)
+    return TDBJobScheduler(client, MODEL_INFO, **kwargs)
+
+
+def test_quotas_bound_the_running_jobs_per_namespace():
+    client = FakeTrainingClient(duration_seconds=0.05)
+    jobs = scheduler(client, quotas={'tenant-a': 2}, default_quota=1).start()
+    try:
+        for i in range(6):
+            jobs.submit(TDBTrainRequest('cnn', 'a{}'.format(i), 'tenant-a'))
+        for i in range(3):
+            jobs.submit(TDBTrainRequest('cnn', 'b{}'.format(i), 'tenant-b'))
+        assert jobs.wait(timeout=10)
+    finally:
+        jobs.stop()
+    assert client.peak == {'tenant-a': 2, 'tenant-b': 1}
+    assert jobs.stats['succeeded'] == 9 and jobs.stats['created'] == 9
+    assert jobs.status(job_name('a5'), 'tenant-a') == STATE_SUCCEEDED
+
+
+def test_higher_priority_requests_are_created_first():
+    client = FakeTrainingClient(duration_seconds=60)
+    jobs = scheduler(client, default_quota=1)
+    for name, priority in (('low', 0), ('high', 10), ('mid', 5)):
+        jobs.submit(TDBTrainRequest('cnn', name, 'tenant-a', priority=priority))
+    jobs.schedule_once()
+    assert client.created == [('tenant-a', job_name('high'))]
+    assert jobs.status(job_name('low')) == STATE_QUEUED and jobs.running('tenant-a') == 1
+
+
+def test_failed_jobs_are_deleted_and_retried():
+    name = job_name('mnist')
+    client = FakeTrainingClient(duration_seconds=0.0, outcomes={name: ['Failed', 'Failed', 'Succeeded']})
+    jobs = scheduler(client, max_retries=3).start()
+    try:
+        jobs.submit(TDBTrainRequest('cnn', 'mnist', 'tenant-a'))
+        assert jobs.wait(timeout=10)
+    finally:
+        jobs.stop()
+    assert jobs.status(name) == STATE_SUCCEEDED
+    assert jobs.stats['retries'] == 2 and client.created.count(('tenant-a', name)) == 3
+    assert client.deleted.count(('tenant-a', name)) == 2
+
+
+def test_a_job_fails_after_max_retries():
+    name = job_name('mnist')
+    client = FakeTrainingClient(duration_seconds=0.0, outcomes={name: ['Failed'] * 3})
+    jobs = scheduler(client, max_retries=1).start()
+    try:
+        request = TDBTrainRequest('cnn', 'mnist', 'tenant-a')
+        jobs.submit(request)
+        assert jobs.wait(timeout=10)
+    finally:
+        jobs.stop()
+    assert request.state == STATE_FAILED and request.attempts == 2 and request.error
+    # 마지막으로 실패한 job은 GC 전까지 남아 있다.
+    assert ('tenant-a', name) in client.jobs
+
+
+def test_failed_creates_are_retried():
+    name = job_name('mnist')
+    client = FakeTrainingClient(duration_seconds=0.0, create_errors={name: 2})
+    jobs = scheduler(client).start()
+    try:
+        jobs.submit(TDBTrainRequest('cnn', 'mnist', 'tenant-a'))
+        assert jobs.wait(timeout=10)
+    finally:
+        jobs.stop()
+    assert jobs.status(name) == STATE_SUCCEEDED and jobs.stats['retries'] == 2
+
+
+def test_backoff_delays_the_retry():
+    name = job_name('mnist')
+    client = FakeTrainingClient(duration_seconds=0.0, create_errors={name: 1})
+    jobs = scheduler(client, backoff_seconds=60)
+    jobs.submit(TDBTrainRequest('cnn', 'mnist', 'tenant-a'))
+    jobs.schedule_once()
+    jobs.schedule_once()
+    assert jobs.status(name) == STATE_QUEUED and client.created == []
+
+
+def test_resubmitting_a_finished_job_deletes_it_first():
+    name = job_name('mnist')
+    client = FakeTrainingClient(duration_seconds=0.0)
+    jobs = scheduler(client).start()
+    try:
+        jobs.submit(TDBTrainRequest('cnn', 'mnist', 'tenant-a'))
+        assert jobs.wait(timeout=10)
+        jobs.submit(TDBTrainRequest('cnn', 'mnist', 'tenant-a'))
+        assert jobs.wait(timeout=10)
+    finally:
+        jobs.stop()
+    assert jobs.status(name) == STATE_SUCCEEDED and jobs.stats['succeeded'] == 2
+    assert client.deleted == [('tenant-a', name)]
+
+
+def test_requests_are_keyed_by_namespace_and_name():
+    name = job_name('mnist')
+    jobs = scheduler(FakeTrainingClient(duration_seconds=60))
+    jobs.submit(TDBTrainRequest('cnn', 'mnist', 'tenant-a'))
+    with pytest.raises(ValueError, match='already queued'):
+        jobs.submit(TDBTrainRequest('cnn', 'mnist', 'tenant-a'))
+    jobs.submit(TDBTrainRequest('cnn', 'mnist', 'tenant-b'))
+    assert jobs.status(name, 'tenant-b') == STATE_QUEUED
+    with pytest.raises(ValueError, match='several namespaces'):
+        jobs.status(name)
+
+
+def test_finished_jobs_are_garbage_collected():
+    name = job_name('mnist')
+    client = FakeTrainingClient(duration_seconds=0.0)
+    jobs = scheduler(client, gc_after_seconds=0.0)
+    jobs.submit(TDBTrainRequest('cnn', 'mnist', 'tenant-a'))
+    jobs.schedule_once()
+    jobs.schedule_once()
+    assert jobs.status(name) == STATE_SUCCEEDED
+    jobs.collect_garbage()
+    assert client.deleted == [('tenant-a', name)] and client.jobs == {}
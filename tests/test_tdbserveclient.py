@@ -0,0 +1,123 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from tdbbench import start_stub_server
+from tdbserveclient import PROTOCOL_V2, TDBServeClient, decode_response, encode_request
+
+
+async def start_app(routes):
+    app = web.Application()
+    app.router.add_routes(routes)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    return runner, 'http://127.0.0.1:{}'.format(runner.addresses[0][1])
+
+
+def test_predict_many_against_the_v1_stub():
+    async def run():
+        runner, url = await start_stub_server(delay_ms=1.0)
+        try:
+            async with TDBServeClient(max_connections=4) as client:
+                batches = [[[float(i), 1.0], [float(i), 2.0]] for i in range(20)]
+                results = await client.predict_many(url + '/', 'stub', batches)
+                # 같은 endpoint의 요청은 하나의 pooled session을 쓴다.
+                assert client.session(url) is client.session(url + '/')
+            return results
+        finally:
+            await runner.cleanup()
+
+    assert asyncio.run(run()) == [[i + 1.0, i + 2.0] for i in range(20)]
+
+
+def test_predict_v2_round_trips_the_tensor():
+    async def infer(request):
+        body = await request.json()
+        tensor = body['inputs'][0]
+        assert request.match_info['name'] == 'table'
+        return web.json_response({'outputs': [{'name': 'output-0', 'shape': tensor['shape'],
+                                               'datatype': 'FP32', 'data': [v * 2 for v in tensor['data']]}]})
+
+    async def run():
+        runner, url = await start_app([web.post('/v2/models/{name}/infer', infer)])
+        try:
+            async with TDBServeClient() as client:
+                return await client.predict(url, 'table', [[1.0, 2.0], [3.0, 4.0]], protocol=PROTOCOL_V2)
+        finally:
+            await runner.cleanup()
+
+    assert asyncio.run(run()) == [[2.0, 4.0], [6.0, 8.0]]
+
+
+def test_max_concurrency_bounds_the_requests_in_flight():
+    in_flight = {'now': 0, 'max': 0}
+
+    async def predict(request):
+        in_flight['now'] += 1
+        in_flight['max'] = max(in_flight['max'], in_flight['now'])
+        await asyncio.sleep(0.01)
+        in_flight['now'] -= 1
+        return web.json_response({'predictions': [0]})
+
+    async def run():
+        runner, url = await start_app([web.post('/v1/models/{name}', predict)])
+        try:
+            async with TDBServeClient(max_concurrency=3) as client:
+                await client.predict_many(url, 'm', [[[1.0]]] * 30)
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(run())
+    assert in_flight['max'] == 3
+
+
+def test_errors_and_timeouts_are_raised_or_returned():
+    async def fail(request):
+        return web.Response(status=500, text='model not loaded')
+
+    async def slow(request):
+        await asyncio.sleep(1.0)
+        return web.json_response({'predictions': [0]})
+
+    async def run():
+        runner, url = await start_app([web.post('/v1/models/fail:predict', fail),
+                                       web.post('/v1/models/slow:predict', slow)])
+        try:
+            async with TDBServeClient() as client:
+                with pytest.raises(aiohttp.ClientResponseError, match='model not loaded'):
+                    await client.predict(url, 'fail', [[1.0]])
+                with pytest.raises(asyncio.TimeoutError):
+                    await client.predict(url, 'slow', [[1.0]], timeout=0.05)
+                return await client.predict_many(url, 'fail', [[[1.0]]] * 2, return_exceptions=True)
+        finally:
+            await runner.cleanup()
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, aiohttp.ClientResponseError) and result.status == 500 for result in results)
+
+
+def test_encode_and_decode():
+    assert encode_request([[1, 2]]) == {'instances': [[1, 2]]}
+    body = encode_request([[1.0, 2.0], [3.0, 4.0]], PROTOCOL_V2)
+    assert body['inputs'][0]['shape'] == [2, 2] and body['inputs'][0]['data'] == [1.0, 2.0, 3.0, 4.0]
+    assert decode_response({'outputs': [{'shape': [2, 1], 'data': [5, 6]}]}, PROTOCOL_V2) == [[5], [6]]
+    with pytest.raises(ValueError):
+        encode_request([[1]], 'v3')
@@ -0,0 +1,67 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from tdbtrace import TDBProfilerWindow
+
+torch_profiler = pytest.importorskip('torch.profiler')
+
+
+class FakeProfile():
+    """Records whether it is running and the trace paths it exports"""
+
+    def __init__(self, **kwargs):
+        self.running = False
+        self.exported = []
+
+    def __enter__(self):
+        self.running = True
+        return self
+
+    def __exit__(self, *exc_info):
+        self.running = False
+
+    def export_chrome_trace(self, path):
+        self.exported.append(path)
+
+
+def profiled_steps(window, steps):
+    """Run steps training steps, calling window.step() at the top of each, and return the profiled ones"""
+    profiled = []
+    for step in range(steps):
+        window.step()
+        if window._profiler is not None and window._profiler.running:
+            profiled.append(step)
+    window.close()
+    return profiled
+
+
+@pytest.mark.parametrize('start_step, num_steps, steps, expected', [
+    (0, 3, 10, [0, 1, 2]),
+    (4, 2, 10, [4, 5]),
+    (8, 5, 10, [8, 9]),      # 훈련이 창보다 먼저 끝나면 close()가 기록한다.
+    (3, 0, 10, []),
+])
+def test_profiles_exactly_the_window(monkeypatch, tmp_path, start_step, num_steps, steps, expected):
+    profiles = []
+
+    def profile(**kwargs):
+        profiles.append(FakeProfile(**kwargs))
+        return profiles[-1]
+
+    monkeypatch.setattr(torch_profiler, 'profile', profile)
+    trace_path = str(tmp_path / 'profile-rank0.json')
+    assert profiled_steps(TDBProfilerWindow(start_step, num_steps, trace_path), steps) == expected
+    assert [profile.exported for profile in profiles] == ([[trace_path]] if expected else [])
@@ -0,0 +1,40 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from tdbtrainer import table_data
+
+
+def rank_rows(datasource, world_size, **kwargs):
+    """Return the rows each rank trains on, as sorted feature lists"""
+    rows = []
+    for rank in range(world_size):
+        _, batches = table_data(datasource, batch_size=4, chunk_size=10, prefetch=2, rank=rank,
+                                world_size=world_size, **kwargs)
+        rows.append(sorted(row.tolist() for inputs, _ in batches() for row in inputs))
+    return rows
+
+
+@pytest.mark.parametrize('cached', [False, True])
+def test_ranks_share_a_small_table(sqlite_datasource, tmp_path, cached):
+    datasource = sqlite_datasource(rows=100)
+    kwargs = {'cache_path': str(tmp_path / 'cache'), 'cache_max_bytes': 1 << 30} if cached else {}
+    if cached:
+        rank_rows(datasource, 1, **kwargs)  # 캐시를 채운다.
+    rows = rank_rows(datasource, 4, **kwargs)
+    # 100행은 캐시 shard 하나에 들어가지만 chunk_size 단위로 rank마다 나뉜다.
+    assert [len(r) for r in rows] == [30, 30, 20, 20]
+    ids = sorted(round(row[0] * 100) for r in rows for row in r)
+    assert ids == list(range(1, 101))
@@ -1,58 +1,26 @@
-from kubernetes.client import V1PodTemplateSpec
-from kubernetes.client import V1ObjectMeta
-from kubernetes.client import V1PodSpec
-from kubernetes.client import V1Container
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../common/'))
 
-from kubeflow.training import V1ReplicaSpec
-from kubeflow.training import KubeflowOrgV1PyTorchJob
-from kubeflow.training import KubeflowOrgV1PyTorchJobSpec
-from kubeflow.training import V1RunPolicy
 from kubeflow.training import TrainingClient
 
-name = "pytorch-dist-mnist-gloo"
-namespace = "traindb"
-container_name = "pytorch"
-
-container = V1Container(
-    name=container_name,
-    image="gcr.io/kubeflow-ci/pytorch-dist-mnist-test:v1.0",
-    args=["--backend", "gloo"],
-)
-
-replica_spec = V1ReplicaSpec(
-    replicas=1,
-    restart_policy="OnFailure",
-    template=V1PodTemplateSpec(
-        metadata=V1ObjectMeta(
-            name=name,
-            namespace=namespace,
-            annotations={
-                "sidecar.istio.io/inject": "false"
-            }
-        ),
-        spec=V1PodSpec(
-            containers=[
-                V1Container(
-                    name=container_name,
-                    image="gcr.io/kubeflow-ci/pytorch-dist-mnist-test:v1.0",
-                    args=["--backend", "gloo"],
-                )
-            ]
-        )
-    )
-)
+from traindbmodelinfo import TDBModelInfo
+from tdbpytorchjob import CONTAINER_NAME, build_pytorchjob
+from tdblogstream import TDBJobLogFollower
 
-pytorchjob = KubeflowOrgV1PyTorchJob(
-    api_version="kubeflow.org/v1",
-    kind="PyTorchJob",
-    metadata=V1ObjectMeta(name=name, namespace=namespace),
-    spec=KubeflowOrgV1PyTorchJobSpec(
-        run_policy=V1RunPolicy(clean_pod_policy="None"),
-        pytorch_replica_specs={
-            "Master": replica_spec,
-            "Worker": replica_spec
-        },
-    ),
+namespace = "traindb"
+modeltype = "cnn"
+modelname = "mnist"
+workers = 2
+
+# traindb/traindb-ml-train:<tag> 이미지 (pipeline/Dockerfile)
+model_info = TDBModelInfo("traindb", "traindb-ml-", "latest", "train")
+name = model_info.pod_name(modeltype, modelname)
+
+# Master 1개, Worker 2개가 gloo backend DDP로 CPU에서 훈련
+pytorchjob = build_pytorchjob(
+    model_info, modeltype, modelname, namespace, workers=workers,
+    args=["--epochs", "1", "--model-path", "/mnt/model/{}.pt".format(modelname)],
 )
 
 training_client = TrainingClient()
@@ -63,14 +31,16 @@ training_client.get_pytorchjob(name).metadata.name
 
 training_client.get_job_conditions(name=name, namespace=namespace, job_kind="PyTorchJob")
 
+# 끝날 때까지 기다리지 않고 Master/Worker의 진행 상황을 바로 확인
+for pod, event in TDBJobLogFollower(name, namespace, container=CONTAINER_NAME).events(stall_seconds=60):
+    print(pod, event)
+
 pytorchjob = training_client.wait_for_job_conditions(name=name, namespace=namespace, job_kind="PyTorchJob")
 
 print(f"Succeeded number of replicas: {pytorchjob.status.replica_statuses['Master'].succeeded}")
 
 training_client.is_job_succeeded(name=name, namespace=namespace, job_kind="PyTorchJob")
 
-training_client.get_job_logs(name=name, namespace=namespace, container=container_name)
+training_client.get_job_logs(name=name, namespace=namespace, container=CONTAINER_NAME)
 
 training_client.delete_pytorchjob(name)
-
-
@@ -0,0 +1,73 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+from types import SimpleNamespace
+
+
+class FakeTrainingClient():
+    """An in-memory stand-in for the TrainingClient calls of TDBJobScheduler
+
+    A created job runs for duration_seconds and then succeeds, unless
+    outcomes lists the results of its attempts, e.g. {'traindb-ml-train-cnn-a':
+    ['Failed', 'Succeeded']}. Creating a job whose name already exists
+    raises RuntimeError like the real client. The peak number of running
+    jobs per namespace is recorded to check quotas.
+    """
+
+    def __init__(self, duration_seconds=0.1, outcomes=None, create_errors=None):
+        self.duration = duration_seconds
+        self.outcomes = {name: list(results) for name, results in (outcomes or {}).items()}
+        self.create_errors = dict(create_errors or {})  # job name -> 남은 생성 실패 횟수
+        self.jobs = {}  # (namespace, name) -> (생성 시각, 결과)
+        self.created = []
+        self.deleted = []
+        self.peak = {}
+        self._lock = threading.Lock()
+
+    def create_pytorchjob(self, pytorchjob, namespace=None):
+        name = pytorchjob.metadata.name
+        with self._lock:
+            if self.create_errors.get(name, 0) > 0:
+                self.create_errors[name] -= 1
+                raise RuntimeError("Failed to create PyTorchJob: {}".format(name))
+            if (namespace, name) in self.jobs:
+                raise RuntimeError("PyTorchJob {} already exists".format(name))
+            results = self.outcomes.get(name)
+            outcome = results.pop(0) if results else 'Succeeded'
+            self.jobs[(namespace, name)] = (time.monotonic(), outcome)
+            self.created.append((namespace, name))
+            running = sum(1 for (ns, n) in self.jobs if ns == namespace and self._state(ns, n) == 'Running')
+            self.peak[namespace] = max(self.peak.get(namespace, 0), running)
+
+    def delete_pytorchjob(self, name, namespace=None):
+        with self._lock:
+            if self.jobs.pop((namespace, name), None) is None:
+                raise RuntimeError("PyTorchJob {} not found".format(name))
+            self.deleted.append((namespace, name))
+
+    def get_job_conditions(self, name, namespace=None, job_kind='PyTorchJob'):
+        with self._lock:
+            if (namespace, name) not in self.jobs:
+                raise RuntimeError("PyTorchJob {} not found".format(name))
+            types = ['Created', 'Running']
+            state = self._state(namespace, name)
+            if state != 'Running':
+                types.append(state)
+        return [SimpleNamespace(type=t, status='True' if t == types[-1] else 'False') for t in types]
+
+    def _state(self, namespace, name):
+        created_at, outcome = self.jobs[(namespace, name)]
+        return outcome if time.monotonic() - created_at >= self.duration else 'Running'
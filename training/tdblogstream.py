@@ -0,0 +1,325 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import calendar
+import logging
+import math
+import os
+import queue
+import sys
+import threading
+import time
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../common/'))
+
+from tdbprogress import parse_progress
+
+LOG = logging.getLogger(__name__)
+
+CONTAINER_NAME = 'pytorch'
+# training-operator가 PyTorchJob pod에 붙이는 label
+JOB_NAME_LABEL = 'training.kubeflow.org/job-name'
+REPLICA_TYPE_LABEL = 'training.kubeflow.org/replica-type'
+
+DEFAULT_BUFFER_LINES = 1000
+DEFAULT_DISCOVER_SECONDS = 2.0
+DEFAULT_STALL_SECONDS = 60.0
+CHUNK_BYTES = 4096
+# 마지막 줄이 끝나지 않은 채로 쌓일 수 있는 최대 길이
+MAX_LINE_BYTES = 1 << 20
+# 다시 따라갈 때 since_seconds에 더하는 여유 (노드와의 시계 차이, 겹친 줄은 timestamp로 건너뜀)
+REFOLLOW_MARGIN_SECONDS = 5
+
+POD_STARTED_PHASES = ('Running', 'Succeeded', 'Failed')
+POD_FINISHED_PHASES = ('Succeeded', 'Failed')
+
+
+class PodLogAPI:
+    """The pod list and log follow calls of TDBJobLogFollower over the CoreV1Api
+
+    A fake with the same pods, follow and close methods can stand in for it.
+    """
+
+    def __init__(self, session=None):
+        if session is None:
+            from tdbkubesession import default_session
+            session = default_session()
+        self.session = session
+
+    def pods(self, namespace, label_selector, container=CONTAINER_NAME):
+        """Return the (name, phase, restart count of container) of the pods matching label_selector"""
+        pods = self.session.call('list_namespaced_pod', self.session.core_v1.list_namespaced_pod,
+                                 namespace, label_selector=label_selector)
+        result = []
+        for pod in pods.items:
+            restarts = sum(status.restart_count or 0 for status in pod.status.container_statuses or []
+                           if status.name == container)
+            result.append((pod.metadata.name, pod.status.phase, restarts))
+        return result
+
+    def follow(self, name, namespace, container, since_seconds=None):
+        """Return the followed log response of a pod container (read with stream(), ended by close())
+
+        Every line starts with its RFC 3339 timestamp and a space.
+        """
+        kwargs = {'since_seconds': since_seconds} if since_seconds else {}
+        return self.session.core_v1.read_namespaced_pod_log(name, namespace, container=container, follow=True,
+                                                            timestamps=True, _preload_content=False, **kwargs)
+
+    def close(self, response):
+        response.close()
+        response.release_conn()
+
+
+def parse_timestamp(text):
+    """Return the nanoseconds since the epoch of an RFC 3339 log timestamp, or None"""
+    if len(text) < 20 or text[10] != 'T' or not text.endswith('Z'):
+        return None
+    try:
+        seconds = calendar.timegm(time.strptime(text[:19], '%Y-%m-%dT%H:%M:%S'))
+        fraction = text[20:-1] if text[19] == '.' else ''
+        return seconds * 10 ** 9 + int((fraction + '000000000')[:9])
+    except ValueError:
+        return None
+
+
+def split_timestamp(line):
+    """Return (nanoseconds or None, text) of a log line written with timestamps"""
+    head, sep, text = line.partition(' ')
+    timestamp = parse_timestamp(head) if sep else None
+    return (timestamp, text) if timestamp is not None else (None, line)
+
+
+def split_lines(chunks):
+    """Yield the decoded lines of a stream of byte chunks"""
+    pending = b''
+    for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b'\n')
+        for line in lines:
+            yield line.decode('utf-8', errors='replace').rstrip('\r')
+        if len(pending) > MAX_LINE_BYTES:
+            yield pending.decode('utf-8', errors='replace')
+            pending = b''
+    if pending:
+        yield pending.decode('utf-8', errors='replace')
+
+
+class TDBJobLogFollower():
+    """Follows the logs of every Master and Worker pod of a PyTorchJob as they are written
+
+    The pods of the job are listed every discover_seconds; each pod that
+    has started is followed by its own thread, which puts its lines into
+    one bounded queue of buffer_lines (a slow reader blocks the followers,
+    and so the log streams, instead of growing memory). When a log stream
+    ends before the pod has finished (the container restarted, exited just
+    before the pod phase changed, or the server closed the stream), the
+    log is followed again after the timestamp of the last line read, so
+    no line is yielded twice. Restarts are counted from the restart count
+    of the container.
+    Iterating yields (pod, line) in arrival order until every pod has
+    finished and its log has been read, or stop() is called.
+
+    events() yields only the progress events written by TDBProgress in the
+    training loop, plus a 'stalled' event for a pod that has written no
+    progress for stall_seconds, so a hung or slow rank shows up within
+    seconds instead of after the job ends.
+
+    :param name: the PyTorchJob name
+    :param namespace: the namespace of the PyTorchJob
+    :param api: a PodLogAPI (or a fake with the same calls)
+    :param container: the training container name
+    """
+
+    def __init__(self, name, namespace, api=None, container=CONTAINER_NAME, buffer_lines=DEFAULT_BUFFER_LINES,
+                 discover_seconds=DEFAULT_DISCOVER_SECONDS):
+        self.name = name
+        self.namespace = namespace
+        self.api = api if api is not None else PodLogAPI()
+        self.container = container
+        self.discover_seconds = discover_seconds
+        self._queue = queue.Queue(maxsize=buffer_lines)
+        self._lock = threading.Lock()
+        self._followed = {}  # pod -> {'thread', 'response', 'ended_at', 'phase', 'restarts', 'last_ts', 'final'}
+        self._progress = {}  # pod -> 마지막 진행 이벤트
+        self._stop = threading.Event()
+        self._done = threading.Event()
+        self._threads = []
+        self.stats = {'pods': 0, 'lines': 0, 'events': 0, 'restarts': 0, 'refollows': 0, 'errors': 0}
+
+    def start(self):
+        """Start discovering and following the pods of the job"""
+        self._stop.clear()
+        thread = threading.Thread(target=self._discover_loop, daemon=True, name='logs-' + self.name)
+        thread.start()
+        self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            followed = list(self._followed.values())
+        for state in followed:
+            if state['response'] is not None:
+                try:
+                    self.api.close(state['response'])
+                except Exception:
+                    pass
+        for thread in self._threads:
+            thread.join(timeout=self.discover_seconds + 1)
+        self._threads = []
+
+    def __iter__(self):
+        return self.lines()
+
+    def lines(self, timeout=None):
+        """Yield (pod, line) as the pods write them; end when the job's logs end or after timeout seconds"""
+        for pod, line in self._read(timeout):
+            if line is not None:
+                yield pod, line
+
+    def events(self, stall_seconds=DEFAULT_STALL_SECONDS, timeout=None):
+        """Yield (pod, event) for the progress events of the pods and for stalled pods
+
+        A pod whose log is being followed and that has written no progress
+        event for stall_seconds yields {'event': 'stalled', 'seconds': ...}
+        once, until it writes progress again.
+        """
+        last = {}  # pod -> 마지막 진행 이벤트를 받은 시각
+        stalled = set()
+        for pod, line in self._read(timeout, min(1.0, stall_seconds / 4)):
+            now = time.monotonic()
+            if line is not None:
+                event = parse_progress(line)
+                last.setdefault(pod, now)
+                if event is not None:
+                    last[pod] = now
+                    stalled.discard(pod)
+                    yield pod, event
+            for name in self._following():
+                since = last.setdefault(name, now)
+                if name not in stalled and now - since >= stall_seconds:
+                    stalled.add(name)
+                    yield name, {'event': 'stalled', 'seconds': now - since}
+
+    def progress(self):
+        """Return the last progress event of every pod"""
+        with self._lock:
+            return dict(self._progress)
+
+    def _read(self, timeout, tick=None):
+        # tick마다 (pod, None)을 내보내 호출자가 stall을 확인할 수 있게 한다.
+        if not self._threads:
+            self.start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = tick if tick is not None else 1.0
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    return
+            try:
+                yield self._queue.get(timeout=wait)
+            except queue.Empty:
+                if self._done.is_set() or self._stop.is_set():
+                    return
+                if tick is not None:
+                    yield None, None
+
+    def _following(self):
+        with self._lock:
+            return [pod for pod, state in self._followed.items() if state['ended_at'] is None]
+
+    def _discover_loop(self):
+        while not self._stop.is_set():
+            try:
+                pods = self.api.pods(self.namespace, '{}={}'.format(JOB_NAME_LABEL, self.name), self.container)
+                if self._discover(pods):
+                    self._done.set()
+                    return
+            except Exception as e:
+                LOG.warning("Failed to list the pods of %s: %s", self.name, e)
+                self.stats['errors'] += 1
+            self._stop.wait(self.discover_seconds)
+
+    def _discover(self, pods):
+        # 모든 pod가 끝났고 로그도 모두 읽었으면 True
+        with self._lock:
+            for pod, phase, restarts in pods:
+                state = self._followed.get(pod)
+                finished = phase in POD_FINISHED_PHASES
+                if state is None:
+                    if phase not in POD_STARTED_PHASES:
+                        continue
+                    state = self._followed[pod] = {'thread': None, 'response': None, 'ended_at': None,
+                                                   'restarts': restarts, 'last_ts': None, 'final': finished}
+                    self.stats['pods'] += 1
+                    self._follow(pod, state)
+                elif state['ended_at'] is not None and not state['final']:
+                    # pod가 끝나기 전에 stream이 끊김 (재시작, phase 갱신 전 종료, 서버 timeout):
+                    # 마지막으로 읽은 줄 다음부터 다시 따라간다. pod가 끝났으면 이번이 마지막.
+                    if restarts > state['restarts']:
+                        self.stats['restarts'] += restarts - state['restarts']
+                    state['restarts'], state['final'], state['ended_at'] = restarts, finished, None
+                    self.stats['refollows'] += 1
+                    self._follow(pod, state)
+                state['phase'] = phase
+            return bool(pods) and all(
+                pod in self._followed and self._followed[pod]['ended_at'] is not None
+                and self._followed[pod]['final'] for pod, _, _ in pods)
+
+    def _follow(self, pod, state):
+        since_seconds = None
+        if state['last_ts'] is not None:
+            since_seconds = int(math.ceil(time.time() - state['last_ts'] / 1e9)) + REFOLLOW_MARGIN_SECONDS
+        thread = threading.Thread(target=self._stream, args=(pod, state, since_seconds), daemon=True,
+                                  name='logs-' + pod)
+        state['thread'] = thread
+        thread.start()
+
+    def _stream(self, pod, state, since_seconds):
+        try:
+            response = self.api.follow(pod, self.namespace, self.container, since_seconds)
+            state['response'] = response
+            for raw in split_lines(response.stream(CHUNK_BYTES)):
+                if self._stop.is_set():
+                    break
+                timestamp, line = split_timestamp(raw)
+                if timestamp is not None:
+                    # 다시 따라가며 겹쳐 받은 줄은 건너뛴다.
+                    if state['last_ts'] is not None and timestamp <= state['last_ts']:
+                        continue
+                    state['last_ts'] = timestamp
+                event = parse_progress(line)
+                if event is not None:
+                    self.stats['events'] += 1
+                    with self._lock:
+                        self._progress[pod] = event
+                self.stats['lines'] += 1
+                self._put((pod, line))
+        except Exception as e:
+            if not self._stop.is_set():
+                LOG.warning("Failed to follow the log of %s: %s", pod, e)
+                self.stats['errors'] += 1
+        finally:
+            with self._lock:
+                state['response'], state['ended_at'] = None, time.monotonic()
+
+    def _put(self, item):
+        # 큐가 차 있으면 읽는 쪽을 기다린다 (stop 시 포기).
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
@@ -0,0 +1,123 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../common/'))
+
+from kubernetes.client import V1PodTemplateSpec
+from kubernetes.client import V1ObjectMeta
+from kubernetes.client import V1PodSpec
+from kubernetes.client import V1Container
+from kubernetes.client import V1ResourceRequirements
+from kubernetes.client import V1PersistentVolumeClaimVolumeSource
+from kubernetes.client import V1Volume
+from kubernetes.client import V1VolumeMount
+
+from kubeflow.training import V1ReplicaSpec
+from kubeflow.training import KubeflowOrgV1PyTorchJob
+from kubeflow.training import KubeflowOrgV1PyTorchJobSpec
+from kubeflow.training import V1RunPolicy
+
+import tdbconstants
+
+CONTAINER_NAME = 'pytorch'
+# TRAIN_IMAGE(pipeline/Dockerfile) 안의 DDP 훈련 진입점
+DDP_ENTRYPOINT = ['python', '/app/pipeline/tdbddp.py']
+
+
+def replica_spec(name, namespace, replicas, image, args, labels, pvc_name, volume_name,
+                 cpu='1', memory='2Gi'):
+    """Return a replica spec running the DDP entry point on CPU
+
+    :param name: the PyTorchJob name
+    :param namespace: the namespace of the PyTorchJob
+    :param replicas: the number of replicas
+    :param image: the training image
+    :param args: the arguments of tdbddp.py
+    :param labels: the pod labels
+    :param pvc_name: the persistent volume claim mounted at PVC_DEFAULT_MOUNT_PATH
+    :param volume_name: the volume name of the claim in the pod
+    :param cpu: the CPU request and limit of each pod
+    :param memory: the memory request and limit of each pod
+
+    """
+    resources = {'cpu': cpu, 'memory': memory}
+    return V1ReplicaSpec(
+        replicas=replicas,
+        restart_policy="OnFailure",
+        template=V1PodTemplateSpec(
+            metadata=V1ObjectMeta(
+                name=name,
+                namespace=namespace,
+                labels=labels,
+                annotations={
+                    "sidecar.istio.io/inject": "false"
+                }
+            ),
+            spec=V1PodSpec(
+                containers=[
+                    V1Container(
+                        name=CONTAINER_NAME,
+                        image=image,
+                        command=DDP_ENTRYPOINT,
+                        args=args,
+                        resources=V1ResourceRequirements(requests=resources, limits=resources),
+                        volume_mounts=[V1VolumeMount(name=volume_name, mount_path=tdbconstants.PVC_DEFAULT_MOUNT_PATH)],
+                    )
+                ],
+                volumes=[
+                    V1Volume(name=volume_name,
+                             persistent_volume_claim=V1PersistentVolumeClaimVolumeSource(claim_name=pvc_name))
+                ]
+            )
+        )
+    )
+
+
+def build_pytorchjob(model_info, modeltype, modelname, namespace, workers=1, args=None, tag='latest',
+                     cpu='1', memory='2Gi'):
+    """Return a PyTorchJob that trains a TrainDB model with DDP on 1 Master and workers Worker pods
+
+    :param model_info: the TDBModelInfo of the training image
+    :param modeltype: the model type for TrainDB-ML
+    :param modelname: the model name for TrainDB-ML
+    :param namespace: the namespace of the PyTorchJob
+    :param workers: the number of Worker replicas
+    :param args: the arguments of tdbddp.py (e.g. ['--epochs', '5'])
+    :param tag: the image tag
+    :param cpu: the CPU request and limit of each pod
+    :param memory: the memory request and limit of each pod
+
+    """
+    name = model_info.pod_name(modeltype, modelname)
+    image = model_info.full_image_name(tag)
+    labels = {"system": "traindb", "subsystem": "ml", "podtype": "train",
+              "modeltype": modeltype, "modelname": modelname}
+    pod_options = dict(image=image, args=list(args or []), labels=labels, pvc_name=model_info.pvc_name(),
+                       volume_name=model_info.volume_name(), cpu=cpu, memory=memory)
+    # Master와 Worker가 각자의 replica spec을 가진다.
+    replica_specs = {"Master": replica_spec(name, namespace, 1, **pod_options)}
+    if workers > 0:
+        replica_specs["Worker"] = replica_spec(name, namespace, workers, **pod_options)
+
+    return KubeflowOrgV1PyTorchJob(
+        api_version="kubeflow.org/v1",
+        kind="PyTorchJob",
+        metadata=V1ObjectMeta(name=name, namespace=namespace, labels=labels),
+        spec=KubeflowOrgV1PyTorchJobSpec(
+            run_policy=V1RunPolicy(clean_pod_policy="None"),
+            pytorch_replica_specs=replica_specs,
+        ),
+    )
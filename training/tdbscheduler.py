@@ -0,0 +1,305 @@
+# Copyright 2023 The TrainDB-ML Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+from tdbpytorchjob import build_pytorchjob
+
+LOG = logging.getLogger(__name__)
+
+JOB_KIND = 'PyTorchJob'
+DEFAULT_QUOTA = 2
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_SECONDS = 30.0
+DEFAULT_MAX_BACKOFF_SECONDS = 600.0
+DEFAULT_POLL_SECONDS = 10.0
+DEFAULT_GC_AFTER_SECONDS = 300.0
+
+# 요청 상태
+STATE_QUEUED = 'Queued'
+STATE_RUNNING = 'Running'
+STATE_SUCCEEDED = 'Succeeded'
+STATE_FAILED = 'Failed'
+FINISHED_STATES = (STATE_SUCCEEDED, STATE_FAILED)
+
+
+class TDBTrainRequest():
+    """A TrainDB training request: one PyTorchJob built by build_pytorchjob
+
+    :param modeltype: the model type for TrainDB-ML
+    :param modelname: the model name for TrainDB-ML
+    :param namespace: the namespace of the PyTorchJob
+    :param priority: requests with a higher priority are submitted first
+    :param workers: the number of Worker replicas
+    :param args: the arguments of tdbddp.py
+    :param tag: the image tag
+
+    """
+
+    def __init__(self, modeltype, modelname, namespace, priority=0, workers=1, args=None, tag='latest'):
+        self.modeltype, self.modelname, self.namespace = modeltype, modelname, namespace
+        self.priority = priority
+        self.workers = workers
+        self.args = list(args or [])
+        self.tag = tag
+        # scheduler가 채우는 값
+        self.name = None
+        self.state = STATE_QUEUED
+        self.attempts = 0
+        self.not_before = 0.0
+        self.finished_at = None
+        self.error = None
+
+
+class TDBJobScheduler():
+    """Submits queued TrainDB PyTorchJobs by priority within per-namespace quotas
+
+    A request waits in a priority queue until its namespace runs fewer than
+    its quota of jobs, then its PyTorchJob is created. Running jobs are
+    polled (or read from a TDBInformer) every poll_seconds; a failed job,
+    or a failed create, is deleted and queued again after an exponential
+    backoff, up to max_retries times. Finished jobs are deleted by a
+    background thread gc_after_seconds after they finish.
+
+    :param training_client: a kubeflow.training TrainingClient (or a fake with the same calls)
+    :param model_info: the TDBModelInfo of the training image
+    :param quotas: a dict of namespace to the maximum number of its running jobs
+    :param default_quota: the quota of namespaces missing from quotas
+    :param informer: an optional started TDBInformer to read job status from instead of polling
+    """
+
+    def __init__(self, training_client, model_info, quotas=None, default_quota=DEFAULT_QUOTA,
+                 max_retries=DEFAULT_MAX_RETRIES, backoff_seconds=DEFAULT_BACKOFF_SECONDS,
+                 max_backoff_seconds=DEFAULT_MAX_BACKOFF_SECONDS, poll_seconds=DEFAULT_POLL_SECONDS,
+                 gc_after_seconds=DEFAULT_GC_AFTER_SECONDS, informer=None):
+        self.client = training_client
+        self.model_info = model_info
+        self.quotas = dict(quotas or {})
+        self.default_quota = default_quota
+        self.max_retries = max_retries
+        self.backoff = backoff_seconds
+        self.max_backoff = max_backoff_seconds
+        self.poll = poll_seconds
+        self.gc_after = gc_after_seconds
+        self.informer = informer
+        self._queue = []  # (-priority, 순번, request)
+        self._seq = itertools.count()
+        self._requests = {}  # (namespace, job name) -> request
+        self._running = {}  # (namespace, job name) -> request
+        self._finished = []  # GC 대기 중인 (정리 시각, request)
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._threads = []
+        self.stats = {'submitted': 0, 'created': 0, 'retries': 0, 'succeeded': 0, 'failed': 0, 'deleted': 0}
+
+    def submit(self, request):
+        """Queue a training request and return its job name
+
+        A finished job of the same name and namespace that is not yet
+        garbage collected is deleted first, so the new one can be created.
+        """
+        name = self.model_info.pod_name(request.modeltype, request.modelname)
+        key = (request.namespace, name)
+        with self._cond:
+            current = self._requests.get(key)
+            if current is not None and current.state not in FINISHED_STATES:
+                raise ValueError("A job named {} is already {} in {}.".format(
+                    name, current.state.lower(), request.namespace))
+            finished = current is not None and any(r is current for _, r in self._finished)
+            if finished:
+                self._finished = [(when, r) for when, r in self._finished if r is not current]
+        if finished:
+            # 남아 있는 이전 job을 지우지 않으면 새 job 생성이 모두 "already exists"로 실패한다.
+            self._delete(current)
+        with self._cond:
+            request.name, request.state = name, STATE_QUEUED
+            self._requests[key] = request
+            heapq.heappush(self._queue, (-request.priority, next(self._seq), request))
+            self.stats['submitted'] += 1
+            self._cond.notify_all()
+        return name
+
+    def start(self):
+        """Start the scheduling and garbage collection threads"""
+        self._stop.clear()
+        for target in (self._schedule_loop, self._gc_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def status(self, name, namespace=None):
+        """Return the state of a request by job name (and namespace), or None
+
+        Without namespace, the name must be queued in only one namespace.
+        """
+        with self._cond:
+            if namespace is not None:
+                request = self._requests.get((namespace, name))
+                return request.state if request is not None else None
+            matches = [r for (_, n), r in self._requests.items() if n == name]
+        if len(matches) > 1:
+            raise ValueError("{} is queued in several namespaces: {}".format(
+                name, sorted(r.namespace for r in matches)))
+        return matches[0].state if matches else None
+
+    def wait(self, timeout=None):
+        """Wait until no request is queued or running; return whether that happened within timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._queue or self._running:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def running(self, namespace=None):
+        """Return the number of running jobs (of namespace if given)"""
+        with self._cond:
+            return sum(1 for r in self._running.values() if namespace is None or r.namespace == namespace)
+
+    def schedule_once(self):
+        """Update the running jobs and submit queued requests that fit the quotas"""
+        self._update_running()
+        for request in self._ready_requests():
+            self._create(request)
+
+    def _schedule_loop(self):
+        while not self._stop.is_set():
+            try:
+                self.schedule_once()
+            except Exception as e:
+                LOG.error("Scheduling failed: %s", e)
+            with self._cond:
+                self._cond.wait(self.poll)
+
+    def _ready_requests(self):
+        # 우선순위 순서로 quota 안에 들어가는 요청을 꺼낸다.
+        now = time.monotonic()
+        ready, skipped = [], []
+        with self._cond:
+            running = {}
+            for request in self._running.values():
+                running[request.namespace] = running.get(request.namespace, 0) + 1
+            while self._queue:
+                item = heapq.heappop(self._queue)
+                request = item[2]
+                quota = self.quotas.get(request.namespace, self.default_quota)
+                if request.not_before > now or running.get(request.namespace, 0) >= quota:
+                    skipped.append(item)
+                    continue
+                running[request.namespace] = running.get(request.namespace, 0) + 1
+                request.state = STATE_RUNNING
+                self._running[(request.namespace, request.name)] = request
+                ready.append(request)
+            for item in skipped:
+                heapq.heappush(self._queue, item)
+        return ready
+
+    def _create(self, request):
+        job = build_pytorchjob(self.model_info, request.modeltype, request.modelname, request.namespace,
+                               workers=request.workers, args=request.args, tag=request.tag)
+        request.attempts += 1
+        try:
+            self.client.create_pytorchjob(job, namespace=request.namespace)
+        except Exception as e:
+            LOG.warning("Failed to create %s: %s", request.name, e)
+            self._retry_or_fail(request, str(e))
+            return
+        self.stats['created'] += 1
+        LOG.info("Created %s (attempt %d)", request.name, request.attempts)
+
+    def _update_running(self):
+        with self._cond:
+            running = list(self._running.values())
+        for request in running:
+            try:
+                state = self._job_state(request)
+            except Exception as e:
+                LOG.warning("Failed to get the status of %s: %s", request.name, e)
+                continue
+            if state == STATE_SUCCEEDED:
+                self._finish(request, STATE_SUCCEEDED)
+            elif state == STATE_FAILED:
+                self._retry_or_fail(request, "the job failed", job_exists=True)
+
+    def _job_state(self, request):
+        if self.informer is not None:
+            from tdbinformer import KIND_PYTORCHJOB
+            return self.informer.status(KIND_PYTORCHJOB, request.name, request.namespace)
+        conditions = self.client.get_job_conditions(name=request.name, namespace=request.namespace,
+                                                    job_kind=JOB_KIND)
+        true_conditions = [c.type for c in conditions if str(c.status).lower() == 'true']
+        return true_conditions[-1] if true_conditions else None
+
+    def _retry_or_fail(self, request, error, job_exists=False):
+        if request.attempts > self.max_retries:
+            # 마지막 실패는 GC 전까지 job을 남겨 로그를 볼 수 있게 한다.
+            request.error = error
+            self._finish(request, STATE_FAILED)
+            return
+        if job_exists:
+            # 실패한 job을 지우고 같은 이름으로 다시 만든다.
+            self._delete(request)
+        delay = min(self.backoff * (2 ** (request.attempts - 1)), self.max_backoff)
+        with self._cond:
+            self._running.pop((request.namespace, request.name), None)
+            request.error = error
+            request.state, request.not_before = STATE_QUEUED, time.monotonic() + delay
+            heapq.heappush(self._queue, (-request.priority, next(self._seq), request))
+            self.stats['retries'] += 1
+            self._cond.notify_all()
+        LOG.info("Retrying %s in %.0fs: %s", request.name, delay, error)
+
+    def _finish(self, request, state):
+        with self._cond:
+            self._running.pop((request.namespace, request.name), None)
+            request.state, request.finished_at = state, time.monotonic()
+            self.stats['succeeded' if state == STATE_SUCCEEDED else 'failed'] += 1
+            self._finished.append((request.finished_at + self.gc_after, request))
+            self._cond.notify_all()
+        LOG.info("%s %s", request.name, state.lower())
+
+    def _gc_loop(self):
+        while not self._stop.wait(min(self.poll, self.gc_after) if self.gc_after > 0 else self.poll):
+            self.collect_garbage()
+
+    def collect_garbage(self):
+        """Delete the finished jobs whose gc_after_seconds have passed"""
+        now = time.monotonic()
+        with self._cond:
+            due = [request for when, request in self._finished if when <= now]
+            self._finished = [(when, request) for when, request in self._finished if when > now]
+        for request in due:
+            self._delete(request)
+
+    def _delete(self, request):
+        try:
+            self.client.delete_pytorchjob(request.name, namespace=request.namespace)
+            self.stats['deleted'] += 1
+        except Exception as e:
+            LOG.warning("Failed to delete %s: %s", request.name, e)